@@ -0,0 +1,64 @@
+"""
+Micro-batching for agent calls
+Items submitted within a short window (or until the batch is full) are
+handed to one handler call; each caller awaits its own result
+"""
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    def __init__(self, handler: Callable[[List[T]], Awaitable[List[R]]],
+                 window_seconds: float, max_size: int):
+        self.handler = handler
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self.batches = 0
+        self.items = 0
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.batches += 1
+            self.items += len(batch)
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]):
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        if len(results) < len(batch):
+            # A short result list must not leave callers awaiting forever
+            error = ValueError(f"batch handler returned {len(results)} results for {len(batch)} items")
+            for _, future in batch[len(results):]:
+                if not future.done():
+                    future.set_exception(error)
@@ -0,0 +1,270 @@
+"""
+Backend under test for benchmark.py
+Runs the real app with Claude replaced by a fake client that answers with
+plausible agent JSON after a configurable latency / error distribution
+(or serves the agent outputs of a recorded session, see replay.py), and
+adds /bench/* probes (event-loop lag, broadcast timestamps)
+
+    python bench_server.py --port 8100 --latency-ms 800 --sigma 0.4 --error-rate 0.02
+    python bench_server.py --port 8100 --replay session.jsonl.gz --latency-scale 0.1
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class FakeLLMError(Exception):
+    pass
+
+
+class _Block:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Message:
+    def __init__(self, text: str):
+        self.content = [_Block(text)]
+
+
+class FakeStream:
+    """Async context manager mimicking client.messages.stream(); latency spread over chunks"""
+
+    def __init__(self, text: str, latency: float, error: Optional[str]):
+        self._text = text
+        self._latency = latency
+        self._error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        chunks = [self._text[i:i + 12] for i in range(0, len(self._text), 12)]
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(self._latency / len(chunks))
+            if self._error and i == len(chunks) // 2:
+                raise FakeLLMError(self._error)
+            yield chunk
+
+
+class FakeMessages:
+    def __init__(self, owner: "FakeClaude"):
+        self._owner = owner
+
+    async def create(self, **request) -> _Message:
+        latency, error, text = self._owner.answer(request)
+        await asyncio.sleep(latency)
+        if error:
+            raise FakeLLMError(error)
+        return _Message(text)
+
+    def stream(self, **request) -> FakeStream:
+        latency, error, text = self._owner.answer(request)
+        return FakeStream(text, latency, error)
+
+
+class FakeClaude:
+    """
+    Stand-in for AsyncAnthropic: lognormal latency around median_ms (sigma
+    0 = constant), error_rate of calls failing, responses shaped per agent
+    """
+
+    def __init__(self, median_ms: float = 800.0, sigma: float = 0.4, error_rate: float = 0.0,
+                 seed: int = 0):
+        self.median = median_ms / 1000
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.messages = FakeMessages(self)
+        self.calls = 0
+
+    def answer(self, request: Dict) -> Tuple[float, Optional[str], str]:
+        """(latency seconds, error message or None, response text)"""
+        self.calls += 1
+        latency = self.median * math.exp(self.sigma * self.rng.gauss(0, 1))
+        error = "injected API error" if self.rng.random() < self.error_rate else None
+        return latency, error, self.respond(request)
+
+    def stats(self) -> Dict:
+        return {"calls": self.calls}
+
+    def respond(self, request: Dict) -> str:
+        import claude_client
+
+        system = request.get("system", "")
+        content = request["messages"][0]["content"]
+        if system == claude_client.ANALYZER_BATCH_SYSTEM_PROMPT:
+            return json.dumps([self._analysis(part) for part in content.split("### Question")[1:]])
+        if system == claude_client.ANALYZER_SYSTEM_PROMPT:
+            return json.dumps(self._analysis(content))
+        if system == claude_client.MATCHER_SYSTEM_PROMPT:
+            ta_ids = [int(i) for i in re.findall(r"^TA (\d+):", content, re.MULTILINE)] or [1]
+            return json.dumps({"recommended_ta_id": ta_ids[0], "alternative_tas": ta_ids[1:3],
+                               "priority_score": 80.0, "rationale": "fake matcher"})
+        if system == claude_client.SYNTHESIZER_SYSTEM_PROMPT:
+            kb_ids = [int(i) for i in re.findall(r"^KB Entry (\d+):", content, re.MULTILINE)]
+            return json.dumps({
+                "student_friendly_hint": "Trace the smallest input by hand and compare each step "
+                                         "with what your code does.",
+                "suggested_answer_outline": "1. Restate the invariant\n2. Walk a small example\n"
+                                            "3. Find the first divergence\n4. Fix and re-test",
+                "similar_question_ids": kb_ids[:2],
+                "similarity_explanation": "fake synthesizer",
+            })
+        return json.dumps({"action": "stay", "reason": "fake", "selected_id": None, "students": []})
+
+    def _analysis(self, content: str) -> Dict:
+        match = re.search(r"Question: (.*)", content)
+        words = re.findall(r"[a-z]{4,}", (match.group(1) if match else content).lower())
+        return {
+            "category": " ".join(words[:2]).title() or "General",
+            "estimated_difficulty": self.rng.choice(["LOW", "MEDIUM", "HIGH"]),
+            "estimated_time_minutes": self.rng.randint(5, 30),
+            "tags": list(dict.fromkeys(words))[:5] or ["general"],
+            "brief_summary": (match.group(1) if match else content)[:100],
+        }
+
+
+class ReplayClaude(FakeClaude):
+    """
+    Serves the agent outputs (and failures) captured in a recorded session,
+    with the recorded latency times latency_scale. Questions that weren't
+    recorded get synthetic answers and count as misses.
+    """
+
+    def __init__(self, events: List[Dict], latency_scale: float = 1.0, seed: int = 0):
+        super().__init__(median_ms=0.0, sigma=0.0, seed=seed)
+        self.latency_scale = latency_scale
+        self.recorded: Dict[Tuple[str, str], Deque[Dict]] = defaultdict(deque)
+        for event in events:
+            if event["op"] == "agent":
+                self.recorded[event["agent"], event["key"]].append(event)
+        self.hits = 0
+        self.misses = 0
+
+    def answer(self, request: Dict) -> Tuple[float, Optional[str], str]:
+        from recorder import agent_keys
+
+        agent, keys = agent_keys(request)
+        found = [self._next(agent, key) for key in keys]
+        if not found or None in found:
+            self.misses += 1
+            return super().answer(request)
+        self.calls += 1
+        self.hits += 1
+        latency = max(event["latency"] for event in found) * self.latency_scale
+        error = next((event["error"] for event in found if "error" in event), None)
+        if error or len(found) == 1 and "text" in found[0]:
+            return latency, error, found[0].get("text", "")
+        outputs = [event["output"] for event in found]
+        return latency, None, json.dumps(outputs[0] if len(keys) == 1 else outputs)
+
+    def stats(self) -> Dict:
+        return {"calls": self.calls, "replayed": self.hits, "unrecorded": self.misses}
+
+    def _next(self, agent: str, key: str) -> Optional[Dict]:
+        """Recorded answers in order; the last one repeats if asked again"""
+        answers = self.recorded.get((agent, key))
+        if not answers:
+            return None
+        return answers.popleft() if len(answers) > 1 else answers[0]
+
+
+def install_probes(app, main_module, fake_client=None):
+    """Event-loop lag sampler and broadcast timestamps, read via GET /bench/stats"""
+    lag_samples: List[float] = []
+    broadcasts: Dict[str, float] = {}
+    original_broadcast = main_module.broadcast_queue_event
+
+    def stamped_broadcast(op: str, queue_entry):
+        if op in ("added", "removed"):
+            broadcasts[f"{op}:{queue_entry.id}"] = time.time()
+        original_broadcast(op, queue_entry)
+
+    main_module.broadcast_queue_event = stamped_broadcast
+
+    async def sample_lag(interval: float = 0.02):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag_samples.append(time.perf_counter() - start - interval)
+
+    # Wrap the app's lifespan so the sampler runs for the server's lifetime
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan_with_sampler(app):
+        sampler = asyncio.create_task(sample_lag())
+        try:
+            async with app_lifespan(app) as state:
+                yield state
+        finally:
+            sampler.cancel()
+
+    app.router.lifespan_context = lifespan_with_sampler
+
+    @app.get("/bench/stats")
+    async def bench_stats(reset: bool = False):
+        stats = {"event_loop_lag_seconds": list(lag_samples), "broadcasts": dict(broadcasts),
+                 "fake_llm": fake_client.stats() if fake_client is not None else None}
+        if reset:
+            lag_samples.clear()
+            broadcasts.clear()
+        return stats
+
+
+def build_app(fake_client: Optional[object] = None):
+    """Import the app with the real (non-mock) agent code path and swap in fake_client"""
+    os.environ["USE_MOCK_CLAUDE"] = "false"
+    os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+    import claude_client
+
+    if fake_client is not None:
+        claude_client.client = fake_client
+    import main     # after the swap, so RECORD_TRAFFIC_PATH wraps the fake client
+
+    install_probes(main.app, main, fake_client)
+    return main.app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median fake LLM latency")
+    parser.add_argument("--sigma", type=float, default=0.4, help="lognormal spread (0 = constant)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", metavar="TRACE", help="serve agent outputs recorded in TRACE")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier on recorded agent latency (with --replay)")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    if args.replay:
+        from recorder import load_trace
+        fake_client = ReplayClaude(load_trace(args.replay)[1], args.latency_scale, args.seed)
+    else:
+        fake_client = FakeClaude(args.latency_ms, args.sigma, args.error_rate, args.seed)
+    app = build_app(fake_client)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
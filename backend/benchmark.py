@@ -0,0 +1,335 @@
+"""
+Load-testing benchmark for the backend
+Starts bench_server.py (the real app over a latency-injecting fake LLM),
+then drives POST /api/questions, GET /api/queue and resolves against it
+while many /ws/queue subscribers listen, and reports throughput,
+p50/p95/p99 latency, event-loop lag and broadcast delivery delay as JSON
+
+    python benchmark.py --questions 500 --concurrency 50 --subscribers 200 \\
+        --latency-ms 800 --error-rate 0.02 --out results.json
+    python benchmark.py --server-env ASYNC_ENRICHMENT=true --server-env ANALYZER_BATCH_WINDOW_MS=20
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+COURSES = ["CS 200", "CS 300", "CS 400", "CS 540"]
+TOPICS = [
+    "segfault when deleting a node from my BST",
+    "recursion never reaches the base case",
+    "hash table resize loses entries",
+    "off-by-one error in binary search",
+    "null pointer exception in linked list insert",
+    "how do I prove this algorithm is O(n log n)",
+    "gradient descent loss is NaN after a few steps",
+    "dynamic programming table indices are wrong",
+]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """count, p50/p95/p99/max and mean in milliseconds (nearest-rank)"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": round(rank(0.50) * 1000, 2),
+        "p95_ms": round(rank(0.95) * 1000, 2),
+        "p99_ms": round(rank(0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class Endpoint:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.status: Dict[str, int] = {}
+
+    def record(self, started: float, status: Optional[int]):
+        key = str(status) if status is not None else "exception"
+        self.status[key] = self.status.get(key, 0) + 1
+        if status is None or status >= 400:
+            self.errors += 1
+        else:
+            self.latencies.append(time.perf_counter() - started)
+
+    def report(self, elapsed: float) -> dict:
+        ok = len(self.latencies)
+        return {
+            **percentiles(self.latencies),
+            "errors": self.errors,
+            "status": self.status,
+            "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class Subscriber:
+    """One /ws/queue client recording when each delta arrived"""
+
+    def __init__(self):
+        self.received: Dict[str, float] = {}
+        self.messages = 0
+        self.error: Optional[str] = None
+
+    async def run(self, url: str, ready: asyncio.Event, stop: asyncio.Event):
+        try:
+            async with websockets.connect(url, max_size=None, open_timeout=30) as ws:
+                await ws.recv()         # initial snapshot
+                ready.set()
+                while not stop.is_set():
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), 0.5)
+                    except asyncio.TimeoutError:
+                        continue
+                    now = time.time()
+                    self.messages += 1
+                    event = json.loads(raw)
+                    if event.get("type") != "queue_delta":
+                        continue
+                    if event["op"] == "added":
+                        self.received.setdefault(f"added:{event['entry']['queue_id']}", now)
+                    elif event["op"] == "removed":
+                        self.received.setdefault(f"removed:{event['queue_id']}", now)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            ready.set()
+
+
+class Benchmark:
+    def __init__(self, args):
+        self.args = args
+        self.base = f"http://{args.host}:{args.port}"
+        self.rng = random.Random(args.seed)
+        self.endpoints = {name: Endpoint() for name in ("submit", "queue", "resolve")}
+        self.to_resolve: asyncio.Queue = asyncio.Queue()
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, path: str, **kw):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kw)
+        except httpx.HTTPError:
+            self.endpoints[name].record(started, None)
+            return None
+        self.endpoints[name].record(started, response.status_code)
+        return response
+
+    def question(self, i: int) -> dict:
+        return {
+            "student_name": f"Load Student {i}",
+            "course": self.rng.choice(COURSES),
+            # Unique suffix so dedup doesn't short-circuit the pipeline
+            "question_text": f"{self.rng.choice(TOPICS)} (case {i})",
+            "code_snippet": None,
+        }
+
+    async def submitter(self, client: httpx.AsyncClient, ids: "asyncio.Queue[int]"):
+        while True:
+            try:
+                i = ids.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if self.args.rate:
+                await asyncio.sleep(max(0.0, self.start + i / self.args.rate - time.perf_counter()))
+            response = await self.request(client, "submit", "POST", "/api/questions", json=self.question(i))
+            if response is not None and response.status_code == 200:
+                if self.rng.random() < self.args.resolve_fraction:
+                    await self.to_resolve.put(response.json()["queue_id"])
+
+    async def reader(self, client: httpx.AsyncClient, stop: asyncio.Event):
+        while not stop.is_set():
+            await self.request(client, "queue", "GET", "/api/queue")
+            await asyncio.sleep(self.args.read_interval_ms / 1000)
+
+    async def resolver(self, client: httpx.AsyncClient):
+        while True:
+            queue_id = await self.to_resolve.get()
+            if queue_id is None:
+                return
+            await self.request(client, "resolve", "POST", f"/api/queue/{queue_id}/resolve")
+
+    async def run(self) -> dict:
+        args = self.args
+        limits = httpx.Limits(max_connections=args.concurrency + args.readers + args.resolvers + 4)
+        async with httpx.AsyncClient(base_url=self.base, timeout=120, limits=limits) as client:
+            await client.get("/bench/stats", params={"reset": True})
+
+            stop_ws = asyncio.Event()
+            subscribers = [Subscriber() for _ in range(args.subscribers)]
+            ready = [asyncio.Event() for _ in subscribers]
+            ws_url = f"ws://{args.host}:{args.port}/ws/queue"
+            ws_tasks = [asyncio.create_task(s.run(ws_url, r, stop_ws)) for s, r in zip(subscribers, ready)]
+            await asyncio.gather(*(r.wait() for r in ready))
+
+            ids: asyncio.Queue = asyncio.Queue()
+            for i in range(args.questions):
+                ids.put_nowait(i)
+            stop_readers = asyncio.Event()
+            self.start = time.perf_counter()
+            readers = [asyncio.create_task(self.reader(client, stop_readers)) for _ in range(args.readers)]
+            resolvers = [asyncio.create_task(self.resolver(client)) for _ in range(args.resolvers)]
+            await asyncio.gather(*(self.submitter(client, ids) for _ in range(args.concurrency)))
+            for _ in resolvers:
+                await self.to_resolve.put(None)
+            await asyncio.gather(*resolvers)
+            elapsed = time.perf_counter() - self.start
+            stop_readers.set()
+            await asyncio.gather(*readers)
+
+            await asyncio.sleep(args.drain_seconds)     # let the last broadcasts land
+            stop_ws.set()
+            await asyncio.gather(*ws_tasks)
+
+            server = (await client.get("/bench/stats")).json()
+            metrics = (await client.get("/api/metrics")).json()
+
+        return self.report(elapsed, subscribers, server, metrics)
+
+    def report(self, elapsed: float, subscribers: List[Subscriber], server: dict, metrics: dict) -> dict:
+        sent = server["broadcasts"]
+        delays: Dict[str, List[float]] = {"added": [], "removed": []}
+        expected = missed = 0
+        for subscriber in subscribers:
+            if subscriber.error:
+                continue
+            for key, sent_at in sent.items():
+                expected += 1
+                received_at = subscriber.received.get(key)
+                if received_at is None:
+                    missed += 1
+                else:
+                    delays[key.split(":")[0]].append(max(0.0, received_at - sent_at))
+
+        lag = server["event_loop_lag_seconds"]
+        return {
+            "config": {k: v for k, v in vars(self.args).items() if k not in ("out", "host", "port")},
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "git_revision": git_revision(),
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "endpoints": {name: endpoint.report(elapsed) for name, endpoint in self.endpoints.items()},
+            "event_loop_lag": percentiles(lag),
+            "broadcast_delivery": {
+                "subscribers": len(subscribers),
+                "subscriber_errors": sum(1 for s in subscribers if s.error),
+                "first_error": next((s.error for s in subscribers if s.error), None),
+                "messages_received": sum(s.messages for s in subscribers),
+                "expected_deliveries": expected,
+                "missed_deliveries": missed,
+                "added": percentiles(delays["added"]),
+                "removed": percentiles(delays["removed"]),
+            },
+            "fake_llm": server["fake_llm"],
+            "server_metrics": {k: metrics.get(k) for k in ("llm_scheduler", "circuit_breakers", "agents")
+                               if k in metrics},
+        }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def emit(result: dict, path: Optional[str]):
+    """Pretty JSON to path, or stdout"""
+    output = json.dumps(result, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def start_server(host: str, port: int, server_args: List[str], server_env: List[str]) -> subprocess.Popen:
+    """bench_server.py in a subprocess; server_env holds KEY=VALUE overrides"""
+    env = dict(os.environ, LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"))
+    for pair in server_env:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.Popen(
+        [sys.executable, os.path.join(here, "bench_server.py"), "--host", host, "--port", str(port),
+         *server_args],
+        cwd=here, env=env,
+    )
+
+
+async def wait_ready(base: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"backend at {base} did not come up within {timeout:g}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200, help="questions to submit")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent submitters")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals/s (0 = as fast as possible)")
+    parser.add_argument("--subscribers", type=int, default=50, help="concurrent /ws/queue clients")
+    parser.add_argument("--readers", type=int, default=4, help="clients polling GET /api/queue")
+    parser.add_argument("--read-interval-ms", type=float, default=100.0)
+    parser.add_argument("--resolvers", type=int, default=2)
+    parser.add_argument("--resolve-fraction", type=float, default=1.0, help="share of entries resolved")
+    parser.add_argument("--drain-seconds", type=float, default=1.0)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="fake LLM median latency")
+    parser.add_argument("--sigma", type=float, default=0.4, help="fake LLM lognormal spread")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake LLM error probability")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the backend under test (repeatable)")
+    parser.add_argument("--url", help="benchmark an already running bench_server.py instead")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.url:
+        host, _, port = args.url.split("://")[-1].rstrip("/").partition(":")
+        args.host, args.port = host, int(port or 80)
+
+    server = None if args.url else start_server(
+        args.host, args.port,
+        ["--latency-ms", str(args.latency_ms), "--sigma", str(args.sigma),
+         "--error-rate", str(args.error_rate), "--seed", str(args.seed)],
+        args.server_env)
+    try:
+        asyncio.run(wait_ready(f"http://{args.host}:{args.port}"))
+        result = asyncio.run(Benchmark(args).run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    emit(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
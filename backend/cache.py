@@ -0,0 +1,143 @@
+"""
+Content-addressed caches for agent outputs
+In-process LRU by default, optional SQLite file so entries survive restarts
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def content_key(*parts: Optional[str]) -> str:
+    """Stable hash of whitespace/case-normalized parts"""
+    normalized = [_WHITESPACE_RE.sub(" ", part or "").strip().lower() for part in parts]
+    return hashlib.sha256("\x1f".join(normalized).encode()).hexdigest()
+
+
+class MemoryCache:
+    """LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._entries.get(key)
+        if item is None or item[0] < time.time():
+            if item is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (time.time() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return _stats(self.hits, self.misses, len(self))
+
+
+class DiskCache:
+    """
+    Same interface as MemoryCache, backed by a local SQLite file. Hits only
+    read; their recency is kept in memory and written with the next set()
+    (which is when eviction needs it) or every TOUCH_BATCH hits.
+    """
+    TOUCH_BATCH = 256
+
+    def __init__(self, path: str, max_size: int = 10000, ttl_seconds: float = 86400):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._touched: Dict[str, float] = {}    # key -> last hit, not yet written
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < now:
+            if row is not None:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return None
+
+        self._touched[key] = now
+        if len(self._touched) >= self.TOUCH_BATCH:
+            self._write_touches()
+            self._conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        self._touched.pop(key, None)
+        self._write_touches()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl_seconds, now)
+        )
+        self._conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,)
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return _stats(self.hits, self.misses, len(self))
+
+    def _write_touches(self):
+        """Batch pending hit times into the current transaction (caller commits)"""
+        if self._touched:
+            self._conn.executemany("UPDATE cache SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+
+def _stats(hits: int, misses: int, size: int) -> Dict[str, Any]:
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "size": size,
+        "hit_ratio": hits / lookups if lookups else 0.0,
+    }
+
+
+def make_cache(backend: str, path: str, max_size: int, ttl_seconds: float):
+    """Build a cache from config: 'memory' (default) or 'disk'"""
+    if backend == "disk":
+        return DiskCache(path, max_size, ttl_seconds)
+    return MemoryCache(max_size, ttl_seconds)
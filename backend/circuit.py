@@ -0,0 +1,147 @@
+"""
+Deadlines and circuit breaking for agent calls
+A breaker opens after repeated failures or slow responses, sends callers
+straight to their local fallback for a cool-down, then lets a single
+half-open probe decide whether to close again. Deadlines run from the
+moment the scheduler grants the call a slot, so a backlog of queued calls
+is not mistaken for a slow provider; the wait for that slot has its own
+bound, and overrunning it falls back without counting against the provider.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from llm_scheduler import on_slot_acquired
+from tracing import get_logger
+
+T = TypeVar("T")
+log = get_logger("circuit")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class QueueWaitExceeded(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, deadline_seconds: float, slow_seconds: float,
+                 failure_threshold: int = 5, cooldown_seconds: float = 30.0,
+                 max_queue_seconds: float = float("inf")):
+        self.name = name
+        self.deadline_seconds = deadline_seconds
+        self.slow_seconds = slow_seconds
+        self.max_queue_seconds = max_queue_seconds
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.queue_timeouts = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """May a call go to the provider now? (claims the probe when half-open)"""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record(self, ok: bool):
+        """Outcome of an admitted call; slow successes should be passed as failures"""
+        self._probing = False
+        if ok:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+                log.warning("circuit open", extra={"agent": self.name,
+                                                   "cooldown_seconds": self.cooldown_seconds,
+                                                   "consecutive_failures": self.consecutive_failures})
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+    async def call(self, call: Callable[[], Awaitable[T]], scale: float = 1.0) -> T:
+        """
+        Run call (which must go through llm_scheduler) with the deadline,
+        times scale for larger requests, starting once it holds a slot;
+        raises CircuitOpenError / QueueWaitExceeded / DeadlineExceeded
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit open")
+        deadline = self.deadline_seconds * scale
+        acquired = asyncio.get_running_loop().create_future()
+
+        def started():
+            if not acquired.done():
+                acquired.set_result(time.monotonic())
+
+        token = on_slot_acquired.set(started)
+        try:
+            task = asyncio.ensure_future(call())
+        finally:
+            on_slot_acquired.reset(token)
+        try:
+            done, _ = await asyncio.wait({task, acquired}, timeout=self.max_queue_seconds,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            self._probing = False
+            raise
+        if not done:
+            # Still queued: withdraw it; the provider never saw it, so no failure is recorded
+            task.cancel()
+            self._probing = False
+            self.queue_timeouts += 1
+            raise QueueWaitExceeded(f"{self.name} waited over {self.max_queue_seconds:g}s for a slot")
+
+        start = acquired.result() if acquired.done() else time.monotonic()
+        try:
+            # wait_for cancels the call on timeout, freeing its slot
+            result = await asyncio.wait_for(task, max(0.0, deadline - (time.monotonic() - start)))
+        except asyncio.TimeoutError:
+            self.record(False)
+            raise DeadlineExceeded(f"{self.name} exceeded {deadline:g}s deadline")
+        except asyncio.CancelledError:
+            task.cancel()
+            self._probing = False   # caller went away; not the provider's fault
+            raise
+        except Exception:
+            self.record(False)
+            raise
+        self.record(time.monotonic() - start <= self.slow_seconds * scale)
+        return result
+
+    def stats(self) -> dict:
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            state = HALF_OPEN
+        else:
+            state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "queue_timeouts": self.queue_timeouts,
+            "deadline_seconds": self.deadline_seconds,
+        }
@@ -4,19 +4,131 @@ Three specialized agents: Analyzer, Matcher, Synthesizer
 """
 import os
 import json
-from typing import List, Dict, Any
-from anthropic import Anthropic
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Dict, NamedTuple, Optional
+from anthropic import AsyncAnthropic
 from models import AnalyzerOutput, MatcherOutput, SynthesizerOutput, DifficultyLevel
+from cache import content_key, make_cache
+from matcher import local_match_ta, rank_tas
+from batcher import MicroBatcher
+from streaming import PartialJSONFields
+from llm_scheduler import LLMScheduler, PRIORITY_LIVE, PRIORITY_SIMULATION
+from circuit import CircuitBreaker
+from metrics import agent_calls, agent_latency, registry
+from tracing import get_logger
+
+log = get_logger("agents")
 
 # Toggle for mock mode during development
 USE_MOCK = os.getenv("USE_MOCK_CLAUDE", "false").lower() == "true"
 
-# Initialize Anthropic client
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY")) if not USE_MOCK else None
+# Initialize Anthropic client (async so agent calls never block the event loop)
+# The SDK timeout only reclaims abandoned requests; agents use the deadlines below
+client = AsyncAnthropic(
+    api_key=os.getenv("ANTHROPIC_API_KEY"),
+    timeout=float(os.getenv("LLM_CLIENT_TIMEOUT_SECONDS", "60"))
+) if not USE_MOCK else None
 
 MODEL = "claude-3-5-sonnet-20241022"
 MAX_TOKENS = 1000
 
+# Every Claude request goes through one scheduler: at most LLM_MAX_CONCURRENCY
+# in flight, optional per-minute request/token budgets (0 = unlimited), live
+# student traffic ahead of simulation traffic, identical requests coalesced
+llm_scheduler = LLMScheduler(
+    int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+    int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+)
+
+
+def estimate_tokens(request: Dict) -> int:
+    """Rough budget charge: prompt characters / 4 plus the output cap"""
+    chars = len(request.get("system", "")) + sum(len(str(m["content"])) for m in request["messages"])
+    return chars // 4 + request.get("max_tokens", MAX_TOKENS)
+
+
+async def call_claude(priority: int = PRIORITY_LIVE, **request):
+    """client.messages.create through the scheduler"""
+    return await llm_scheduler.run(
+        lambda: client.messages.create(**request),
+        priority,
+        estimate_tokens(request),
+        key=json.dumps(request, sort_keys=True, default=str)
+    )
+
+
+def record_agent(agent: str, source: str, started: float):
+    """Latency histogram + result-source counter for one agent result"""
+    agent_latency.observe(time.monotonic() - started, agent)
+    agent_calls.inc(agent, source)
+
+
+# Per-agent deadlines cover the API call from when it gets a scheduler slot;
+# a response slower than half its deadline counts against the breaker like a
+# failure. After CIRCUIT_FAILURE_THRESHOLD such calls in a row the agent goes
+# straight to its local fallback for CIRCUIT_COOLDOWN_SECONDS, then one probe
+# is let through. A call still waiting for a slot after LLM_MAX_QUEUE_WAIT_SECONDS
+# is withdrawn and falls back too (not counted as a failure), so the worst
+# case is queue wait + deadline.
+LLM_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("LLM_MAX_QUEUE_WAIT_SECONDS", "5"))
+
+
+def _breaker(agent: str, default_deadline: float) -> CircuitBreaker:
+    deadline = float(os.getenv(f"{agent.upper()}_TIMEOUT_SECONDS", default_deadline))
+    return CircuitBreaker(
+        agent,
+        deadline,
+        deadline / 2,
+        int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+        float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30")),
+        LLM_MAX_QUEUE_WAIT_SECONDS
+    )
+
+
+breakers = {
+    "analyzer": _breaker("analyzer", 8),
+    "matcher": _breaker("matcher", 5),
+    "synthesizer": _breaker("synthesizer", 10),
+}
+
+registry.gauge(
+    "oho_llm_scheduler_queue_depth", "Claude calls waiting for a scheduler slot",
+    read=lambda: {(): llm_scheduler.queue_depth})
+registry.gauge(
+    "oho_llm_scheduler_in_flight", "Claude calls in flight",
+    read=lambda: {(): llm_scheduler.in_flight})
+registry.gauge(
+    "oho_circuit_open", "1 while an agent's circuit breaker is open or half-open", ("agent",),
+    read=lambda: {(name,): float(b.state != "closed") for name, b in breakers.items()})
+
+# TA matching: "local" (deterministic scoring, default), "hybrid" (local,
+# with the LLM breaking near-ties) or "llm" (always ask the model)
+MATCHER_MODE = os.getenv("MATCHER_MODE", "local").lower()
+MATCHER_TIE_MARGIN = float(os.getenv("MATCHER_TIE_MARGIN", "5"))
+
+# Analyzer result cache keyed on normalized (course, question, code)
+# ANALYZER_CACHE=memory (default) or disk (SQLite file, survives restarts)
+analyzer_cache = make_cache(
+    os.getenv("ANALYZER_CACHE", "memory").lower(),
+    os.getenv("ANALYZER_CACHE_PATH", "analyzer_cache.db"),
+    int(os.getenv("ANALYZER_CACHE_SIZE", "1024")),
+    float(os.getenv("ANALYZER_CACHE_TTL_SECONDS", "3600"))
+)
+registry.counter(
+    "oho_analyzer_cache_lookups_total", "Analyzer cache lookups", ("result",),
+    read=lambda: {("hit",): analyzer_cache.hits, ("miss",): analyzer_cache.misses})
+
+# Analyzer batching: questions are analyzed up to ANALYZER_BATCH_SIZE per
+# request. ANALYZER_BATCH_WINDOW_MS > 0 also holds single submissions that
+# long so concurrent ones share a request (0 = analyze immediately).
+ANALYZER_BATCH_SIZE = int(os.getenv("ANALYZER_BATCH_SIZE", "20"))
+ANALYZER_BATCH_WINDOW_MS = float(os.getenv("ANALYZER_BATCH_WINDOW_MS", "0"))
+analyzer_batcher = (MicroBatcher(lambda requests: analyze_questions(requests),
+                                 ANALYZER_BATCH_WINDOW_MS / 1000, ANALYZER_BATCH_SIZE)
+                    if ANALYZER_BATCH_WINDOW_MS > 0 else None)
+
 
 # ============================================================================
 # AGENT 1: QUESTION ANALYZER
@@ -43,35 +155,146 @@ Rules:
 - Output MUST be valid JSON only, no markdown, no explanation"""
 
 
-def analyze_question(student_name: str, course: str, question_text: str,
-                     code_snippet: str = None) -> AnalyzerOutput:
+ANALYZER_BATCH_SYSTEM_PROMPT = ANALYZER_SYSTEM_PROMPT.replace(
+    "Analyze student questions", "Analyze a numbered list of student questions"
+).replace(
+    "Output ONLY valid JSON with this exact schema:",
+    "Output ONLY a valid JSON array with one object per question, in the same order, each with this exact schema:"
+)
+
+
+class AnalyzerRequest(NamedTuple):
+    student_name: str
+    course: str
+    question_text: str
+    code_snippet: Optional[str] = None
+
+
+# An analyzer backend turns a batch of requests into outputs in the same
+# order; None marks a question it could not analyze
+AnalyzerBackend = Callable[[List[AnalyzerRequest]], Awaitable[List[Optional[AnalyzerOutput]]]]
+
+
+async def analyze_question(student_name: str, course: str, question_text: str,
+                           code_snippet: str = None) -> AnalyzerOutput:
     """
     Agent 1: Analyze question and extract metadata
     """
-    if USE_MOCK:
-        return _mock_analyzer(question_text)
+    request = AnalyzerRequest(student_name, course, question_text, code_snippet)
+    if analyzer_batcher:
+        return await analyzer_batcher.submit(request)
+    return (await analyze_questions([request]))[0]
+
+
+async def analyze_questions(requests: List[AnalyzerRequest]) -> List[AnalyzerOutput]:
+    """
+    Agent 1 over many questions: cache hits are answered directly, the rest
+    go to the analyzer backend in chunks of ANALYZER_BATCH_SIZE
+    """
+    started = time.monotonic()
+    keys = [content_key(r.course, r.question_text, r.code_snippet) for r in requests]
+    results: Dict[str, AnalyzerOutput] = {}
+    sources: Dict[str, str] = {}
+    misses: Dict[str, AnalyzerRequest] = {}
+    for key, request in zip(keys, requests):
+        cached = analyzer_cache.get(key)
+        if cached is not None:
+            results[key] = AnalyzerOutput(**cached)
+            sources[key] = "cached"
+        else:
+            misses.setdefault(key, request)  # identical questions are analyzed once
+
+    miss_keys = list(misses)
+    chunks = [miss_keys[i:i + ANALYZER_BATCH_SIZE] for i in range(0, len(miss_keys), ANALYZER_BATCH_SIZE)]
+    outputs = await asyncio.gather(*(analyzer_backend([misses[k] for k in chunk]) for chunk in chunks))
+    for chunk, chunk_outputs in zip(chunks, outputs):
+        for key, output in zip(chunk, chunk_outputs):
+            if output is None:
+                results[key] = _mock_analyzer(misses[key].question_text)
+                sources[key] = "fallback"
+            else:
+                results[key] = output
+                sources[key] = "mock" if USE_MOCK else "llm"
+                analyzer_cache.set(key, output.model_dump(mode="json"))
+
+    for key in keys:
+        record_agent("analyzer", sources[key], started)
+    return [results[key] for key in keys]
+
+
+def _analyzer_message(request: AnalyzerRequest) -> str:
+    user_message = f"""Student: {request.student_name}
+Course: {request.course}
+Question: {request.question_text}"""
+
+    if request.code_snippet:
+        user_message += f"\n\nCode:\n{request.code_snippet}"
+    return user_message
+
+
+async def llm_analyzer_backend(requests: List[AnalyzerRequest]) -> List[Optional[AnalyzerOutput]]:
+    """One Claude request per batch; a failed batch is retried question by question"""
+    if len(requests) == 1:
+        return [await _llm_analyze_one(requests[0])]
+
+    user_message = "\n\n".join(
+        f"### Question {i}\n{_analyzer_message(request)}" for i, request in enumerate(requests, 1)
+    )
+    try:
+        # Output grows with the batch, the prompt overhead doesn't
+        response = await breakers["analyzer"].call(lambda: call_claude(
+            model=MODEL,
+            max_tokens=MAX_TOKENS * len(requests),
+            system=ANALYZER_BATCH_SYSTEM_PROMPT,
+            messages=[{"role": "user", "content": user_message}]
+        ), scale=1 + 0.25 * (len(requests) - 1))
 
-    user_message = f"""Student: {student_name}
-Course: {course}
-Question: {question_text}"""
+        results = json.loads(response.content[0].text)
+        if len(results) != len(requests):
+            raise ValueError(f"expected {len(requests)} analyses, got {len(results)}")
+        return [AnalyzerOutput(**result) for result in results]
+
+    except Exception as e:
+        log.warning("analyzer batch failed, retrying per question",
+                    extra={"questions": len(requests), "error": str(e)})
+        return list(await asyncio.gather(*(_llm_analyze_one(request) for request in requests)))
 
-    if code_snippet:
-        user_message += f"\n\nCode:\n{code_snippet}"
 
+async def _llm_analyze_one(request: AnalyzerRequest) -> Optional[AnalyzerOutput]:
     try:
-        response = client.messages.create(
+        response = await breakers["analyzer"].call(lambda: call_claude(
             model=MODEL,
             max_tokens=MAX_TOKENS,
             system=ANALYZER_SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": user_message}]
-        )
+            messages=[{"role": "user", "content": _analyzer_message(request)}]
+        ))
 
         result = json.loads(response.content[0].text)
         return AnalyzerOutput(**result)
 
     except Exception as e:
-        print(f"Analyzer error: {e}")
-        return _mock_analyzer(question_text)
+        log.warning("analyzer fell back", extra={"error": str(e)})
+        return None
+
+
+async def stub_analyzer_backend(requests: List[AnalyzerRequest]) -> List[Optional[AnalyzerOutput]]:
+    """Offline stand-in for the API (tests, load runs)"""
+    return [_mock_analyzer(request.question_text) for request in requests]
+
+
+analyzer_backend: AnalyzerBackend = stub_analyzer_backend if USE_MOCK else llm_analyzer_backend
+
+
+def set_analyzer_backend(backend: AnalyzerBackend):
+    global analyzer_backend
+    analyzer_backend = backend
+
+
+def wrap_client(wrapper: Callable[[AsyncAnthropic], object]):
+    """Put a proxy (e.g. the traffic recorder) in front of the API client"""
+    global client
+    if client is not None:
+        client = wrapper(client)
 
 
 def _mock_analyzer(question_text: str) -> AnalyzerOutput:
@@ -114,16 +337,29 @@ Rules:
 - Output MUST be valid JSON only, no markdown"""
 
 
-def match_ta(analyzer_output: AnalyzerOutput, tas: List[Dict], queue_counts: Dict[int, int],
-             preferred_ta_id: int = None) -> MatcherOutput:
+async def match_ta(analyzer_output: AnalyzerOutput, tas: List[Dict], queue_counts: Dict[int, int],
+                   preferred_ta_id: int = None,
+                   queue_minutes: Dict[int, int] = None) -> MatcherOutput:
     """
     Agent 2: Match question to optimal TA
     """
-    if USE_MOCK:
-        return _mock_matcher(tas)
+    started = time.monotonic()
+    if USE_MOCK or MATCHER_MODE == "local":
+        record_agent("matcher", "local", started)
+        return local_match_ta(analyzer_output, tas, queue_counts, preferred_ta_id, queue_minutes)
+
+    if MATCHER_MODE == "hybrid":
+        ranked = rank_tas(analyzer_output, tas, queue_counts, preferred_ta_id, queue_minutes)
+        tied = [ta for score, ta, _ in ranked if ranked[0][0] - score <= MATCHER_TIE_MARGIN]
+        if len(tied) < 2:
+            record_agent("matcher", "local", started)
+            return local_match_ta(analyzer_output, tas, queue_counts, preferred_ta_id, queue_minutes)
+        # Only the near-tied TAs go to the model as a tie-breaker
+        tas = tied
 
     tas_info = "\n".join([
         f"TA {ta['id']}: {ta['name']} | Expertise: {', '.join(ta['expertise_tags'])} | Queue: {queue_counts.get(ta['id'], 0)} students"
+        + (f" (~{queue_minutes.get(ta['id'], 0)} min backlog)" if queue_minutes else "")
         for ta in tas
     ])
 
@@ -142,29 +378,22 @@ Available TAs:
         user_message += f"\nStudent prefers TA ID: {preferred_ta_id}"
 
     try:
-        response = client.messages.create(
+        response = await breakers["matcher"].call(lambda: call_claude(
             model=MODEL,
             max_tokens=MAX_TOKENS,
             system=MATCHER_SYSTEM_PROMPT,
             messages=[{"role": "user", "content": user_message}]
-        )
+        ))
 
         result = json.loads(response.content[0].text)
-        return MatcherOutput(**result)
+        matcher_output = MatcherOutput(**result)
+        record_agent("matcher", "llm", started)
+        return matcher_output
 
     except Exception as e:
-        print(f"Matcher error: {e}")
-        return _mock_matcher(tas)
-
-
-def _mock_matcher(tas: List[Dict]) -> MatcherOutput:
-    """Fallback mock for demos"""
-    return MatcherOutput(
-        recommended_ta_id=tas[0]['id'] if tas else 1,
-        alternative_tas=[tas[1]['id']] if len(tas) > 1 else [],
-        priority_score=85.0,
-        rationale="Mock match - would use expertise and queue analysis in production"
-    )
+        log.warning("matcher fell back", extra={"error": str(e)})
+        record_agent("matcher", "fallback", started)
+        return local_match_ta(analyzer_output, tas, queue_counts, preferred_ta_id, queue_minutes)
 
 
 # ============================================================================
@@ -177,10 +406,10 @@ Your job: Analyze similar past questions and provide guidance to TAs and student
 
 Output ONLY valid JSON with this exact schema:
 {
-  "similar_question_ids": [list of integer IDs],
-  "similarity_explanation": "why these questions are relevant",
+  "student_friendly_hint": "non-spoiler hint for student while they wait",
   "suggested_answer_outline": "bullet-point plan for TA to explain/solve (3-5 steps)",
-  "student_friendly_hint": "non-spoiler hint for student while they wait"
+  "similar_question_ids": [list of integer IDs],
+  "similarity_explanation": "why these questions are relevant"
 }
 
 Rules:
@@ -190,13 +419,26 @@ Rules:
 - Output MUST be valid JSON only, no markdown"""
 
 
-def synthesize_solution(question_text: str, analyzer_output: AnalyzerOutput,
-                       similar_kb_entries: List[Dict]) -> SynthesizerOutput:
+# Synthesizer fields forwarded while the response is still streaming; the
+# prompt lists them first so they arrive before the rest of the object
+STREAMED_SYNTHESIZER_FIELDS = ("student_friendly_hint", "suggested_answer_outline")
+
+
+async def synthesize_solution(question_text: str, analyzer_output: AnalyzerOutput,
+                              similar_kb_entries: List[Dict],
+                              on_partial: Optional[Callable[[Dict[str, str]], None]] = None) -> SynthesizerOutput:
     """
     Agent 3: Synthesize solution guidance from KB
+    on_partial, if given, receives {field: appended text} for the streamed
+    fields as the model produces them
     """
+    started = time.monotonic()
     if USE_MOCK:
-        return _mock_synthesizer(similar_kb_entries)
+        result = _mock_synthesizer(similar_kb_entries)
+        if on_partial:
+            on_partial({field: getattr(result, field) for field in STREAMED_SYNTHESIZER_FIELDS})
+        record_agent("synthesizer", "mock", started)
+        return result
 
     kb_info = "\n\n".join([
         f"KB Entry {entry['id']}:\nCategory: {entry['category']}\nTags: {', '.join(entry['tags'])}\nSummary: {entry['summary']}\nOutline: {entry['solution_outline']}"
@@ -214,21 +456,47 @@ Similar Past Questions:
 """
 
     try:
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=MAX_TOKENS,
-            system=SYNTHESIZER_SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": user_message}]
-        )
-
-        result = json.loads(response.content[0].text)
-        return SynthesizerOutput(**result)
+        if on_partial:
+            text = await breakers["synthesizer"].call(lambda: _stream_synthesis(user_message, on_partial))
+        else:
+            response = await breakers["synthesizer"].call(lambda: call_claude(
+                model=MODEL,
+                max_tokens=MAX_TOKENS,
+                system=SYNTHESIZER_SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": user_message}]
+            ))
+            text = response.content[0].text
+
+        result = json.loads(text)
+        synthesizer_output = SynthesizerOutput(**result)
+        record_agent("synthesizer", "llm", started)
+        return synthesizer_output
 
     except Exception as e:
-        print(f"Synthesizer error: {e}")
+        log.warning("synthesizer fell back", extra={"error": str(e)})
+        record_agent("synthesizer", "fallback", started)
         return _mock_synthesizer(similar_kb_entries)
 
 
+async def _stream_synthesis(user_message: str, on_partial: Callable[[Dict[str, str]], None]) -> str:
+    parser = PartialJSONFields(STREAMED_SYNTHESIZER_FIELDS)
+    parts = []
+    request = dict(
+        model=MODEL,
+        max_tokens=MAX_TOKENS,
+        system=SYNTHESIZER_SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": user_message}]
+    )
+    async with llm_scheduler.slot(PRIORITY_LIVE, estimate_tokens(request)):
+        async with client.messages.stream(**request) as stream:
+            async for text in stream.text_stream:
+                parts.append(text)
+                appended = parser.feed(text)
+                if appended:
+                    on_partial(appended)
+    return "".join(parts)
+
+
 def _mock_synthesizer(kb_entries: List[Dict]) -> SynthesizerOutput:
     """Fallback mock for demos"""
     return SynthesizerOutput(
@@ -2,22 +2,63 @@
 In-memory database for Office Hours Oracle
 Simple storage for hackathon demo
 """
-from typing import List, Optional
-from models import TA, Question, QueueEntry, KBEntry, QueueStatus
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+import os
+import numpy as np
+from models import (
+    TA, Question, QueueEntry, KBEntry, QueueStatus, AnalyzerOutput, SynthesizerOutput
+)
+from retrieval import VectorIndex
+from dedup import MinHashLSH, shingles
+from scheduling import Job, SchedulingPolicy, make_policy
+
+KB_CATEGORY_BOOST = 1.5
+KB_TEXT_WEIGHT = 3.0        # cosine (0-1) scaled to be worth up to ~3 shared tags
+KB_MIN_SIMILARITY = 0.2
+DUPLICATE_THRESHOLD = 0.7   # estimated Jaccard over text/code shingles
+DUPLICATE_MAX_AGE = timedelta(hours=6)
+
+# Order each TA's queue is worked in: fifo, shortest_job, weighted_fair, ...
+QUEUE_POLICY = os.getenv("QUEUE_POLICY", "fifo")
+make_policy(QUEUE_POLICY)   # fail at startup on a typo
 
 
 class Database:
     def __init__(self):
-        self.tas: List[TA] = []
-        self.questions: List[Question] = []
-        self.queue: List[QueueEntry] = []
-        self.kb_entries: List[KBEntry] = []
+        # Id-keyed tables (dicts keep insertion order, so iteration is still chronological)
+        self.tas: Dict[int, TA] = {}
+        self.questions: Dict[int, Question] = {}
+        self.queue: Dict[int, QueueEntry] = {}
+        self.kb_entries: Dict[int, KBEntry] = {}
+
+        # Non-DONE queue entries, so the live queue never walks resolved history
+        self.active_queue: Dict[int, QueueEntry] = {}
+
+        # KB inverted indexes: normalized tag / category -> KB entry ids
+        self._kb_tag_index: Dict[str, Set[int]] = {}
+        self._kb_category_index: Dict[str, Set[int]] = {}
+        self._kb_vectors = VectorIndex()
+
+        # Near-duplicate detection over question text + code
+        self._question_lsh = MinHashLSH()
+        self._queue_by_question: Dict[int, int] = {}
+
+        # Per-TA load over the active queue, maintained on every queue mutation
+        self._ta_queue_counts: Dict[int, int] = {}
+        self._ta_queue_minutes: Dict[int, int] = {}
+        # ...and each TA's active entries in QUEUE_POLICY order (see scheduling.py)
+        self._ta_schedules: Dict[int, SchedulingPolicy] = {}
 
         self._ta_counter = 0
         self._question_counter = 0
         self._queue_counter = 0
         self._kb_counter = 0
 
+        # Bumped on every mutation so readers can cache derived views per version
+        self.version = 0
+
         self._seed_data()
 
     def _seed_data(self):
@@ -43,72 +84,247 @@ class Database:
                                "Incorrect pointer arithmetic after malloc",
                                "1. Check malloc return value\n2. Verify sizeof() usage\n3. Check pointer arithmetic\n4. Use valgrind to detect issues")
 
+    def close(self):
+        """Release storage resources (no-op for the in-memory store)"""
+
+    def bump_version(self):
+        """Record an in-place change (e.g. agent outputs attached to a question)"""
+        self.version += 1
+
     # TA operations
     def add_ta(self, name: str, expertise_tags: List[str]) -> TA:
         self._ta_counter += 1
+        self.version += 1
         ta = TA(self._ta_counter, name, expertise_tags)
-        self.tas.append(ta)
+        self._store_ta(ta)
         return ta
 
+    def _store_ta(self, ta: TA):
+        self.tas[ta.id] = ta
+        self._ta_queue_counts.setdefault(ta.id, 0)
+        self._ta_queue_minutes.setdefault(ta.id, 0)
+
     def get_ta(self, ta_id: int) -> Optional[TA]:
-        return next((ta for ta in self.tas if ta.id == ta_id), None)
+        return self.tas.get(ta_id)
 
     def get_all_tas(self) -> List[TA]:
-        return [ta for ta in self.tas if ta.is_active]
+        return [ta for ta in self.tas.values() if ta.is_active]
 
     def get_ta_queue_count(self, ta_id: int) -> int:
-        return sum(1 for entry in self.queue
-                  if entry.assigned_ta_id == ta_id and entry.status != QueueStatus.DONE)
+        return self._ta_queue_counts.get(ta_id, 0)
+
+    def get_ta_queue_minutes(self, ta_id: int) -> int:
+        """Total estimated minutes of active questions assigned to a TA"""
+        return self._ta_queue_minutes.get(ta_id, 0)
+
+    def get_queue_counts(self) -> Dict[int, int]:
+        """Active queue count for every TA (snapshot copy)"""
+        return dict(self._ta_queue_counts)
+
+    def get_next_for_ta(self, ta_id: int) -> Optional[QueueEntry]:
+        """The active entry this TA should take next under QUEUE_POLICY (O(log n))"""
+        schedule = self._ta_schedules.get(ta_id)
+        job = schedule.peek() if schedule else None
+        return self.active_queue.get(job.id) if job else None
+
+    def _track_load(self, entry: QueueEntry, sign: int):
+        ta_id = entry.assigned_ta_id
+        self._ta_queue_counts[ta_id] = self._ta_queue_counts.get(ta_id, 0) + sign
+        self._ta_queue_minutes[ta_id] = (self._ta_queue_minutes.get(ta_id, 0)
+                                         + sign * entry.estimated_time_minutes)
+        schedule = self._ta_schedules.get(ta_id)
+        if schedule is None:
+            schedule = self._ta_schedules[ta_id] = make_policy(QUEUE_POLICY)
+        if sign > 0:
+            question = self.questions.get(entry.question_id)
+            schedule.push(Job(entry.id, entry.created_at.timestamp() / 60, entry.estimated_time_minutes,
+                              course=question.course if question else ""))
+        else:
+            schedule.remove(entry.id, served=entry.status == QueueStatus.DONE)
 
     # Question operations
     def add_question(self, student_name: str, course: str, text: str,
-                    code: Optional[str] = None, preferred_ta_id: Optional[int] = None) -> Question:
+                    code: Optional[str] = None, preferred_ta_id: Optional[int] = None,
+                    duplicate_of: Optional[int] = None, created_at: Optional[datetime] = None) -> Question:
         self._question_counter += 1
+        self.version += 1
         question = Question(self._question_counter, student_name, course, text, code, preferred_ta_id)
-        self.questions.append(question)
+        if created_at:
+            question.created_at = created_at
+        question.duplicate_of = duplicate_of
+        self._store_question(question)
         return question
 
+    def _store_question(self, question: Question, signature: Optional[np.ndarray] = None):
+        self.questions[question.id] = question
+        if signature is None:
+            self._question_lsh.add(question.id, shingles(question.text, question.code))
+        else:
+            self._question_lsh.add_signature(question.id, signature)
+
     def get_question(self, question_id: int) -> Optional[Question]:
-        return next((q for q in self.questions if q.id == question_id), None)
+        return self.questions.get(question_id)
+
+    def set_agent_outputs(self, question_id: int,
+                          analyzer_output: Optional[AnalyzerOutput] = None,
+                          synthesizer_output: Optional[SynthesizerOutput] = None) -> Optional[Question]:
+        """Attach agent outputs to a question (only the ones given are replaced)"""
+        question = self.get_question(question_id)
+        if question:
+            self.version += 1
+            if analyzer_output is not None:
+                question.analyzer_output = analyzer_output
+            if synthesizer_output is not None:
+                question.synthesizer_output = synthesizer_output
+        return question
+
+    def find_duplicate_question(self, course: str, text: str,
+                                code: Optional[str] = None) -> Optional[Question]:
+        """
+        Most similar recent question in the same course that already has
+        agent outputs attached, or None if nothing clears DUPLICATE_THRESHOLD
+        """
+        cutoff = datetime.now() - DUPLICATE_MAX_AGE
+        for question_id, similarity in self._question_lsh.query(shingles(text, code)):
+            if similarity < DUPLICATE_THRESHOLD:
+                break
+            question = self.questions[question_id]
+            if (question.course.lower() == course.lower()
+                    and question.created_at >= cutoff
+                    and question.analyzer_output):
+                return question
+        return None
 
     # Queue operations
     def add_to_queue(self, question_id: int, assigned_ta_id: int,
-                    estimated_time_minutes: int) -> QueueEntry:
+                    estimated_time_minutes: int, matched: bool = True,
+                    created_at: Optional[datetime] = None) -> QueueEntry:
+        """created_at is only passed when restoring an entry (it orders the TA's schedule)"""
         self._queue_counter += 1
-        entry = QueueEntry(self._queue_counter, question_id, assigned_ta_id, estimated_time_minutes)
-        self.queue.append(entry)
+        self.version += 1
+        entry = QueueEntry(self._queue_counter, question_id, assigned_ta_id, estimated_time_minutes,
+                           matched=matched)
+        if created_at:
+            entry.created_at = created_at
+        self._store_queue_entry(entry)
         return entry
 
+    def _store_queue_entry(self, entry: QueueEntry):
+        self.queue[entry.id] = entry
+        self._queue_by_question[entry.question_id] = entry.id
+        if entry.status != QueueStatus.DONE:
+            self.active_queue[entry.id] = entry
+            self._track_load(entry, 1)
+
     def get_queue_entry(self, queue_id: int) -> Optional[QueueEntry]:
-        return next((entry for entry in self.queue if entry.id == queue_id), None)
+        return self.queue.get(queue_id)
+
+    def get_queue_entry_for_question(self, question_id: int) -> Optional[QueueEntry]:
+        queue_id = self._queue_by_question.get(question_id)
+        return self.queue.get(queue_id) if queue_id is not None else None
 
     def get_active_queue(self) -> List[QueueEntry]:
-        return [entry for entry in self.queue if entry.status != QueueStatus.DONE]
+        return list(self.active_queue.values())
 
     def update_queue_status(self, queue_id: int, status: QueueStatus) -> Optional[QueueEntry]:
         entry = self.get_queue_entry(queue_id)
         if entry:
+            self.version += 1
+            was_active = entry.status != QueueStatus.DONE
             entry.status = status
+            if status == QueueStatus.DONE:
+                if was_active:
+                    del self.active_queue[queue_id]
+                    self._track_load(entry, -1)
+            elif not was_active:
+                self.active_queue[queue_id] = entry
+                self._track_load(entry, 1)
+        return entry
+
+    def reassign_queue_entry(self, queue_id: int, assigned_ta_id: int,
+                             estimated_time_minutes: int) -> Optional[QueueEntry]:
+        """Apply the final Matcher/Analyzer decision to a provisionally queued entry"""
+        entry = self.get_queue_entry(queue_id)
+        if entry:
+            self.version += 1
+            active = entry.status != QueueStatus.DONE
+            if active:
+                self._track_load(entry, -1)
+            entry.assigned_ta_id = assigned_ta_id
+            entry.estimated_time_minutes = estimated_time_minutes
+            entry.matched = True
+            if active:
+                self._track_load(entry, 1)
         return entry
 
     # KB operations
     def add_kb_entry(self, question_id: int, category: str, tags: List[str],
-                    summary: str, solution_outline: str) -> KBEntry:
+                    summary: str, solution_outline: str, created_at: Optional[datetime] = None) -> KBEntry:
         self._kb_counter += 1
+        self.version += 1
         entry = KBEntry(self._kb_counter, question_id, category, tags, summary, solution_outline)
-        self.kb_entries.append(entry)
+        if created_at:
+            entry.created_at = created_at
+        self._store_kb_entry(entry)
         return entry
 
-    def search_kb(self, tags: List[str], category: str = None) -> List[KBEntry]:
-        """Simple tag-based search for similar questions"""
-        results = []
-        for entry in self.kb_entries:
-            # Check tag overlap
-            common_tags = set(entry.tags) & set(tags)
-            if common_tags or (category and category.lower() in entry.category.lower()):
-                results.append(entry)
-        return results[:5]  # Return top 5
+    def _store_kb_entry(self, entry: KBEntry, index: bool = True):
+        """index=False leaves the text embedding to the caller (e.g. bulk restore of saved vectors)"""
+        self.kb_entries[entry.id] = entry
+        for tag in {_normalize(t) for t in entry.tags}:
+            self._kb_tag_index.setdefault(tag, set()).add(entry.id)
+        self._kb_category_index.setdefault(_normalize(entry.category), set()).add(entry.id)
+
+        if not index:
+            return
+        question = self.get_question(entry.question_id)
+        self._kb_vectors.add(entry.id, " ".join(
+            [entry.summary, entry.category, " ".join(entry.tags), question.text if question else ""]
+        ))
+
+    def search_kb(self, tags: List[str], category: str = None, limit: int = 5,
+                  query_text: Optional[str] = None) -> List[KBEntry]:
+        """
+        Ranked search for similar questions.
+        Score = number of shared tags, plus a boost for the same category,
+        plus weighted text similarity when query_text is given (catches
+        paraphrases that share no tags).
+        """
+        scores: Dict[int, float] = {}
+        for tag in {_normalize(t) for t in tags}:
+            for kb_id in self._kb_tag_index.get(tag, ()):
+                scores[kb_id] = scores.get(kb_id, 0) + 1
+        if category:
+            for kb_id in self._kb_category_index.get(_normalize(category), ()):
+                scores[kb_id] = scores.get(kb_id, 0) + KB_CATEGORY_BOOST
+        if query_text:
+            for kb_id, similarity in self._kb_vectors.search(query_text, limit * 2,
+                                                             KB_MIN_SIMILARITY):
+                scores[kb_id] = scores.get(kb_id, 0) + KB_TEXT_WEIGHT * similarity
+
+        # Bounded top-k; ties go to the most recent entry
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [self.kb_entries[kb_id] for kb_id, _ in top]
+
+
+def _normalize(term: str) -> str:
+    return term.strip().lower()
+
+
+def create_database() -> Database:
+    """
+    DB_BACKEND=memory (default), sqlite (durable tables, see sqlite_db.py)
+    or eventlog (journal + snapshots for fast restart, see event_log.py)
+    """
+    backend = os.getenv("DB_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        from sqlite_db import SQLiteDatabase
+        return SQLiteDatabase(os.getenv("DB_PATH", "office_hours.db"))
+    if backend == "eventlog":
+        from event_log import EventLogDatabase
+        return EventLogDatabase(os.getenv("DB_EVENT_LOG_DIR", "event_log"))
+    return Database()
 
 
 # Global database instance
-db = Database()
+db = create_database()
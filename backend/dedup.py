@@ -0,0 +1,80 @@
+"""
+Near-duplicate question detection
+MinHash signatures over text + code shingles, banded LSH for candidate lookup
+"""
+import re
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16              # 16 bands x 4 rows -> candidates from ~0.5 Jaccard up
+TEXT_SHINGLE = 4        # character n-grams of the question text
+CODE_SHINGLE = 3        # token n-grams of the code snippet
+
+_MASK = np.uint64(0xFFFFFFFF)
+_WHITESPACE_RE = re.compile(r"\s+")
+_CODE_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def shingles(text: str, code: Optional[str] = None) -> Set[str]:
+    normalized = _WHITESPACE_RE.sub(" ", text.lower()).strip()
+    result = {f"t:{normalized[i:i + TEXT_SHINGLE]}"
+              for i in range(max(len(normalized) - TEXT_SHINGLE + 1, 1))}
+    if code:
+        tokens = _CODE_TOKEN_RE.findall(code)
+        result |= {"c:" + " ".join(tokens[i:i + CODE_SHINGLE])
+                   for i in range(max(len(tokens) - CODE_SHINGLE + 1, 1))}
+    return result
+
+
+class MinHashLSH:
+    """Index of MinHash signatures; query returns (id, estimated Jaccard) pairs"""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self._rows = num_perm // bands
+        self._buckets: List[Dict[bytes, Set[int]]] = [{} for _ in range(bands)]   # one table per band
+        self._signatures: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, shingle_set: Set[str]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingle_set),
+                             dtype=np.uint64, count=len(shingle_set))
+        # Universal hashing mod 2^32 (uint64 wraparound is intentional)
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) & _MASK
+        return permuted.min(axis=1)
+
+    def add(self, item_id: int, shingle_set: Set[str]):
+        self.add_signature(item_id, self.signature(shingle_set))
+
+    def add_signature(self, item_id: int, sig: np.ndarray):
+        """Index a precomputed signature (e.g. restored from a snapshot)"""
+        self._signatures[item_id] = sig
+        for buckets, band_key in zip(self._buckets, self._band_keys(sig)):
+            buckets.setdefault(band_key, set()).add(item_id)
+
+    def get_signature(self, item_id: int) -> Optional[np.ndarray]:
+        return self._signatures.get(item_id)
+
+    def query(self, shingle_set: Set[str]) -> List[Tuple[int, float]]:
+        """Candidates sharing at least one band, best estimated similarity first"""
+        sig = self.signature(shingle_set)
+        candidates: Set[int] = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(sig)):
+            candidates |= buckets.get(band_key, set())
+
+        scored = [(item_id, float(np.mean(self._signatures[item_id] == sig)))
+                  for item_id in candidates]
+        return sorted(scored, key=lambda pair: pair[1], reverse=True)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        """Each band's rows as one bytes key (a void view splits the signature without a Python loop)"""
+        return np.ascontiguousarray(sig).view(f"V{self._rows * sig.itemsize}").tolist()
@@ -0,0 +1,335 @@
+"""
+Append-only event log for Office Hours Oracle
+Database mutations are journaled as JSON lines (group-committed by a
+background writer) and compacted into periodic snapshots, so a restart
+loads the latest snapshot and replays only the tail
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from db import Database
+from models import (
+    TA, Question, QueueEntry, KBEntry, QueueStatus, AnalyzerOutput, SynthesizerOutput
+)
+from tracing import get_logger
+
+SNAPSHOT_EVERY = 5000           # events between compacting snapshots
+FLUSH_INTERVAL_SECONDS = 0.05
+MAX_BATCH = 1000
+FSYNC = os.getenv("EVENT_LOG_FSYNC", "true").lower() == "true"
+
+LOG_FILE = "events.log"
+SNAPSHOT_FILE = "snapshot.json"
+
+_STOP = object()
+
+log = get_logger("event_log")
+
+
+class LogWriter(threading.Thread):
+    """Appends batches of log lines with one write + fsync per batch"""
+
+    def __init__(self, directory: str):
+        super().__init__(name="event-log-writer", daemon=True)
+        self.log_path = os.path.join(directory, LOG_FILE)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self._queue: "queue.Queue" = queue.Queue()
+
+    def append(self, line: str):
+        self._queue.put(line)
+
+    def snapshot(self, build: Callable[[], dict]):
+        """Write build() atomically, then start a fresh log (queued in order; built on this thread)"""
+        self._queue.put(build)
+
+    def flush(self):
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self.join()
+
+    def run(self):
+        log_file = open(self.log_path, "a", encoding="utf-8")
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+            while len(batch) < MAX_BATCH:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            stopping = any(item is _STOP for item in batch)
+            try:
+                log_file = self._write(log_file, batch)
+            except Exception:
+                log.exception("event log batch failed", extra={"items": len(batch)})
+            finally:
+                # Waiters always wake, even if their events were lost
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        item.set()
+        log_file.close()
+
+    def _write(self, log_file, batch: list):
+        lines: List[str] = []
+        for item in batch:
+            if isinstance(item, str):
+                lines.append(item)
+            elif callable(item):
+                self._commit(log_file, lines)
+                lines = []
+                log_file = self._compact(log_file, item)
+        self._commit(log_file, lines)
+        return log_file
+
+    def _compact(self, log_file, build: Callable[[], dict]):
+        """Snapshot, then truncate the log; on failure keep appending to the old one"""
+        try:
+            self._write_snapshot(build())
+        except Exception:
+            log.exception("snapshot failed; keeping the full log")
+            return log_file
+        log_file.close()
+        return open(self.log_path, "w", encoding="utf-8")
+
+    def _commit(self, log_file, lines: List[str]):
+        if not lines:
+            return
+        log_file.write("\n".join(lines) + "\n")
+        log_file.flush()
+        if FSYNC:
+            os.fsync(log_file.fileno())
+
+    def _write_snapshot(self, state: dict):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+
+class EventLogDatabase(Database):
+    """In-memory Database that journals every mutation and snapshots periodically"""
+
+    def __init__(self, directory: str, snapshot_every: int = SNAPSHOT_EVERY):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self._seq = 0
+        self._since_snapshot = 0
+        self._writer: Optional[LogWriter] = None
+        super().__init__()
+
+    def _seed_data(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_snapshot()
+        self._replay_log()
+
+        self._writer = LogWriter(self.directory)
+        self._writer.start()
+        if not self.tas:
+            super()._seed_data()
+
+    def flush(self):
+        self._writer.flush()
+
+    def close(self):
+        self.snapshot()
+        self._writer.close()
+
+    # Recovery
+    def _load_snapshot(self):
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+
+        self._seq = state["seq"]
+        for id, name, tags, is_active in state["tas"]:
+            self._store_ta(TA(id, name, tags, is_active))
+        for (id, student_name, course, text, code, preferred_ta_id, duplicate_of,
+             created_at, analyzer, synthesizer, signature) in state["questions"]:
+            question = Question(id, student_name, course, text, code, preferred_ta_id)
+            question.duplicate_of = duplicate_of
+            question.created_at = datetime.fromisoformat(created_at)
+            if analyzer:
+                question.analyzer_output = AnalyzerOutput(**analyzer)
+            if synthesizer:
+                question.synthesizer_output = SynthesizerOutput(**synthesizer)
+            # MinHash signatures are stored so boot skips re-shingling every question
+            self._store_question(question, np.frombuffer(bytes.fromhex(signature), dtype=np.uint32)
+                                 .astype(np.uint64))
+        for id, question_id, ta_id, minutes, status, created_at, matched in state["queue"]:
+            entry = QueueEntry(id, question_id, ta_id, minutes, QueueStatus(status), matched)
+            entry.created_at = datetime.fromisoformat(created_at)
+            self._store_queue_entry(entry)
+        # KB embeddings are stored too and indexed in one pass, so boot skips
+        # re-tokenizing every entry (snapshots from before they were saved lack them)
+        vector_ids, vectors = [], []
+        for id, question_id, category, tags, summary, outline, created_at, *vector in state["kb"]:
+            entry = KBEntry(id, question_id, category, tags, summary, outline)
+            entry.created_at = datetime.fromisoformat(created_at)
+            self._store_kb_entry(entry, index=not vector)
+            if vector:
+                vector_ids.append(id)
+                vectors.append(vector[0])
+        if vectors:
+            self._kb_vectors.add_vectors(
+                np.array(vector_ids, dtype=np.int64),
+                np.frombuffer(bytes.fromhex("".join(vectors)), dtype=np.float32).reshape(len(vectors), -1))
+        (self._ta_counter, self._question_counter,
+         self._queue_counter, self._kb_counter) = state["counters"]
+
+    def _replay_log(self):
+        path = os.path.join(self.directory, LOG_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # torn final write
+                if event["seq"] <= self._seq:
+                    continue
+                self._apply(event)
+                self._seq = event["seq"]
+
+    def _apply(self, event: dict):
+        op, args = event["op"], event["args"]
+        if args.get("created_at"):
+            # Restored before the entry is stored, so e.g. the TA schedules see the original time
+            args["created_at"] = datetime.fromisoformat(args["created_at"])
+        if op == "set_agent_outputs":
+            Database.set_agent_outputs(
+                self, args["question_id"],
+                AnalyzerOutput(**args["analyzer_output"]) if args.get("analyzer_output") else None,
+                SynthesizerOutput(**args["synthesizer_output"]) if args.get("synthesizer_output") else None
+            )
+        elif op == "update_queue_status":
+            Database.update_queue_status(self, args["queue_id"], QueueStatus(args["status"]))
+        else:
+            getattr(Database, op)(self, **args)
+
+    # Journaling
+    def _record(self, op: str, **args):
+        self._seq += 1
+        self._writer.append(json.dumps({"seq": self._seq, "op": op, "args": args},
+                                       separators=(",", ":")))
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Capture current state and hand it to the writer to compact the log.
+        Only references and small row tuples are taken here: questions, KB
+        entries, agent outputs and signatures are replaced rather than mutated,
+        and indexed KB vectors are never rewritten, so the writer thread
+        serializes them off the event loop.
+        """
+        self._since_snapshot = 0
+        seq = self._seq
+        counters = [self._ta_counter, self._question_counter, self._queue_counter, self._kb_counter]
+        tas = [(ta.id, ta.name, ta.expertise_tags, ta.is_active) for ta in self.tas.values()]
+        questions = [(q, q.analyzer_output, q.synthesizer_output, self._question_lsh.get_signature(q.id))
+                     for q in self.questions.values()]
+        queue = [(e.id, e.question_id, e.assigned_ta_id, e.estimated_time_minutes, e.status.value,
+                  e.created_at, e.matched) for e in self.queue.values()]
+        kb = list(self.kb_entries.values())
+        kb_ids, kb_vectors = self._kb_vectors.vectors()
+
+        def build() -> dict:
+            rows = {int(item_id): i for i, item_id in enumerate(kb_ids)}
+            return {
+                "seq": seq,
+                "counters": counters,
+                "tas": tas,
+                "questions": [
+                    [q.id, q.student_name, q.course, q.text, q.code, q.preferred_ta_id, q.duplicate_of,
+                     q.created_at.isoformat(),
+                     analyzer.model_dump(mode="json") if analyzer else None,
+                     synthesizer.model_dump(mode="json") if synthesizer else None,
+                     signature.astype(np.uint32).tobytes().hex()]
+                    for q, analyzer, synthesizer, signature in questions
+                ],
+                "queue": [[*row[:5], row[5].isoformat(), row[6]] for row in queue],
+                "kb": [[e.id, e.question_id, e.category, e.tags, e.summary, e.solution_outline,
+                        e.created_at.isoformat(), kb_vectors[rows[e.id]].tobytes().hex()] for e in kb],
+            }
+
+        self._writer.snapshot(build)
+
+    # Journaled mutations
+    def add_ta(self, name: str, expertise_tags: List[str]) -> TA:
+        ta = super().add_ta(name, expertise_tags)
+        self._record("add_ta", name=name, expertise_tags=expertise_tags)
+        return ta
+
+    def add_question(self, student_name: str, course: str, text: str,
+                    code: Optional[str] = None, preferred_ta_id: Optional[int] = None,
+                    duplicate_of: Optional[int] = None, created_at: Optional[datetime] = None) -> Question:
+        q = super().add_question(student_name, course, text, code, preferred_ta_id, duplicate_of, created_at)
+        self._record("add_question", student_name=student_name, course=course, text=text,
+                     code=code, preferred_ta_id=preferred_ta_id, duplicate_of=duplicate_of,
+                     created_at=q.created_at.isoformat())
+        return q
+
+    def set_agent_outputs(self, question_id: int,
+                          analyzer_output: Optional[AnalyzerOutput] = None,
+                          synthesizer_output: Optional[SynthesizerOutput] = None) -> Optional[Question]:
+        question = super().set_agent_outputs(question_id, analyzer_output, synthesizer_output)
+        if question:
+            self._record(
+                "set_agent_outputs", question_id=question_id,
+                analyzer_output=analyzer_output.model_dump(mode="json") if analyzer_output else None,
+                synthesizer_output=synthesizer_output.model_dump(mode="json") if synthesizer_output else None
+            )
+        return question
+
+    def add_to_queue(self, question_id: int, assigned_ta_id: int,
+                    estimated_time_minutes: int, matched: bool = True,
+                    created_at: Optional[datetime] = None) -> QueueEntry:
+        e = super().add_to_queue(question_id, assigned_ta_id, estimated_time_minutes, matched, created_at)
+        self._record("add_to_queue", question_id=question_id, assigned_ta_id=assigned_ta_id,
+                     estimated_time_minutes=estimated_time_minutes, matched=matched,
+                     created_at=e.created_at.isoformat())
+        return e
+
+    def reassign_queue_entry(self, queue_id: int, assigned_ta_id: int,
+                             estimated_time_minutes: int) -> Optional[QueueEntry]:
+        entry = super().reassign_queue_entry(queue_id, assigned_ta_id, estimated_time_minutes)
+        if entry:
+            self._record("reassign_queue_entry", queue_id=queue_id, assigned_ta_id=assigned_ta_id,
+                         estimated_time_minutes=estimated_time_minutes)
+        return entry
+
+    def update_queue_status(self, queue_id: int, status: QueueStatus) -> Optional[QueueEntry]:
+        entry = super().update_queue_status(queue_id, status)
+        if entry:
+            self._record("update_queue_status", queue_id=queue_id, status=status.value)
+        return entry
+
+    def add_kb_entry(self, question_id: int, category: str, tags: List[str],
+                    summary: str, solution_outline: str, created_at: Optional[datetime] = None) -> KBEntry:
+        e = super().add_kb_entry(question_id, category, tags, summary, solution_outline, created_at)
+        self._record("add_kb_entry", question_id=question_id, category=category, tags=tags,
+                     summary=summary, solution_outline=solution_outline,
+                     created_at=e.created_at.isoformat())
+        return e
@@ -0,0 +1,218 @@
+"""
+Admission control for Claude API calls
+Bounded concurrency, request/token per-minute budgets, priority ordering
+(live students ahead of simulation traffic) and single-flight coalescing
+of identical in-flight requests
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+PRIORITY_LIVE = 0
+PRIORITY_SIMULATION = 1
+
+# Called when the current task's call is granted a slot, so deadlines (circuit.py)
+# can start at the provider call rather than at the back of the queue
+on_slot_acquired: contextvars.ContextVar[Optional[Callable[[], None]]] = contextvars.ContextVar(
+    "on_slot_acquired", default=None)
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; a limit of 0 means unlimited"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._updated = time.monotonic()
+
+    def delay(self, amount: float) -> float:
+        """Seconds until amount is available (0 if it is now)"""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return missing / self._rate if missing > 0 else 0.0
+
+    def spend(self, amount: float):
+        if self.capacity:
+            self.level -= min(amount, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class SharedCall:
+    """One in-flight call and the callers waiting on it"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.started = False
+        self._hooks: List[Callable[[], None]] = []
+
+    def join(self):
+        self.waiters += 1
+        hook = on_slot_acquired.get()
+        if hook is None:
+            return
+        if self.started:
+            hook()
+        else:
+            self._hooks.append(hook)
+
+    def leave(self) -> bool:
+        """A waiter gave up; the last one out cancels the call (returns True)"""
+        self.waiters -= 1
+        if self.waiters == 0 and not self.task.done():
+            self.task.cancel()
+            return True
+        return False
+
+    def mark_started(self):
+        self.started = True
+        for hook in self._hooks:
+            hook()
+        self._hooks.clear()
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.max_concurrency = max_concurrency
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._waiting: List[tuple] = []     # heap of (priority, seq, tokens, enqueued_at, future)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._shared: Dict[str, SharedCall] = {}
+
+        self.calls = 0
+        self.coalesced = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def run(self, call: Callable[[], Awaitable[Any]], priority: int = PRIORITY_LIVE,
+                  tokens: int = 0, key: Optional[str] = None) -> Any:
+        """
+        Run call once a slot and budget are available. Callers passing the
+        same key while one is in flight share its result instead of calling;
+        the call is cancelled only once all of them have given up.
+        """
+        if key is None:
+            return await self._run(call, priority, tokens)
+
+        shared = self._shared.get(key)
+        if shared is not None:
+            self.coalesced += 1
+        else:
+            shared = self._shared[key] = SharedCall()
+            token = on_slot_acquired.set(shared.mark_started)
+            try:
+                shared.task = asyncio.ensure_future(self._run(call, priority, tokens))
+            finally:
+                on_slot_acquired.reset(token)
+            shared.task.add_done_callback(lambda _: self._forget(key, shared))
+        shared.join()
+        try:
+            # Shielded so one caller giving up doesn't cancel the call for the others
+            return await asyncio.shield(shared.task)
+        except asyncio.CancelledError:
+            if shared.leave():
+                self._forget(key, shared)   # later callers start afresh
+            raise
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_LIVE, tokens: int = 0):
+        """Hold a slot for the duration of the block (e.g. a streaming response)"""
+        await self._acquire(priority, tokens)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Waiting calls (may briefly include cancelled ones)"""
+        return len(self._waiting)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        waiting = [w for w in self._waiting if not w[4].done()]
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": len(waiting),
+            "queue_depth_by_priority": {
+                name: sum(1 for w in waiting if w[0] == priority)
+                for name, priority in (("live", PRIORITY_LIVE), ("simulation", PRIORITY_SIMULATION))
+            },
+            "oldest_wait_ms": round(max((now - w[3] for w in waiting), default=0.0) * 1000, 1),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "avg_wait_ms": round(self._total_wait / self.calls * 1000, 1) if self.calls else 0.0,
+            "max_wait_ms": round(self._max_wait * 1000, 1),
+        }
+
+    def _forget(self, key: str, shared: SharedCall):
+        if self._shared.get(key) is shared:
+            del self._shared[key]
+
+    async def _run(self, call, priority: int, tokens: int):
+        async with self.slot(priority, tokens):
+            return await call()
+
+    async def _acquire(self, priority: int, tokens: int):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._seq), tokens, time.monotonic(), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()     # granted just as the caller was cancelled
+            raise
+        hook = on_slot_acquired.get()
+        if hook is not None:
+            hook()
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiting and self._in_flight < self.max_concurrency:
+            priority, _, tokens, enqueued_at, future = self._waiting[0]
+            if future.done():       # cancelled while waiting
+                heapq.heappop(self._waiting)
+                continue
+
+            delay = max(self._requests.delay(1), self._tokens.delay(tokens))
+            if delay > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                return
+
+            heapq.heappop(self._waiting)
+            self._requests.spend(1)
+            self._tokens.spend(tokens)
+            self._in_flight += 1
+            waited = time.monotonic() - enqueued_at
+            self.calls += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            future.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
@@ -3,22 +3,79 @@ Office Hours Oracle - FastAPI Backend
 Multi-agent Claude system for optimizing CS office hours
 """
 import os
-from typing import List
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+import asyncio
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 import json
+import numpy as np
 
 from models import (
     QuestionSubmission, QuestionResponse, TAInfo, QueueEntryResponse,
-    QueueStatus, AnalyzerOutput
+    QueueStatus, AnalyzerOutput, MatcherOutput, SynthesizerOutput, SimulationRequest,
+    DecideActionsRequest
 )
 from db import db
-from claude_client import analyze_question, match_ta, synthesize_solution
+from claude_client import (
+    AnalyzerRequest, analyze_question, analyze_questions, breakers, llm_scheduler, match_ta,
+    synthesize_solution, wrap_client
+)
+from matcher import heuristic_analysis, local_match_ta
+from workers import WorkerPool
+from recorder import RecordingClient, TrafficRecorder
+from sim_engine import decide_actions, run_simulation
+from scheduling import POLICIES, Job, make_policy
+from tracing import (
+    PROFILER_ENABLED, SLOW_TRACE_MS, configure_logging, current_trace, get_logger, profiler,
+    slow_traces, span, start_trace
+)
+from metrics import (
+    registry, http_requests, http_latency, questions_submitted, questions_resolved,
+    wait_saved_minutes, broadcast_latency
+)
 
 load_dotenv()
+configure_logging()
+log = get_logger("api")
+
+TRACE_HEADER = "X-Trace-Id"
+
+# Submission mode: by default POST /api/questions waits for all agents.
+# ASYNC_ENRICHMENT=true queues the student immediately with a heuristic TA
+# and runs the agents on a background pool, pushing results over /ws/queue.
+ASYNC_ENRICHMENT = os.getenv("ASYNC_ENRICHMENT", "false").lower() == "true"
+ENRICHMENT_STAGES = ["analyzer", "matcher", "synthesizer"]
+enrichment_pool = WorkerPool("enrichment", int(os.getenv("ENRICHMENT_WORKERS", "8")))
+enriching: Set[int] = set()     # queue ids with an enrichment job outstanding
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "200"))   # per POST /api/questions/batch
+
+# RECORD_TRAFFIC_PATH=session.jsonl.gz records request arrivals and Claude
+# outputs for replay.py (off by default)
+RECORD_TRAFFIC_PATH = os.getenv("RECORD_TRAFFIC_PATH", "")
+recorder = TrafficRecorder(RECORD_TRAFFIC_PATH) if RECORD_TRAFFIC_PATH else None
+if recorder:
+    wrap_client(lambda inner: RecordingClient(inner, recorder))
+
 
-app = FastAPI(title="Office Hours Oracle")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Resume interrupted enrichment on startup; drain workers and close storage on shutdown"""
+    resume_enrichment()
+    yield
+    await enrichment_pool.stop()
+    db.close()
+    if recorder:
+        recorder.close()
+
+
+app = FastAPI(title="Office Hours Oracle", lifespan=lifespan)
 
 # CORS for frontend - allow all origins for demo (hackathon only!)
 app.add_middleware(
@@ -27,36 +84,181 @@ app.add_middleware(
     allow_credentials=False,  # Must be False when allow_origins is "*"
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
 
+@app.middleware("http")
+async def trace_and_measure(request: Request, call_next):
+    """One trace per request (id echoed in X-Trace-Id) plus request metrics"""
+    started = time.perf_counter()
+    with start_trace(request.method, request.headers.get(TRACE_HEADER)) as trace:
+        response = await call_next(request)
+        # Route template, not the raw path, so ids don't explode label cardinality
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        trace.name = f"{request.method} {path}"
+        trace.attrs["status"] = response.status_code
+    response.headers[TRACE_HEADER] = trace.trace_id
+    http_requests.inc(request.method, path, str(response.status_code))
+    http_latency.observe(time.perf_counter() - started, request.method, path)
+    return response
+
+
+registry.gauge("oho_queue_length", "Active queue entries per TA", ("ta",),
+               read=lambda: {(str(ta_id),): count for ta_id, count in db.get_queue_counts().items()})
+registry.gauge("oho_queue_minutes", "Estimated minutes of active questions per TA", ("ta",),
+               read=lambda: {(str(ta.id),): db.get_ta_queue_minutes(ta.id) for ta in db.get_all_tas()})
+registry.gauge("oho_ws_connections", "Open WebSocket connections",
+               read=lambda: {(): len(manager.active_connections)})
+registry.gauge("oho_enrichment_pending", "Enrichment jobs waiting for a worker",
+               read=lambda: {(): enrichment_pool.pending})
+
+
+def resume_enrichment():
+    # Entries queued before a restart may still be waiting on the matcher or the hint
+    for entry in db.get_active_queue():
+        if not entry.matched or db.get_question(entry.question_id).synthesizer_output is None:
+            schedule_enrichment(entry.id)
+
+
 # ============================================================================
 # WebSocket Connection Manager
 # ============================================================================
 
+SEND_QUEUE_SIZE = 256        # pending messages per client before it must resync
+SEND_TIMEOUT_SECONDS = 5.0   # a single send stalled this long evicts the client
+
+_RESYNC = object()           # queue marker: send a fresh snapshot instead of backlog
+
+
+class ClientChannel:
+    """One WebSocket with a bounded outbound queue drained by its own task"""
+
+    def __init__(self, websocket: WebSocket, snapshot_factory, on_dead):
+        self.websocket = websocket
+        self.snapshot_factory = snapshot_factory
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self._on_dead = on_dead
+        self._task = asyncio.create_task(self._drain())
+
+    def enqueue(self, payload) -> bool:
+        """Non-blocking; on overflow drop the backlog and schedule a snapshot"""
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC)
+            return False
+
+    def request_resync(self):
+        self.enqueue(_RESYNC)
+
+    def close(self):
+        self._task.cancel()
+
+    async def _drain(self):
+        try:
+            while True:
+                payload = await self.queue.get()
+                if payload is _RESYNC:
+                    payload = self.snapshot_factory()
+                await asyncio.wait_for(self.websocket.send_text(payload), SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Closed or stalled socket: evict it
+            self._on_dead(self)
+
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Dict[WebSocket, ClientChannel] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, snapshot_factory):
+        """Accept and queue an initial snapshot ahead of any deltas"""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        channel = ClientChannel(websocket, snapshot_factory, self._evict)
+        channel.request_resync()
+        self.active_connections[websocket] = channel
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        """Broadcast queue updates to all connected clients"""
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        channel = self.active_connections.pop(websocket, None)
+        if channel:
+            channel.close()
+
+    def send(self, websocket: WebSocket, message: dict):
+        channel = self.active_connections.get(websocket)
+        if channel:
+            channel.enqueue(json.dumps(message))
+
+    def request_resync(self, websocket: WebSocket):
+        channel = self.active_connections.get(websocket)
+        if channel:
+            channel.request_resync()
+
+    def broadcast(self, message: dict):
+        """Serialize once and enqueue for every client; never waits on a socket"""
+        started = time.perf_counter()
+        payload = json.dumps(message)
+        for channel in list(self.active_connections.values()):
+            channel.enqueue(payload)
+        broadcast_latency.observe(time.perf_counter() - started)
+
+    def _evict(self, channel: ClientChannel):
+        if self.active_connections.get(channel.websocket) is channel:
+            del self.active_connections[channel.websocket]
+            asyncio.create_task(_close_quietly(channel.websocket))
+            log.warning("websocket evicted", extra={"connections": len(self.active_connections)})
+
+
+async def _close_quietly(websocket: WebSocket):
+    try:
+        await websocket.close()
+    except Exception:
+        pass
 
 
 manager = ConnectionManager()
 
 
+class QueueEventLog:
+    """
+    Sequence-numbered queue deltas ("added" / "updated" / "removed").
+    Keeps a bounded replay window so a client that notices a gap in seq
+    can catch up without a full snapshot.
+    """
+
+    def __init__(self, history: int = 1000):
+        self.seq = 0
+        self._history = deque(maxlen=history)
+
+    def record(self, op: str, **payload) -> dict:
+        self.seq += 1
+        event = {"type": "queue_delta", "seq": self.seq, "op": op, **payload}
+        self._history.append(event)
+        return event
+
+    def since(self, seq: int) -> Optional[List[dict]]:
+        """
+        Events after seq, or None when the client needs a full snapshot: the
+        events fell out of the window, or seq is ahead of ours (state from
+        before a restart, or a bogus cursor)
+        """
+        if seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        if not self._history or seq < self._history[0]["seq"] - 1:
+            return None
+        return [event for event in self._history if event["seq"] > seq]
+
+
+queue_events = QueueEventLog()
+
+
 # ============================================================================
 # Helper Functions
 # ============================================================================
@@ -66,9 +268,10 @@ def get_queue_response(queue_entry) -> QueueEntryResponse:
     question = db.get_question(queue_entry.question_id)
     ta = db.get_ta(queue_entry.assigned_ta_id)
 
-    # Get analyzer output if available (stored in question for demo)
-    analyzer_output = getattr(question, 'analyzer_output', None)
-    synthesizer_output = getattr(question, 'synthesizer_output', None)
+    # Agent outputs may be missing (e.g. seeded questions, pending enrichment)
+    analyzer_output = question.analyzer_output
+    synthesizer_output = question.synthesizer_output
+    stages = get_enrichment_stages(question, queue_entry)
 
     return QueueEntryResponse(
         queue_id=queue_entry.id,
@@ -83,17 +286,135 @@ def get_queue_response(queue_entry) -> QueueEntryResponse:
         status=queue_entry.status,
         brief_summary=analyzer_output.brief_summary if analyzer_output else "",
         suggested_answer_outline=synthesizer_output.suggested_answer_outline if synthesizer_output else None,
-        student_friendly_hint=synthesizer_output.student_friendly_hint if synthesizer_output else None
+        student_friendly_hint=synthesizer_output.student_friendly_hint if synthesizer_output else None,
+        duplicate_of_queue_id=get_duplicate_queue_id(question),
+        enrichment_status="pending" if queue_entry.id in enriching else "complete",
+        enrichment_stages=stages
     )
 
 
-async def broadcast_queue_update():
-    """Send current queue state to all WebSocket clients"""
-    queue_data = {
-        "type": "queue_update",
-        "queue": [get_queue_response(entry).dict() for entry in db.get_active_queue()]
+def get_enrichment_stages(question, queue_entry) -> List[str]:
+    """Agent stages that have finished for this question"""
+    done = {
+        "analyzer": question.analyzer_output is not None,
+        "matcher": queue_entry.matched,
+        "synthesizer": question.synthesizer_output is not None,
     }
-    await manager.broadcast(queue_data)
+    return [stage for stage in ENRICHMENT_STAGES if done[stage]]
+
+
+def get_duplicate_queue_id(question):
+    """Active queue entry of the question this one duplicates, so a TA can answer both together"""
+    if question.duplicate_of is None:
+        return None
+    original = db.get_queue_entry_for_question(question.duplicate_of)
+    if original and original.status != QueueStatus.DONE:
+        return original.id
+    return None
+
+
+class QueueSnapshotCache:
+    """
+    Active queue serialized once per Database version and shared by
+    GET /api/queue and every WebSocket snapshot
+    """
+
+    def __init__(self):
+        self._version = -1
+        self._json = "[]"
+        self._bytes = b"[]"
+
+    def queue_json(self) -> str:
+        self._refresh()
+        return self._json
+
+    def queue_bytes(self) -> bytes:
+        self._refresh()
+        return self._bytes
+
+    def _refresh(self):
+        if self._version != db.version:
+            self._json = json.dumps(
+                [get_queue_response(entry).dict() for entry in db.get_active_queue()]
+            )
+            self._bytes = self._json.encode()
+            self._version = db.version
+
+
+queue_snapshot_cache = QueueSnapshotCache()
+
+
+def get_queue_snapshot() -> str:
+    """Serialized full active queue tagged with the current event seq"""
+    return (f'{{"type": "queue_snapshot", "seq": {queue_events.seq}, '
+            f'"queue": {queue_snapshot_cache.queue_json()}}}')
+
+
+class HintStreams:
+    """
+    Synthesizer text for queue entries still being enriched, forwarded as it
+    streams: the hint to that student's SSE subscribers, hint and outline to
+    the TA dashboard as unsequenced "hint_delta" WebSocket messages (the
+    final "updated" queue delta carries the authoritative values). If the
+    result differs from what streamed (the stream was cut off and a fallback
+    took its place), a last hint_delta with "replaced": true carries the
+    full final text so clients overwrite rather than append.
+    """
+
+    def __init__(self):
+        self._partial: Dict[int, Dict[str, str]] = {}
+        self._subscribers: Dict[int, List[asyncio.Queue]] = {}
+
+    def publish(self, queue_id: int, appended: Dict[str, str]):
+        partial = self._partial.setdefault(queue_id, {})
+        for field, text in appended.items():
+            partial[field] = partial.get(field, "") + text
+        hint = appended.get("student_friendly_hint")
+        if hint:
+            for subscriber in self._subscribers.get(queue_id, []):
+                subscriber.put_nowait(hint)
+        manager.broadcast({"type": "hint_delta", "queue_id": queue_id, "fields": appended})
+
+    def finish(self, queue_id: int, final: Optional[SynthesizerOutput] = None):
+        partial = self._partial.pop(queue_id, None)
+        if partial and any((getattr(final, field) if final else None) != text
+                           for field, text in partial.items()):
+            manager.broadcast({"type": "hint_delta", "queue_id": queue_id, "replaced": True,
+                               "fields": {field: getattr(final, field) if final else None
+                                          for field in partial}})
+        for subscriber in self._subscribers.pop(queue_id, []):
+            subscriber.put_nowait(None)
+
+    def subscribe(self, queue_id: int) -> asyncio.Queue:
+        """Queue of hint text (None when done), seeded with what streamed so far"""
+        subscriber: asyncio.Queue = asyncio.Queue()
+        so_far = self._partial.get(queue_id, {}).get("student_friendly_hint")
+        if so_far:
+            subscriber.put_nowait(so_far)
+        self._subscribers.setdefault(queue_id, []).append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, queue_id: int, subscriber: asyncio.Queue):
+        subscribers = self._subscribers.get(queue_id, [])
+        if subscriber in subscribers:
+            subscribers.remove(subscriber)
+
+
+hint_streams = HintStreams()
+
+
+def record_traffic(op: str, arrived: Optional[float] = None, **fields):
+    if recorder:
+        recorder.record(op, arrived, **fields)
+
+
+def broadcast_queue_event(op: str, queue_entry):
+    """Send a single queue delta to all WebSocket clients"""
+    if op == "removed":
+        event = queue_events.record(op, queue_id=queue_entry.id)
+    else:
+        event = queue_events.record(op, entry=get_queue_response(queue_entry).dict())
+    manager.broadcast(event)
 
 
 # ============================================================================
@@ -114,117 +435,420 @@ async def get_tas():
             id=ta.id,
             name=ta.name,
             expertise_tags=ta.expertise_tags,
-            current_queue_count=db.get_ta_queue_count(ta.id)
+            current_queue_count=db.get_ta_queue_count(ta.id),
+            current_queue_minutes=db.get_ta_queue_minutes(ta.id)
         )
         for ta in tas
     ]
 
 
+@app.get("/api/tas/{ta_id}/next", response_model=Optional[QueueEntryResponse])
+async def get_next_for_ta(ta_id: int):
+    """Who this TA should help next under QUEUE_POLICY (null when their queue is empty)"""
+    if not db.get_ta(ta_id):
+        raise HTTPException(status_code=404, detail="TA not found")
+    queue_entry = db.get_next_for_ta(ta_id)
+    return get_queue_response(queue_entry) if queue_entry else None
+
+
+async def find_similar_and_synthesize(question_text: str,
+                                      analyzer_output: AnalyzerOutput,
+                                      on_partial=None):
+    """KB search + Synthesizer, run as one branch alongside the Matcher"""
+    with span("kb_search") as attrs:
+        similar_kb = db.search_kb(
+            analyzer_output.tags,
+            analyzer_output.category,
+            query_text=f"{question_text} {analyzer_output.brief_summary}"
+        )
+        attrs["results"] = len(similar_kb)
+    similar_kb_dict = [
+        {
+            "id": kb.id,
+            "category": kb.category,
+            "tags": kb.tags,
+            "summary": kb.summary,
+            "solution_outline": kb.solution_outline
+        }
+        for kb in similar_kb
+    ]
+
+    with span("synthesize", streamed=on_partial is not None):
+        return await synthesize_solution(
+            question_text,
+            analyzer_output,
+            similar_kb_dict,
+            on_partial
+        )
+
+
+async def run_matcher(analyzer_output: AnalyzerOutput, preferred_ta_id: Optional[int]):
+    """Matcher over the current TA roster and live per-TA load"""
+    tas = db.get_all_tas()
+    tas_dict = [{"id": ta.id, "name": ta.name, "expertise_tags": ta.expertise_tags} for ta in tas]
+    with span("match"):
+        return await match_ta(
+            analyzer_output,
+            tas_dict,
+            db.get_queue_counts(),
+            preferred_ta_id,
+            {ta.id: db.get_ta_queue_minutes(ta.id) for ta in tas}
+        )
+
+
+async def run_batch_matchers(analyzer_outputs: List[AnalyzerOutput],
+                             preferred_ta_ids: List[Optional[int]]) -> List[MatcherOutput]:
+    """
+    Matchers for a whole batch at once. Each one sees the live load plus
+    the earlier questions in the batch placed on their local pick, so
+    concurrent matching still spreads a batch across TAs.
+    """
+    tas = db.get_all_tas()
+    tas_dict = [{"id": ta.id, "name": ta.name, "expertise_tags": ta.expertise_tags} for ta in tas]
+    counts = db.get_queue_counts()
+    minutes = {ta.id: db.get_ta_queue_minutes(ta.id) for ta in tas}
+    calls = []
+    for analyzer_output, preferred_ta_id in zip(analyzer_outputs, preferred_ta_ids):
+        calls.append(match_ta(analyzer_output, tas_dict, dict(counts), preferred_ta_id, dict(minutes)))
+        projected = local_match_ta(analyzer_output, tas_dict, counts, preferred_ta_id, minutes)
+        ta_id = projected.recommended_ta_id
+        counts[ta_id] = counts.get(ta_id, 0) + 1
+        minutes[ta_id] = minutes.get(ta_id, 0) + analyzer_output.estimated_time_minutes
+    with span("match", questions=len(calls)):
+        return await asyncio.gather(*calls)
+
+
 @app.post("/api/questions", response_model=QuestionResponse)
 async def submit_question(submission: QuestionSubmission):
     """
     Submit a new question - triggers multi-agent Claude workflow:
     1. Analyzer: Extract metadata
-    2. Matcher: Assign to best TA
-    3. Synthesizer: Find similar solutions
+    2. Matcher + Synthesizer (concurrently): Assign to best TA and
+       find similar solutions
+    With ASYNC_ENRICHMENT the question is queued first and the agents
+    run in the background (see enqueue_for_enrichment).
     """
-    print(f"\n{'='*60}")
-    print(f"NEW QUESTION from {submission.student_name}")
-    print(f"{'='*60}")
+    arrived = time.monotonic()
+    log.info("question received", extra={"student": submission.student_name,
+                                         "course": submission.course})
+
+    # Near-duplicate of a recent question? Reuse its agent outputs
+    with span("dedup") as attrs:
+        duplicate = db.find_duplicate_question(
+            submission.course,
+            submission.question_text,
+            submission.code_snippet
+        )
+        attrs["duplicate_of"] = duplicate.id if duplicate else None
+
+    if ASYNC_ENRICHMENT:
+        response = enqueue_for_enrichment(submission, duplicate)
+        record_traffic("submit", arrived, body=submission.model_dump(), queue_id=response.queue_id)
+        return response
 
     # AGENT 1: Analyze Question
-    print("\n[AGENT 1: ANALYZER] Analyzing question...")
-    analyzer_output = analyze_question(
-        submission.student_name,
-        submission.course,
-        submission.question_text,
-        submission.code_snippet
+    with span("analyze", reused=duplicate is not None):
+        if duplicate:
+            analyzer_output = duplicate.analyzer_output
+        else:
+            analyzer_output = await analyze_question(
+                submission.student_name,
+                submission.course,
+                submission.question_text,
+                submission.code_snippet
+            )
+    log.info("analyzed", extra={"category": analyzer_output.category,
+                                "difficulty": analyzer_output.estimated_difficulty.value,
+                                "minutes": analyzer_output.estimated_time_minutes,
+                                "tags": analyzer_output.tags,
+                                "reused_from": duplicate.id if duplicate else None})
+
+    # AGENTS 2 + 3: Match to TA and synthesize from KB in parallel
+    matcher_output, synthesizer_output = await asyncio.gather(
+        run_matcher(analyzer_output, submission.preferred_ta_id),
+        synthesize_submission(submission, duplicate, analyzer_output)
+    )
+    log.info("matched", extra={"ta_id": matcher_output.recommended_ta_id,
+                               "priority_score": matcher_output.priority_score,
+                               "rationale": matcher_output.rationale,
+                               "similar_questions": len(synthesizer_output.similar_question_ids)})
+
+    response = store_submission(submission, duplicate, analyzer_output, matcher_output, synthesizer_output)
+    record_traffic("submit", arrived, body=submission.model_dump(), queue_id=response.queue_id)
+    return response
+
+
+@app.post("/api/questions/batch", response_model=List[QuestionResponse])
+async def submit_questions_batch(submissions: List[QuestionSubmission]):
+    """
+    Submit many questions at once (e.g. a lab section letting out):
+    one batched Analyzer request for all new questions, then Synthesizers
+    and Matchers concurrently
+    """
+    if len(submissions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"at most {BATCH_MAX_QUESTIONS} questions per batch")
+    arrived = time.monotonic()
+    with span("dedup", questions=len(submissions)):
+        duplicates = [
+            db.find_duplicate_question(s.course, s.question_text, s.code_snippet)
+            for s in submissions
+        ]
+
+    if ASYNC_ENRICHMENT:
+        responses = [enqueue_for_enrichment(s, d) for s, d in zip(submissions, duplicates)]
+        record_traffic("batch", arrived, body=[s.model_dump() for s in submissions],
+                       queue_ids=[r.queue_id for r in responses])
+        return responses
+
+    fresh = [s for s, d in zip(submissions, duplicates) if d is None]
+    with span("analyze", questions=len(fresh)):
+        fresh_outputs = iter(await analyze_questions([
+            AnalyzerRequest(s.student_name, s.course, s.question_text, s.code_snippet) for s in fresh
+        ]))
+    analyzer_outputs = [d.analyzer_output if d else next(fresh_outputs) for d in duplicates]
+
+    synthesizer_outputs, matcher_outputs = await asyncio.gather(
+        asyncio.gather(*(
+            synthesize_submission(s, d, a) for s, d, a in zip(submissions, duplicates, analyzer_outputs)
+        )),
+        run_batch_matchers(analyzer_outputs, [s.preferred_ta_id for s in submissions])
     )
-    print(f"  Category: {analyzer_output.category}")
-    print(f"  Difficulty: {analyzer_output.estimated_difficulty}")
-    print(f"  Est. Time: {analyzer_output.estimated_time_minutes}min")
-    print(f"  Tags: {', '.join(analyzer_output.tags)}")
 
-    # AGENT 2: Match to TA
-    print("\n[AGENT 2: MATCHER] Finding best TA...")
+    responses = []
+    for s, d, a, m, synthesizer_output in zip(submissions, duplicates, analyzer_outputs,
+                                              matcher_outputs, synthesizer_outputs):
+        # Link near-duplicates within the batch to the copy stored just before
+        d = d or db.find_duplicate_question(s.course, s.question_text, s.code_snippet)
+        responses.append(store_submission(s, d, a, m, synthesizer_output))
+    log.info("batch queued", extra={"questions": len(responses), "analyzed": len(fresh),
+                                    "near_duplicates": len(submissions) - len(fresh)})
+    record_traffic("batch", arrived, body=[s.model_dump() for s in submissions],
+                   queue_ids=[r.queue_id for r in responses])
+    return responses
+
+
+async def synthesize_submission(submission: QuestionSubmission, duplicate,
+                                analyzer_output: AnalyzerOutput) -> SynthesizerOutput:
+    if duplicate and duplicate.synthesizer_output:
+        return duplicate.synthesizer_output
+    return await find_similar_and_synthesize(submission.question_text, analyzer_output)
+
+
+def record_assignment(ta_id: int):
+    """Credit the backlog avoided vs assigning to an average active TA"""
     tas = db.get_all_tas()
-    tas_dict = [{"id": ta.id, "name": ta.name, "expertise_tags": ta.expertise_tags} for ta in tas]
-    queue_counts = {ta.id: db.get_ta_queue_count(ta.id) for ta in tas}
+    if tas:
+        average = sum(db.get_ta_queue_minutes(ta.id) for ta in tas) / len(tas)
+        wait_saved_minutes.inc(amount=max(0.0, average - db.get_ta_queue_minutes(ta_id)))
+
+
+def store_submission(submission: QuestionSubmission, duplicate, analyzer_output: AnalyzerOutput,
+                     matcher_output: MatcherOutput,
+                     synthesizer_output: SynthesizerOutput) -> QuestionResponse:
+    """Save an analyzed question, queue it and broadcast the new entry"""
+    with span("db_write"):
+        question = db.add_question(
+            submission.student_name,
+            submission.course,
+            submission.question_text,
+            submission.code_snippet,
+            submission.preferred_ta_id,
+            duplicate_of=duplicate.id if duplicate else None
+        )
+        db.set_agent_outputs(question.id, analyzer_output, synthesizer_output)
+
+        record_assignment(matcher_output.recommended_ta_id)
+        queue_entry = db.add_to_queue(
+            question.id,
+            matcher_output.recommended_ta_id,
+            analyzer_output.estimated_time_minutes
+        )
+    questions_submitted.inc("sync")
 
-    matcher_output = match_ta(
-        analyzer_output,
-        tas_dict,
-        queue_counts,
-        submission.preferred_ta_id
+    # Broadcast queue update via WebSocket
+    with span("broadcast"):
+        broadcast_queue_event("added", queue_entry)
+
+    # Return response to student
+    assigned_ta = db.get_ta(matcher_output.recommended_ta_id)
+    return QuestionResponse(
+        queue_id=queue_entry.id,
+        assigned_ta_name=assigned_ta.name,
+        estimated_wait_minutes=analyzer_output.estimated_time_minutes,
+        category=analyzer_output.category,
+        tags=analyzer_output.tags,
+        brief_summary=analyzer_output.brief_summary,
+        similar_questions=synthesizer_output.similar_question_ids,
+        student_friendly_hint=synthesizer_output.student_friendly_hint,
+        duplicate_of_queue_id=get_duplicate_queue_id(question)
     )
-    print(f"  Matched to TA: {db.get_ta(matcher_output.recommended_ta_id).name}")
-    print(f"  Priority Score: {matcher_output.priority_score}")
-    print(f"  Rationale: {matcher_output.rationale}")
 
-    # AGENT 3: Synthesize Solution from KB
-    print("\n[AGENT 3: SYNTHESIZER] Searching knowledge base...")
-    similar_kb = db.search_kb(analyzer_output.tags, analyzer_output.category)
-    similar_kb_dict = [
-        {
-            "id": kb.id,
-            "category": kb.category,
-            "tags": kb.tags,
-            "summary": kb.summary,
-            "solution_outline": kb.solution_outline
-        }
-        for kb in similar_kb
-    ]
 
-    synthesizer_output = synthesize_solution(
-        submission.question_text,
-        analyzer_output,
-        similar_kb_dict
+def enqueue_for_enrichment(submission: QuestionSubmission, duplicate) -> QuestionResponse:
+    """
+    Queue immediately with a heuristic TA assignment and hand the agents
+    to the enrichment pool; results arrive as "updated" queue deltas
+    """
+    provisional = (duplicate.analyzer_output if duplicate
+                   else heuristic_analysis(submission.question_text, submission.code_snippet))
+    tas = db.get_all_tas()
+    matcher_output = local_match_ta(
+        provisional,
+        [{"id": ta.id, "name": ta.name, "expertise_tags": ta.expertise_tags} for ta in tas],
+        db.get_queue_counts(),
+        submission.preferred_ta_id,
+        {ta.id: db.get_ta_queue_minutes(ta.id) for ta in tas}
     )
-    print(f"  Similar questions: {len(synthesizer_output.similar_question_ids)}")
-    print(f"  Hint: {synthesizer_output.student_friendly_hint[:80]}...")
 
-    # Save to database
     question = db.add_question(
         submission.student_name,
         submission.course,
         submission.question_text,
         submission.code_snippet,
-        submission.preferred_ta_id
+        submission.preferred_ta_id,
+        duplicate_of=duplicate.id if duplicate else None
     )
-
-    # Store agent outputs for later retrieval (hackathon shortcut)
-    question.analyzer_output = analyzer_output
-    question.synthesizer_output = synthesizer_output
+    if duplicate:
+        db.set_agent_outputs(question.id, duplicate.analyzer_output, duplicate.synthesizer_output)
 
     queue_entry = db.add_to_queue(
         question.id,
         matcher_output.recommended_ta_id,
-        analyzer_output.estimated_time_minutes
+        provisional.estimated_time_minutes,
+        matched=False
     )
+    questions_submitted.inc("async")
+    schedule_enrichment(queue_entry.id)
+    broadcast_queue_event("added", queue_entry)
+    log.info("queued for enrichment", extra={"queue_id": queue_entry.id,
+                                             "provisional_ta_id": matcher_output.recommended_ta_id})
 
-    # Broadcast queue update via WebSocket
-    await broadcast_queue_update()
-
-    print(f"\n{'='*60}\n")
-
-    # Return response to student
     assigned_ta = db.get_ta(matcher_output.recommended_ta_id)
+    synthesizer_output = question.synthesizer_output
     return QuestionResponse(
         queue_id=queue_entry.id,
         assigned_ta_name=assigned_ta.name,
-        estimated_wait_minutes=analyzer_output.estimated_time_minutes,
-        category=analyzer_output.category,
-        tags=analyzer_output.tags,
-        brief_summary=analyzer_output.brief_summary,
-        similar_questions=synthesizer_output.similar_question_ids
+        estimated_wait_minutes=provisional.estimated_time_minutes,
+        category=provisional.category,
+        tags=provisional.tags,
+        brief_summary=provisional.brief_summary,
+        similar_questions=synthesizer_output.similar_question_ids if synthesizer_output else [],
+        student_friendly_hint=synthesizer_output.student_friendly_hint if synthesizer_output else None,
+        duplicate_of_queue_id=get_duplicate_queue_id(question),
+        enrichment_status="pending",
+        enrichment_stages=get_enrichment_stages(question, queue_entry)
     )
 
 
+def schedule_enrichment(queue_id: int):
+    enriching.add(queue_id)
+    # The background trace reuses the submitting request's id so the two can be joined
+    trace = current_trace()
+    trace_id = trace.trace_id if trace else None
+    enrichment_pool.submit(lambda: enrich_queue_entry(queue_id, trace_id))
+
+
+async def enrich_queue_entry(queue_id: int, trace_id: Optional[str] = None):
+    """Background job: run the agents still missing for a queued question"""
+    try:
+        with start_trace("enrich", trace_id, queue_id=queue_id):
+            await run_enrichment(queue_id)
+    finally:
+        enriching.discard(queue_id)
+        queue_entry = db.get_queue_entry(queue_id)
+        hint_streams.finish(queue_id, db.get_question(queue_entry.question_id).synthesizer_output)
+        db.bump_version()
+        publish_enrichment(queue_entry)
+
+
+async def run_enrichment(queue_id: int):
+    queue_entry = db.get_queue_entry(queue_id)
+    question = db.get_question(queue_entry.question_id)
+
+    if question.analyzer_output is None:
+        with span("analyze"):
+            analyzer_output = await analyze_question(
+                question.student_name,
+                question.course,
+                question.text,
+                question.code
+            )
+        db.set_agent_outputs(question.id, analyzer_output=analyzer_output)
+        publish_enrichment(queue_entry)
+    analyzer_output = question.analyzer_output
+
+    async def match():
+        if queue_entry.matched:
+            return
+        matcher_output = await run_matcher(analyzer_output, question.preferred_ta_id)
+        record_assignment(matcher_output.recommended_ta_id)
+        db.reassign_queue_entry(
+            queue_id,
+            matcher_output.recommended_ta_id,
+            analyzer_output.estimated_time_minutes
+        )
+        publish_enrichment(queue_entry)
+
+    async def synthesize():
+        if question.synthesizer_output is None:
+            synthesizer_output = await find_similar_and_synthesize(
+                question.text,
+                analyzer_output,
+                lambda appended: hint_streams.publish(queue_id, appended)
+            )
+            db.set_agent_outputs(question.id, synthesizer_output=synthesizer_output)
+            publish_enrichment(queue_entry)
+
+    await asyncio.gather(match(), synthesize())
+
+
+def publish_enrichment(queue_entry):
+    # A resolved entry is already "removed" on clients; don't resurrect it
+    if queue_entry.status != QueueStatus.DONE:
+        broadcast_queue_event("updated", queue_entry)
+
+
 @app.get("/api/queue", response_model=List[QueueEntryResponse])
 async def get_queue():
-    """Get current queue state"""
-    active_queue = db.get_active_queue()
-    return [get_queue_response(entry) for entry in active_queue]
+    """Get current queue state (pre-serialized, rebuilt only after a change)"""
+    record_traffic("queue_read")
+    return Response(content=queue_snapshot_cache.queue_bytes(), media_type="application/json")
+
+
+@app.get("/api/queue/{queue_id}/hint/stream")
+async def stream_hint(queue_id: int):
+    """
+    Server-sent events with the student hint as the Synthesizer writes it:
+    "data" events carry appended text, a final "done" event the full hint
+    ("replaced": true when it is not what streamed, e.g. a fallback after a cut-off)
+    """
+    queue_entry = db.get_queue_entry(queue_id)
+    if not queue_entry:
+        raise HTTPException(status_code=404, detail="Queue entry not found")
+    question = db.get_question(queue_entry.question_id)
+    subscriber = hint_streams.subscribe(queue_id) if queue_id in enriching else None
+    record_traffic("hint_stream", queue_id=queue_id)
+
+    async def events():
+        streamed = []
+        try:
+            while subscriber:
+                text = await subscriber.get()
+                if text is None:
+                    break
+                streamed.append(text)
+                yield f"data: {json.dumps({'text': text})}\n\n"
+            synthesizer_output = question.synthesizer_output
+            hint = synthesizer_output.student_friendly_hint if synthesizer_output else None
+            replaced = bool(streamed) and "".join(streamed) != hint
+            yield f"event: done\ndata: {json.dumps({'hint': hint, 'replaced': replaced})}\n\n"
+        finally:
+            if subscriber:
+                hint_streams.unsubscribe(queue_id, subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
 
 @app.post("/api/queue/{queue_id}/resolve")
@@ -237,8 +861,8 @@ async def resolve_question(queue_id: int):
         raise HTTPException(status_code=404, detail="Queue entry not found")
 
     question = db.get_question(queue_entry.question_id)
-    analyzer_output = getattr(question, 'analyzer_output', None)
-    synthesizer_output = getattr(question, 'synthesizer_output', None)
+    analyzer_output = question.analyzer_output
+    synthesizer_output = question.synthesizer_output
 
     # Update queue status
     db.update_queue_status(queue_id, QueueStatus.DONE)
@@ -254,7 +878,9 @@ async def resolve_question(queue_id: int):
         )
 
     # Broadcast update
-    await broadcast_queue_update()
+    broadcast_queue_event("removed", queue_entry)
+    questions_resolved.inc()
+    record_traffic("resolve", queue_id=queue_id)
 
     return {"status": "resolved", "queue_id": queue_id}
 
@@ -262,33 +888,72 @@ async def resolve_question(queue_id: int):
 @app.get("/api/metrics")
 async def get_metrics():
     """
-    Calculate simple metrics for demo
+    Dashboard summary; every figure is a maintained count (no scans)
     """
     total_questions = len(db.questions)
-    resolved_count = sum(1 for entry in db.queue if entry.status == QueueStatus.DONE)
-
-    # Mock calculation: assume random assignment would add 5 min avg vs optimized
-    estimated_time_saved = resolved_count * 5
+    resolved_count = len(db.queue) - len(db.active_queue)
 
     return {
         "total_questions": total_questions,
         "resolved_count": resolved_count,
-        "active_queue_count": len(db.get_active_queue()),
-        "estimated_time_saved_minutes": estimated_time_saved,
-        "knowledge_base_size": len(db.kb_entries)
+        "active_queue_count": len(db.active_queue),
+        "estimated_time_saved_minutes": round(wait_saved_minutes.value()),
+        "knowledge_base_size": len(db.kb_entries),
+        "llm_scheduler": llm_scheduler.stats(),
+        "circuit_breakers": {name: breaker.stats() for name, breaker in breakers.items()}
     }
 
 
+@app.get("/api/debug/traces")
+async def get_slow_traces(min_ms: float = 0.0):
+    """Recent traces slower than SLOW_TRACE_MS (newest first), with per-stage spans"""
+    return {"slow_trace_ms": SLOW_TRACE_MS, "traces": slow_traces.recent(min_ms)}
+
+
+@app.get("/api/debug/profile", response_class=PlainTextResponse)
+async def sample_profile(seconds: float = 5.0, interval_ms: float = 5.0):
+    """
+    Sample every thread's stack for a few seconds (PROFILER_ENABLED=true);
+    returns folded stacks for flamegraph tools, hottest first
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    try:
+        # The sampler runs in a thread so the event loop it observes keeps serving
+        counts = await asyncio.to_thread(profiler.profile, min(seconds, 60.0), interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 # ============================================================================
 # Simulation Endpoints
 # ============================================================================
 
+@app.post("/api/simulate/run")
+async def simulate_sessions(config: SimulationRequest):
+    """
+    Run whole sessions headless (sim_engine.py), each policy on the same
+    seeded arrivals: summary statistics plus a per-minute timeline
+    """
+    try:
+        return await asyncio.to_thread(run_simulation, config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/api/simulate/generate-students")
 async def generate_simulation_students(count: int = 30):
     """
     Generate realistic student scenarios using Claude for simulation mode
     """
-    from claude_client import client, MODEL
+    from claude_client import call_claude, MODEL, PRIORITY_SIMULATION
 
     prompt = f"""Generate {count} realistic student help requests for UW-Madison CS office hours during midterm week.
 
@@ -307,7 +972,8 @@ Return ONLY a JSON array with exactly {count} objects, no other text. Example fo
 {{"course": "CS400", "question": "Help with BST deletion", "complexity": 3, "patience": 6, "stressLevel": 7}}"""
 
     try:
-        message = client.messages.create(
+        message = await call_claude(
+            PRIORITY_SIMULATION,
             model=MODEL,
             max_tokens=2000,
             messages=[{"role": "user", "content": prompt}]
@@ -318,7 +984,7 @@ Return ONLY a JSON array with exactly {count} objects, no other text. Example fo
 
         return {"students": students, "count": len(students)}
     except Exception as e:
-        print(f"Error generating students: {e}")
+        log.error("simulation student generation failed", extra={"error": str(e)})
         # Return fallback data
         return {"students": [], "count": 0, "error": str(e)}
 
@@ -334,14 +1000,67 @@ async def simulate_student_behavior(
     """
     Use Claude to simulate student behavior based on wait time and patience
     """
-    from claude_client import client, MODEL
-
     if not ai_enabled:
         # Simple logic without AI
         if wait_time > patience:
             return {"action": "leave", "reason": "Exceeded patience threshold"}
         return {"action": "stay", "reason": "Still patient"}
 
+    result = await ask_student_action(student_id, wait_time, patience, question)
+    return result or {"action": "stay", "reason": "Error in simulation"}
+
+
+@app.post("/api/simulate/decide-actions")
+async def simulate_students_behavior(request: DecideActionsRequest):
+    """
+    Batch decide-action for the whole waiting population: one seeded NumPy
+    pass over the abandonment model; with ai_enabled, Claude decides for a
+    random sample of ai_sample_size students instead
+    """
+    n = len(request.ids)
+    columns = [request.wait_times, request.patience, request.stress, request.questions]
+    if any(column is not None and len(column) != n for column in columns):
+        raise HTTPException(status_code=400, detail="all arrays must have one entry per id")
+    try:
+        rng = np.random.default_rng([request.seed, request.tick])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stress = np.asarray(request.stress, dtype=float) if request.stress is not None else np.full(n, 5.0)
+    actions, p_leave = decide_actions(np.asarray(request.wait_times, dtype=float),
+                                      np.asarray(request.patience, dtype=float),
+                                      stress, request.model, rng)
+    actions = actions.tolist()
+    sources = ["model"] * n
+    ai_reasons = {}
+
+    if request.ai_enabled and n:
+        sampled = rng.choice(n, size=min(max(request.ai_sample_size, 0), n), replace=False).tolist()
+        results = await asyncio.gather(*(
+            ask_student_action(request.ids[i], request.wait_times[i], request.patience[i],
+                               request.questions[i] if request.questions else "")
+            for i in sampled
+        ))
+        for i, result in zip(sampled, results):
+            if isinstance(result, dict) and result.get("action") in ("stay", "leave", "get_frustrated"):
+                actions[i] = result["action"]
+                sources[i] = "ai"
+                ai_reasons[request.ids[i]] = result.get("reason", "")
+
+    return {
+        "ids": request.ids,
+        "actions": actions,
+        "leave_probability": np.round(p_leave, 4).tolist(),
+        "sources": sources,
+        "ai_reasons": ai_reasons,
+    }
+
+
+async def ask_student_action(student_id: int, wait_time: float, patience: float,
+                             question: str) -> Optional[dict]:
+    """Claude's stay / leave / get_frustrated call for one student (None on error)"""
+    from claude_client import call_claude, MODEL, PRIORITY_SIMULATION
+
     prompt = f"""You are simulating student behavior in office hours during midterm week.
 
 Student Info:
@@ -361,37 +1080,59 @@ Return ONLY a JSON object with:
 {{"action": "stay|leave|get_frustrated", "reason": "brief explanation"}}"""
 
     try:
-        message = client.messages.create(
+        message = await call_claude(
+            PRIORITY_SIMULATION,
             model=MODEL,
             max_tokens=100,
             messages=[{"role": "user", "content": prompt}]
         )
 
         content = message.content[0].text
-        result = json.loads(content)
-        return result
+        return json.loads(content)
     except Exception as e:
-        print(f"Error in behavior simulation: {e}")
-        return {"action": "stay", "reason": "Error in simulation"}
+        log.error("simulation behavior call failed", extra={"error": str(e)})
+        return None
+
+
+ADVISOR_SHORTLIST = 10     # candidates Claude sees in advisory mode
 
 
 @app.post("/api/simulate/select-next")
-async def simulate_ai_selection(students: List[dict]):
+async def simulate_ai_selection(students: List[dict], policy: str = "weighted_fair", advisor: bool = False):
     """
-    Use Claude to intelligently select the next student to help
+    Select the next student to help with a local scheduling policy over the
+    whole queue. advisor=true lets Claude pick among the policy's shortlist;
+    any failure falls back to the policy's own choice.
     """
-    from claude_client import client, MODEL
-
-    if not students or len(students) == 0:
-        return {"selected_id": None, "reason": "No students in queue"}
-
-    # Limit to first 10 for performance
-    students_info = students[:10]
-
+    from claude_client import call_claude, MODEL, PRIORITY_SIMULATION
+
+    if policy not in POLICIES:
+        raise HTTPException(status_code=400, detail=f"unknown policy {policy!r}; choose from {', '.join(POLICIES)}")
+    if not students:
+        return {"selected_id": None, "reason": "No students in queue", "source": policy}
+    if any("id" not in student for student in students):
+        raise HTTPException(status_code=400, detail="every student needs an id")
+
+    # The browser sends minutes waited so far: arrival = -waitTime on a "now = 0" clock
+    schedule = make_policy(policy)
+    by_id = {}
+    for student in students:
+        waited = float(student.get("waitTime", 0))
+        by_id[student["id"]] = student
+        schedule.push(Job(student["id"], -waited, float(student.get("complexity", 3)) * 4,
+                          -waited + float(student.get("patience", 10)), student.get("course", ""),
+                          float(student.get("stress", 5)) / 5))
+    choice = schedule.peek()
+    local = {"selected_id": choice.id, "reason": f"{policy} policy over {len(students)} students",
+             "source": policy}
+    if not advisor:
+        return local
+
+    shortlist = [by_id[job.id] for job in schedule.shortlist(ADVISOR_SHORTLIST)]
     prompt = f"""You are an AI office hours coordinator. Select the best student to help next.
 
-Available students:
-{json.dumps(students_info, indent=2)}
+Candidates (the {policy} scheduling policy ranks them in this order):
+{json.dumps(shortlist, indent=2)}
 
 Consider:
 - Wait time (fairness)
@@ -403,52 +1144,67 @@ Return ONLY a JSON object:
 {{"selected_id": <student_id>, "reason": "brief explanation of why this student"}}"""
 
     try:
-        message = client.messages.create(
+        message = await call_claude(
+            PRIORITY_SIMULATION,
             model=MODEL,
             max_tokens=150,
             messages=[{"role": "user", "content": prompt}]
         )
 
-        content = message.content[0].text
-        result = json.loads(content)
-        return result
+        result = json.loads(message.content[0].text)
+        if result.get("selected_id") not in {s["id"] for s in shortlist}:
+            raise ValueError(f"selected_id {result.get('selected_id')!r} is not a candidate")
+        return {**result, "source": "claude", "policy_choice": choice.id}
     except Exception as e:
-        print(f"Error in AI selection: {e}")
-        # Fallback: select first student
-        return {
-            "selected_id": students[0].get("id") if students else None,
-            "reason": "Fallback to FIFO (error in AI)"
-        }
+        log.error("simulation selection failed", extra={"error": str(e)})
+        return {**local, "reason": f"{local['reason']} (Claude advisor unavailable)"}
 
 
 # ============================================================================
 # WebSocket Endpoint
 # ============================================================================
 
+ws_connection_ids = itertools.count(1)
+
+
 @app.websocket("/ws/queue")
 async def websocket_queue(websocket: WebSocket):
     """
     WebSocket endpoint for real-time queue updates
     """
-    await manager.connect(websocket)
-    print(f"WebSocket connected. Total connections: {len(manager.active_connections)}")
+    # Initial snapshot; afterwards the client only receives deltas
+    await manager.connect(websocket, get_queue_snapshot)
+    log.info("websocket connected", extra={"connections": len(manager.active_connections)})
+    connection_id = next(ws_connection_ids)
+    record_traffic("ws_connect", connection=connection_id)
 
     try:
-        # Send initial queue state
-        queue_data = {
-            "type": "queue_update",
-            "queue": [get_queue_response(entry).dict() for entry in db.get_active_queue()]
-        }
-        await websocket.send_json(queue_data)
-
-        # Keep connection alive
         while True:
-            # Wait for messages (client can send pings)
+            # Clients send pings, or {"type": "resync", "since": <seq>} on a gap
             data = await websocket.receive_text()
+            try:
+                request = json.loads(data)
+            except ValueError:
+                continue
+
+            if isinstance(request, dict) and request.get("type") == "resync":
+                try:
+                    events = queue_events.since(int(request.get("since", -1)))
+                except (TypeError, ValueError):
+                    events = None   # unusable cursor: send a full snapshot instead
+                if events is None:
+                    manager.request_resync(websocket)
+                else:
+                    for event in events:
+                        manager.send(websocket, event)
 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Any exit (including an unexpected error) unregisters the channel and stops its sender
         manager.disconnect(websocket)
-        print(f"WebSocket disconnected. Total connections: {len(manager.active_connections)}")
+        log.info("websocket disconnected", extra={"connections": len(manager.active_connections)})
+        record_traffic("ws_disconnect", connection=connection_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+"""
+Deterministic local TA matcher
+Scores every TA on expertise overlap, current load and student preference
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from models import AnalyzerOutput, MatcherOutput, DifficultyLevel
+
+# Weights of the 0-1 components; the total is scaled to a 0-100 priority score
+EXPERTISE_WEIGHT = 0.6
+LOAD_WEIGHT = 0.3
+PREFERENCE_BONUS = 0.25
+LOAD_HALF_MINUTES = 30      # backlog at which the load component drops to 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = frozenset(
+    "the and for with how why what when does my in on of to is it a an i am can "
+    "this that not but get help doing do be".split()
+)
+
+
+@lru_cache(maxsize=4096)
+def _tokens(tag: str) -> FrozenSet[str]:
+    # Crude plural folding so "Trees" matches "tree"
+    return frozenset(t[:-1] if len(t) > 3 and t.endswith("s") else t
+                     for t in _TOKEN_RE.findall(tag.lower()))
+
+
+def _token_set(tags: List[str]) -> FrozenSet[str]:
+    result: FrozenSet[str] = frozenset()
+    for tag in tags:
+        result |= _tokens(tag)
+    return result
+
+
+def rank_tas(analyzer_output: AnalyzerOutput, tas: List[Dict], queue_counts: Dict[int, int],
+             preferred_ta_id: Optional[int] = None,
+             queue_minutes: Optional[Dict[int, int]] = None) -> List[Tuple[float, Dict, str]]:
+    """Return (priority_score, ta, reason) for every TA, best first"""
+    question_tokens = _token_set(analyzer_output.tags) | _tokens(analyzer_output.category)
+    queue_minutes = queue_minutes or {}
+
+    ranked = []
+    for ta in tas:
+        overlap = question_tokens & _token_set(ta['expertise_tags'])
+        expertise = len(overlap) / len(question_tokens) if question_tokens else 0.0
+        minutes = queue_minutes.get(ta['id'], queue_counts.get(ta['id'], 0) * 15)
+        availability = LOAD_HALF_MINUTES / (LOAD_HALF_MINUTES + minutes)
+        preferred = ta['id'] == preferred_ta_id
+
+        score = EXPERTISE_WEIGHT * expertise + LOAD_WEIGHT * availability
+        if preferred:
+            score += PREFERENCE_BONUS
+        score = round(min(score, 1.0) * 100, 1)
+
+        reason = (f"{ta['name']}: expertise overlap {sorted(overlap) or 'none'}, "
+                  f"{queue_counts.get(ta['id'], 0)} in queue (~{minutes} min)"
+                  + (", student preference" if preferred else ""))
+        ranked.append((score, ta, reason))
+
+    # Deterministic tie-break: lighter backlog, then lower id
+    ranked.sort(key=lambda item: (-item[0],
+                                  queue_minutes.get(item[1]['id'], 0),
+                                  item[1]['id']))
+    return ranked
+
+
+def local_match_ta(analyzer_output: AnalyzerOutput, tas: List[Dict], queue_counts: Dict[int, int],
+                   preferred_ta_id: Optional[int] = None,
+                   queue_minutes: Optional[Dict[int, int]] = None) -> MatcherOutput:
+    """Full MatcherOutput without a network call"""
+    ranked = rank_tas(analyzer_output, tas, queue_counts, preferred_ta_id, queue_minutes)
+    if not ranked:
+        return MatcherOutput(recommended_ta_id=1, alternative_tas=[], priority_score=0.0,
+                             rationale="No active TAs")
+
+    score, best, reason = ranked[0]
+    return MatcherOutput(
+        recommended_ta_id=best['id'],
+        alternative_tas=[ta['id'] for _, ta, _ in ranked[1:3]],
+        priority_score=score,
+        rationale=f"Local match - {reason}"
+    )
+
+
+def heuristic_analysis(question_text: str, code_snippet: Optional[str] = None) -> AnalyzerOutput:
+    """
+    Provisional AnalyzerOutput from question keywords, good enough to place
+    the student with a plausible TA before the real Analyzer has run
+    """
+    words = _TOKEN_RE.findall(f"{question_text} {code_snippet or ''}".lower())
+    keywords = [w for w in dict.fromkeys(words) if len(w) > 1 and w not in _STOPWORDS]
+    return AnalyzerOutput(
+        category="Pending analysis",
+        estimated_difficulty=DifficultyLevel.MEDIUM,
+        estimated_time_minutes=15,
+        tags=keywords[:10],
+        brief_summary=question_text[:100]
+    )
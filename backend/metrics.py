@@ -0,0 +1,146 @@
+"""
+Prometheus-style metrics for Office Hours Oracle
+Counters, gauges and histograms updated in place on the hot path;
+rendering the text exposition format only reads their current values
+"""
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """
+    Labelled values kept by the metric itself, or read at scrape time from
+    a callback (for state another component already maintains)
+    """
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 read: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._read = read
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        values = self._read() if self._read else self._values
+        return [f"{self.name}{_format_labels(self.labels, key)} {value:g}"
+                for key, value in values.items()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str):
+        self._values[label_values] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self._series: Dict[LabelValues, List[float]] = {}  # per-bucket counts + [sum, count]
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.labels + ('le',), key + (f'{bound:g}',))} {cumulative:g}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels + ('le',), key + ('+Inf',))} "
+                         f"{series[-1]:g}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-2]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = (), read=None) -> Counter:
+        return self.register(Counter(name, help, labels, read))
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = (), read=None) -> Gauge:
+        return self.register(Gauge(name, help, labels, read))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Shared instruments; owners register gauges that read their own state
+http_requests = registry.counter(
+    "oho_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = registry.histogram(
+    "oho_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+agent_latency = registry.histogram(
+    "oho_agent_duration_seconds", "Agent latency including fallbacks", ("agent",))
+agent_calls = registry.counter(
+    "oho_agent_calls_total",
+    "Agent results by source: llm, cached, fallback (error/timeout/open circuit) or mock",
+    ("agent", "source"))
+questions_submitted = registry.counter(
+    "oho_questions_submitted_total", "Questions queued", ("mode",))
+questions_resolved = registry.counter(
+    "oho_questions_resolved_total", "Queue entries resolved")
+wait_saved_minutes = registry.counter(
+    "oho_estimated_wait_saved_minutes_total",
+    "Assigned TA backlog vs the average active TA backlog, summed over assignments")
+broadcast_latency = registry.histogram(
+    "oho_ws_broadcast_duration_seconds", "Time to fan one message out to all WebSocket clients",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
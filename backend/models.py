@@ -4,7 +4,7 @@ Simple in-memory storage for hackathon demo
 """
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from enum import Enum
 
 
@@ -38,17 +38,22 @@ class Question:
         self.text = text
         self.code = code
         self.preferred_ta_id = preferred_ta_id
+        self.duplicate_of: Optional[int] = None  # question id of a near-duplicate
+        self.analyzer_output: Optional["AnalyzerOutput"] = None
+        self.synthesizer_output: Optional["SynthesizerOutput"] = None
         self.created_at = datetime.now()
 
 
 class QueueEntry:
     def __init__(self, id: int, question_id: int, assigned_ta_id: int,
-                 estimated_time_minutes: int, status: QueueStatus = QueueStatus.QUEUED):
+                 estimated_time_minutes: int, status: QueueStatus = QueueStatus.QUEUED,
+                 matched: bool = True):
         self.id = id
         self.question_id = question_id
         self.assigned_ta_id = assigned_ta_id
         self.estimated_time_minutes = estimated_time_minutes
         self.status = status
+        self.matched = matched  # False while only a provisional (heuristic) TA is assigned
         self.created_at = datetime.now()
 
 
@@ -103,6 +108,10 @@ class QuestionResponse(BaseModel):
     tags: List[str]
     brief_summary: str
     similar_questions: List[int]
+    student_friendly_hint: Optional[str] = None  # None while enrichment is pending
+    duplicate_of_queue_id: Optional[int] = None
+    enrichment_status: str = "complete"       # "pending" until all agent stages finish
+    enrichment_stages: List[str] = ["analyzer", "matcher", "synthesizer"]
 
 
 class TAInfo(BaseModel):
@@ -110,6 +119,7 @@ class TAInfo(BaseModel):
     name: str
     expertise_tags: List[str]
     current_queue_count: int
+    current_queue_minutes: int = 0
 
 
 class QueueEntryResponse(BaseModel):
@@ -126,3 +136,62 @@ class QueueEntryResponse(BaseModel):
     brief_summary: str
     suggested_answer_outline: Optional[str] = None
     student_friendly_hint: Optional[str] = None
+    duplicate_of_queue_id: Optional[int] = None
+    enrichment_status: str = "complete"
+    enrichment_stages: List[str] = []
+
+
+# Simulation (see sim_engine.py)
+class SimTAConfig(BaseModel):
+    name: str
+    courses: List[str]      # expertise; other courses take longer
+    speed: float = Field(1.0, gt=0)   # multiplier on service rate; must be positive
+
+
+class SimArrivalWave(BaseModel):
+    at_minute: float
+    students: int
+    spread_minutes: float = 5.0
+
+
+class SimulationRequest(BaseModel):
+    policies: List[str] = ["fifo"]
+    sessions: int = 1
+    seed: int = 0
+    duration_minutes: float = 120.0
+    arrival_rate_per_minute: float = 0.2    # background traffic between waves
+    waves: List[SimArrivalWave] = [         # midterm rush: a crowd at the start, another after lab
+        SimArrivalWave(at_minute=0, students=20),
+        SimArrivalWave(at_minute=60, students=15),
+    ]
+    courses: List[str] = ["CS400", "CS577"]
+    tas: List[SimTAConfig] = [
+        SimTAConfig(name="TA 1", courses=["CS400"]),
+        SimTAConfig(name="TA 2", courses=["CS577"]),
+        SimTAConfig(name="TA 3", courses=["CS400", "CS577"]),
+    ]
+    minutes_per_complexity: float = 4.0     # complexity 1-5
+    patience_minutes_per_point: float = 3.0 # patience 1-10
+    include_timeline: bool = True           # per-minute counts of each policy's first session
+
+
+class AbandonmentModel(BaseModel):
+    """P(leave) = logistic(steepness * (wait / tolerance - 1))"""
+    patience_scale: float = 1.0             # minutes of tolerance per patience point
+    stress_weight: float = 0.5              # stress 10 cuts tolerance by this fraction (5 is neutral)
+    steepness: float = 8.0                  # large = hard "wait > patience" cutoff
+    frustration_threshold: float = 0.7      # staying students past this share of tolerance get frustrated
+
+
+class DecideActionsRequest(BaseModel):
+    """The whole waiting population as parallel arrays"""
+    ids: List[int]
+    wait_times: List[float]                 # minutes
+    patience: List[float]                   # 1-10
+    stress: Optional[List[float]] = None    # 1-10, default 5
+    questions: Optional[List[str]] = None   # only used for the students sent to Claude
+    ai_enabled: bool = False
+    ai_sample_size: int = 5                 # students per call whose decision Claude makes
+    seed: int = 0
+    tick: int = 0                           # same seed + tick = same decisions
+    model: AbandonmentModel = AbandonmentModel()
@@ -0,0 +1,161 @@
+"""
+Traffic recording for offline replay (opt-in with RECORD_TRAFFIC_PATH)
+Appends one compact JSON line per request arrival and per Claude response
+to a trace file (gzipped if the path ends in .gz); replay.py re-drives a
+recorded session against a fresh backend
+"""
+import gzip
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+TRACE_VERSION = 1
+FLUSH_INTERVAL_SECONDS = 1.0     # bounds what a crashed server loses
+
+
+def agent_keys(request: Dict) -> Tuple[Optional[str], List[str]]:
+    """
+    Which agent a Claude request is for, and one lookup key per question in
+    it. Keys cover only the question-specific part of the prompt, so they
+    still match when queue lengths or the knowledge base differ on replay.
+    """
+    from claude_client import (
+        ANALYZER_BATCH_SYSTEM_PROMPT, ANALYZER_SYSTEM_PROMPT, MATCHER_SYSTEM_PROMPT,
+        SYNTHESIZER_SYSTEM_PROMPT
+    )
+
+    system = request.get("system")
+    content = request["messages"][0]["content"]
+    if system == ANALYZER_BATCH_SYSTEM_PROMPT:
+        return "analyzer", [part.split("\n", 1)[1].strip() for part in content.split("### Question ")[1:]]
+    if system == ANALYZER_SYSTEM_PROMPT:
+        return "analyzer", [content.strip()]
+    if system == MATCHER_SYSTEM_PROMPT:
+        return "matcher", [content.split("\n\nAvailable TAs:")[0]]
+    if system == SYNTHESIZER_SYSTEM_PROMPT:
+        match = re.search(r"^Text: (.*?)\nCategory: ", content, re.MULTILINE | re.DOTALL)
+        return "synthesizer", [match.group(1) if match else content]
+    return None, []     # simulation prompts aren't student traffic
+
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode + "t") if path.endswith(".gz") else open(path, mode)
+
+
+class TrafficRecorder:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = _open(path, "w")
+        self._start = self._flushed = time.monotonic()
+        self.events = 0
+        self._write({"op": "session", "version": TRACE_VERSION, "started_at": time.time()})
+
+    def record(self, op: str, arrived: Optional[float] = None, **fields):
+        """arrived is the time.monotonic() reading when the request came in (default now)"""
+        t = (arrived if arrived is not None else time.monotonic()) - self._start
+        self._write({"t": round(t, 4), "op": op, **fields})
+
+    def record_agent(self, request: Dict, latency: float, text: Optional[str] = None,
+                     error: Optional[str] = None):
+        """One line per question answered by a Claude response (or per question in a failed one)"""
+        agent, keys = agent_keys(request)
+        if agent is None:
+            return
+        outputs: List[Dict[str, Any]]
+        if error is not None:
+            outputs = [{"error": error}] * len(keys)
+        else:
+            try:
+                parsed = json.loads(text)
+            except ValueError:
+                parsed = None
+            if len(keys) > 1 and isinstance(parsed, list) and len(parsed) == len(keys):
+                outputs = [{"output": item} for item in parsed]
+            elif len(keys) == 1:
+                outputs = [{"output": parsed} if parsed is not None else {"text": text}]
+            else:
+                # Malformed batch answer: the backend retries each question, which records them
+                outputs = [{"error": "malformed batch response"}] * len(keys)
+        for key, output in zip(keys, outputs):
+            self.record("agent", agent=agent, key=key, latency=round(latency, 4), **output)
+
+    def close(self):
+        self._file.close()
+
+    def _write(self, event: Dict):
+        self._file.write(json.dumps(event, separators=(",", ":"), default=str) + "\n")
+        self.events += 1
+        now = time.monotonic()
+        if now - self._flushed >= FLUSH_INTERVAL_SECONDS:
+            self._file.flush()
+            self._flushed = now
+
+
+def load_trace(path: str) -> Tuple[Dict, List[Dict]]:
+    """(session header, events ordered by arrival)"""
+    with _open(path, "r") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("op") != "session":
+        raise ValueError(f"{path} is not a traffic trace")
+    return lines[0], sorted(lines[1:], key=lambda event: event["t"])
+
+
+# ============================================================================
+# Client proxy capturing agent outputs
+# ============================================================================
+
+class _RecordingStream:
+    def __init__(self, inner, request: Dict, recorder: TrafficRecorder):
+        self._inner = inner
+        self._request = request
+        self._recorder = recorder
+        self._parts: List[str] = []
+
+    async def __aenter__(self):
+        self._started = time.monotonic()
+        self._stream = await self._inner.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        latency = time.monotonic() - self._started
+        if exc is None:
+            self._recorder.record_agent(self._request, latency, text="".join(self._parts))
+        elif isinstance(exc, Exception):
+            self._recorder.record_agent(self._request, latency, error=str(exc))
+        return await self._inner.__aexit__(exc_type, exc, tb)
+
+    @property
+    def text_stream(self) -> AsyncIterator[str]:
+        return self._collect()
+
+    async def _collect(self):
+        async for text in self._stream.text_stream:
+            self._parts.append(text)
+            yield text
+
+
+class _RecordingMessages:
+    def __init__(self, inner, recorder: TrafficRecorder):
+        self._inner = inner
+        self._recorder = recorder
+
+    async def create(self, **request):
+        started = time.monotonic()
+        try:
+            response = await self._inner.create(**request)
+        except Exception as e:
+            self._recorder.record_agent(request, time.monotonic() - started, error=str(e))
+            raise
+        self._recorder.record_agent(request, time.monotonic() - started, text=response.content[0].text)
+        return response
+
+    def stream(self, **request):
+        return _RecordingStream(self._inner.stream(**request), request, self._recorder)
+
+
+class RecordingClient:
+    """Wraps the Anthropic client; calls pass through and their outputs are recorded"""
+
+    def __init__(self, inner, recorder: TrafficRecorder):
+        self.messages = _RecordingMessages(inner.messages, recorder)
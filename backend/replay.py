@@ -0,0 +1,214 @@
+"""
+Replay a recorded office-hours session against a fresh backend
+Re-drives the request arrivals of a RECORD_TRAFFIC_PATH trace with their
+original timing compressed by --speed, while bench_server.py serves the
+recorded agent outputs locally (no API key or network needed), and
+reports per-request latency and how closely the schedule was kept as JSON
+
+    python replay.py session.jsonl.gz --speed 10 --out replay.json
+    python replay.py session.jsonl.gz --speed 50 --server-env ASYNC_ENRICHMENT=true
+"""
+import argparse
+import asyncio
+import collections
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+import httpx
+import websockets
+
+from benchmark import Endpoint, emit, git_revision, percentiles, start_server, wait_ready
+from recorder import load_trace
+
+OPS = ("submit", "batch", "resolve", "queue_read", "hint_stream", "ws_connect")
+
+
+class Replay:
+    def __init__(self, args, header: Dict, events: List[Dict]):
+        self.args = args
+        self.header = header
+        self.requests = [event for event in events if event["op"] != "agent"]
+        self.base = f"http://{args.host}:{args.port}"
+        self.endpoints = {op: Endpoint() for op in OPS}
+        self.lateness: List[float] = []
+        self.unmapped = 0
+        # Recorded queue ids -> ids the fresh backend hands out for the same submissions
+        self.recorded_ids: Set[int] = set()
+        for event in self.requests:
+            if event["op"] == "submit":
+                self.recorded_ids.add(event["queue_id"])
+            elif event["op"] == "batch":
+                self.recorded_ids.update(event["queue_ids"])
+        self.queue_ids: Dict[int, asyncio.Future] = {}
+        self.sockets: Dict[int, asyncio.Event] = {}
+        self.ws_messages = 0
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.args.max_connections)
+        async with httpx.AsyncClient(base_url=self.base, timeout=120, limits=limits) as client:
+            await client.get("/bench/stats", params={"reset": True})
+            tasks, sockets = [], []
+            start = time.perf_counter()
+            for event in self.requests:
+                due = start + event["t"] / self.args.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.lateness.append(max(0.0, time.perf_counter() - due))
+                task = asyncio.create_task(self.fire(client, event))
+                (sockets if event["op"] == "ws_connect" else tasks).append(task)
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+            # Subscribers still connected when the recording stopped
+            for closed in self.sockets.values():
+                closed.set()
+            await asyncio.gather(*sockets)
+            server = (await client.get("/bench/stats")).json()
+        return self.report(elapsed, server)
+
+    async def fire(self, client: httpx.AsyncClient, event: Dict):
+        op = event["op"]
+        if op == "submit":
+            response = await self.request(client, op, "POST", "/api/questions", json=event["body"])
+            self.map_ids([event["queue_id"]], [response.json()["queue_id"]] if ok(response) else None)
+        elif op == "batch":
+            response = await self.request(client, op, "POST", "/api/questions/batch", json=event["body"])
+            self.map_ids(event["queue_ids"], [r["queue_id"] for r in response.json()] if ok(response) else None)
+        elif op == "resolve":
+            queue_id = await self.queue_id(event["queue_id"])
+            if queue_id is not None:
+                await self.request(client, op, "POST", f"/api/queue/{queue_id}/resolve")
+        elif op == "hint_stream":
+            queue_id = await self.queue_id(event["queue_id"])
+            if queue_id is not None:
+                await self.read_hint(client, queue_id)
+        elif op == "queue_read":
+            await self.request(client, op, "GET", "/api/queue")
+        elif op == "ws_connect":
+            closed = self.sockets[event["connection"]] = asyncio.Event()
+            await self.hold_socket(closed)
+        elif op == "ws_disconnect":
+            self.sockets.setdefault(event["connection"], asyncio.Event()).set()
+
+    async def request(self, client: httpx.AsyncClient, op: str, method: str, path: str, **kw):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kw)
+        except httpx.HTTPError:
+            self.endpoints[op].record(started, None)
+            return None
+        self.endpoints[op].record(started, response.status_code)
+        return response
+
+    def map_ids(self, recorded: List[int], replayed: Optional[List[int]]):
+        for i, recorded_id in enumerate(recorded):
+            future = self.queue_ids.setdefault(recorded_id, asyncio.get_running_loop().create_future())
+            if not future.done():
+                future.set_result(replayed[i] if replayed and i < len(replayed) else None)
+
+    async def queue_id(self, recorded_id: int) -> Optional[int]:
+        """The replayed id for a recorded one; ids from before the recording are used as-is"""
+        if recorded_id not in self.recorded_ids:
+            return recorded_id
+        future = self.queue_ids.setdefault(recorded_id, asyncio.get_running_loop().create_future())
+        try:
+            queue_id = await asyncio.wait_for(asyncio.shield(future), self.args.id_timeout)
+        except asyncio.TimeoutError:
+            queue_id = None
+        if queue_id is None:
+            self.unmapped += 1
+        return queue_id
+
+    async def read_hint(self, client: httpx.AsyncClient, queue_id: int):
+        started = time.perf_counter()
+        try:
+            async with client.stream("GET", f"/api/queue/{queue_id}/hint/stream") as response:
+                async for _ in response.aiter_bytes():
+                    pass
+        except httpx.HTTPError:
+            self.endpoints["hint_stream"].record(started, None)
+            return
+        self.endpoints["hint_stream"].record(started, response.status_code)
+
+    async def hold_socket(self, closed: asyncio.Event):
+        """Stay subscribed to /ws/queue until the recorded disconnect"""
+        started = time.perf_counter()
+        try:
+            async with websockets.connect(f"ws://{self.args.host}:{self.args.port}/ws/queue",
+                                          max_size=None, open_timeout=30) as ws:
+                await ws.recv()
+                self.endpoints["ws_connect"].record(started, 101)
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(ws.recv(), 0.5)
+                        self.ws_messages += 1
+                    except asyncio.TimeoutError:
+                        continue
+        except Exception:
+            self.endpoints["ws_connect"].record(started, None)
+
+    def report(self, elapsed: float, server: dict) -> dict:
+        arrivals = collections.Counter(event["op"] for event in self.requests)
+        recorded_seconds = self.requests[-1]["t"] if self.requests else 0.0
+        return {
+            "config": {k: v for k, v in vars(self.args).items() if k not in ("out", "host", "port")},
+            "environment": {"git_revision": git_revision()},
+            "session": {
+                "started_at": self.header.get("started_at"),
+                "recorded_seconds": round(recorded_seconds, 3),
+                "arrivals": dict(arrivals),
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "schedule_lateness": percentiles(self.lateness),
+            "unmapped_queue_ids": self.unmapped,
+            "endpoints": {op: endpoint.report(elapsed) for op, endpoint in self.endpoints.items()
+                          if endpoint.status},
+            "ws_messages_received": self.ws_messages,
+            "event_loop_lag": percentiles(server["event_loop_lag_seconds"]),
+            "agent_outputs": server["fake_llm"],
+        }
+
+
+def ok(response: Optional[httpx.Response]) -> bool:
+    return response is not None and response.status_code == 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="file written with RECORD_TRAFFIC_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression, e.g. 10 = 10x faster")
+    parser.add_argument("--latency-scale", type=float,
+                        help="multiplier on recorded agent latency (default 1/speed)")
+    parser.add_argument("--id-timeout", type=float, default=60.0,
+                        help="seconds a resolve waits for its question to be queued")
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the backend under test (repeatable)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    if args.latency_scale is None:
+        args.latency_scale = 1 / args.speed
+
+    header, events = load_trace(args.trace)
+    server = start_server(args.host, args.port,
+                          # The server runs from backend/, so hand it a path that survives the chdir
+                          ["--replay", os.path.abspath(args.trace), "--latency-scale", str(args.latency_scale),
+                           "--seed", str(args.seed)],
+                          args.server_env)
+    try:
+        asyncio.run(wait_ready(f"http://{args.host}:{args.port}"))
+        result = asyncio.run(Replay(args, header, events).run())
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    emit(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Local scheduling policies: who a free TA helps next
+Each policy keeps its waiting students in indexed heaps, so arrivals,
+give-ups and picks are all O(log n) over the whole queue. The simulator
+(sim_engine.py) and the live per-TA queues (db.py) share them.
+"""
+import itertools
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class Job(NamedTuple):
+    id: int
+    arrival: float                  # minutes on any clock shared by the queue
+    minutes: float                  # estimated service time
+    deadline: float = float("inf")  # when the student is expected to give up
+    course: str = ""
+    weight: float = 1.0             # > 1 is served sooner by weighted_fair
+
+
+class IndexedHeap:
+    """Binary min-heap of (key, id) with a position map for O(log n) remove / update"""
+
+    def __init__(self):
+        self._heap: List[Tuple[Tuple, Hashable]] = []
+        self._pos: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._pos
+
+    def push(self, item: Hashable, key: Tuple):
+        if item in self._pos:
+            self.update(item, key)
+            return
+        self._heap.append((key, item))
+        self._pos[item] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def peek(self) -> Optional[Hashable]:
+        return self._heap[0][1] if self._heap else None
+
+    def peek_key(self) -> Optional[Tuple]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop(self) -> Hashable:
+        item = self._heap[0][1]
+        self.remove(item)
+        return item
+
+    def remove(self, item: Hashable) -> bool:
+        i = self._pos.pop(item, None)
+        if i is None:
+            return False
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_down(self._sift_up(i))
+        return True
+
+    def update(self, item: Hashable, key: Tuple):
+        i = self._pos[item]
+        self._heap[i] = (key, item)
+        self._sift_down(self._sift_up(i))
+
+    def smallest(self, n: int) -> List[Hashable]:
+        """The n lowest-keyed items in order, without disturbing the heap (O(n log n))"""
+        result: List[Hashable] = []
+        frontier = IndexedHeap()
+        if self._heap:
+            frontier.push(0, self._heap[0][0])
+        while frontier and len(result) < n:
+            i = frontier.pop()
+            result.append(self._heap[i][1])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._heap):
+                    frontier.push(child, self._heap[child][0])
+        return result
+
+    def _sift_up(self, i: int) -> int:
+        heap, pos = self._heap, self._pos
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if heap[parent][0] <= entry[0]:
+                break
+            heap[i] = heap[parent]
+            pos[heap[i][1]] = i
+            i = parent
+        heap[i] = entry
+        pos[entry[1]] = i
+        return i
+
+    def _sift_down(self, i: int) -> int:
+        heap, pos = self._heap, self._pos
+        entry = heap[i]
+        size = len(heap)
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if entry[0] <= heap[child][0]:
+                break
+            heap[i] = heap[child]
+            pos[heap[i][1]] = i
+            i = child
+        heap[i] = entry
+        pos[entry[1]] = i
+        return i
+
+
+# ============================================================================
+# Policies
+# ============================================================================
+
+class SchedulingPolicy(ABC):
+    """
+    The waiting room: jobs are pushed on arrival, removed when they give up
+    or are helped elsewhere, and pop() hands the next one to a free TA.
+    prefer is the free TA's courses, for policies that care about expertise.
+    """
+    name = ""
+
+    def __init__(self):
+        self.jobs: Dict[int, Job] = {}
+        self._seq = itertools.count()      # FIFO tie-break among equal keys
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def __contains__(self, job_id: int) -> bool:
+        return job_id in self.jobs
+
+    def push(self, job: Job):
+        if job.id in self.jobs:
+            self.remove(job.id)
+        self.jobs[job.id] = job
+        self._insert(job, next(self._seq))
+
+    def remove(self, job_id: int, served: bool = False) -> Optional[Job]:
+        """Drop a job; served=True when a TA helped it (counts toward course balance)"""
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            self._delete(job)
+            if served:
+                self._served(job)
+        return job
+
+    def peek(self, prefer: Iterable[str] = ()) -> Optional[Job]:
+        """The job pop() would return, left in place"""
+        if not self.jobs:
+            return None
+        return self.jobs[self._select(set(prefer))]
+
+    def pop(self, prefer: Iterable[str] = ()) -> Optional[Job]:
+        job = self.peek(prefer)
+        if job is not None:
+            self.remove(job.id, served=True)
+        return job
+
+    @abstractmethod
+    def shortlist(self, n: int) -> List[Job]:
+        """The policy's top n candidates in order (ignores expertise preference)"""
+
+    @abstractmethod
+    def _insert(self, job: Job, seq: int):
+        """Index a newly pushed job; seq breaks ties in push order"""
+
+    @abstractmethod
+    def _delete(self, job: Job):
+        """Drop a job from the policy's index"""
+
+    @abstractmethod
+    def _select(self, prefer: set) -> int:
+        """Id of the job to hand to a free TA with these courses"""
+
+    def _served(self, job: Job):
+        pass
+
+
+class KeyPolicy(SchedulingPolicy):
+    """One heap; lowest key first, ties to whoever was pushed first"""
+
+    def __init__(self, name: str, key: Callable[[Job], float]):
+        super().__init__()
+        self.name = name
+        self._key = key
+        self._heap = IndexedHeap()
+
+    def shortlist(self, n: int) -> List[Job]:
+        return [self.jobs[job_id] for job_id in self._heap.smallest(n)]
+
+    def _insert(self, job: Job, seq: int):
+        self._heap.push(job.id, (self._key(job), seq))
+
+    def _delete(self, job: Job):
+        self._heap.remove(job.id)
+
+    def _select(self, prefer: set) -> int:
+        return self._heap.peek()
+
+
+class CoursePolicy(SchedulingPolicy):
+    """
+    One arrival-ordered heap per course; subclasses choose which course's
+    head goes next. The scan is over courses (a handful), not students.
+    """
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self._courses: Dict[str, IndexedHeap] = {}
+
+    def shortlist(self, n: int) -> List[Job]:
+        heads = IndexedHeap()
+        for course, heap in self._courses.items():
+            heads.push(course, (self._rank(course), heap.peek_key()))
+        ordered: List[Job] = []
+        while heads and len(ordered) < n:
+            ordered.extend(self.jobs[job_id] for job_id in self._courses[heads.pop()].smallest(n - len(ordered)))
+        return ordered
+
+    def _insert(self, job: Job, seq: int):
+        self._courses.setdefault(job.course, IndexedHeap()).push(job.id, (job.arrival, seq))
+
+    def _delete(self, job: Job):
+        heap = self._courses[job.course]
+        heap.remove(job.id)
+        if not heap:
+            del self._courses[job.course]
+
+    def _select(self, prefer: set) -> int:
+        course = min(self._courses, key=lambda c: (self._rank(c, prefer), self._courses[c].peek_key()))
+        return self._courses[course].peek()
+
+    @abstractmethod
+    def _rank(self, course: str, prefer: set = frozenset()) -> float:
+        """Lower goes first; ties go to the course whose head arrived earliest"""
+
+
+class ExpertisePolicy(CoursePolicy):
+    """Longest-waiting student in one of the TA's courses, else the longest-waiting overall"""
+
+    def __init__(self):
+        super().__init__("expertise")
+
+    def _rank(self, course: str, prefer: set = frozenset()) -> float:
+        return 0 if course in prefer else 1
+
+
+class CourseBalancePolicy(CoursePolicy):
+    """Head of whichever waiting course has been served least, so a rush in one course can't starve another"""
+
+    def __init__(self):
+        super().__init__("course_balance")
+        self.served: Dict[str, int] = {}
+
+    def _rank(self, course: str, prefer: set = frozenset()) -> float:
+        return self.served.get(course, 0)
+
+    def _served(self, job: Job):
+        self.served[job.course] = self.served.get(job.course, 0) + 1
+
+
+def weighted_fair_key(job: Job) -> float:
+    """
+    Virtual finish time: arrival + minutes / weight. Quick and heavily
+    weighted questions jump ahead, but the jump is at most minutes / weight,
+    so anyone waiting that long is ahead of every later arrival (aging).
+    """
+    return job.arrival + job.minutes / max(job.weight, 1e-6)
+
+
+POLICIES: Dict[str, Callable[[], SchedulingPolicy]] = {
+    "fifo": lambda: KeyPolicy("fifo", lambda job: job.arrival),
+    "shortest_job": lambda: KeyPolicy("shortest_job", lambda job: job.minutes),
+    "earliest_deadline": lambda: KeyPolicy("earliest_deadline", lambda job: job.deadline),
+    "weighted_fair": lambda: KeyPolicy("weighted_fair", weighted_fair_key),
+    "course_balance": CourseBalancePolicy,
+    "expertise": ExpertisePolicy,
+}
+
+
+def make_policy(name: str) -> SchedulingPolicy:
+    if name not in POLICIES:
+        raise ValueError(f"unknown policy {name!r}; choose from {', '.join(POLICIES)}")
+    return POLICIES[name]()
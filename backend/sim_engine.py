@@ -0,0 +1,254 @@
+"""
+Discrete-event simulation of an office-hours session
+Students arrive (background Poisson traffic plus waves when labs let out),
+wait until a TA is free or their patience runs out, and are picked from
+the queue by a pluggable scheduling policy (scheduling.py). Whole sessions
+run headless in milliseconds, so policies can be compared over thousands.
+"""
+import heapq
+import itertools
+import math
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from models import AbandonmentModel, SimulationRequest
+from scheduling import POLICIES, Job, SchedulingPolicy
+
+MAX_SESSIONS = 10000
+MAX_STUDENTS = 5000             # per session, waves plus expected background arrivals
+OFF_EXPERTISE_SLOWDOWN = 1.5    # a TA outside their courses takes this much longer
+SERVICE_NOISE_SIGMA = 0.3       # lognormal spread around complexity * minutes_per_complexity
+
+WAITING = "waiting"
+ACTIVE = "active"
+HELPED = "helped"
+LEFT = "left"
+
+# Event kinds; at equal times finishes free TAs before arrivals and give-ups are handled
+FINISH = 0
+ARRIVE = 1
+ABANDON = 2
+
+
+class SimStudent:
+    def __init__(self, id: int, course: str, arrival: float, complexity: int, patience: int,
+                 stress: int, service_minutes: float, estimated_minutes: float, patience_minutes: float):
+        self.id = id
+        self.course = course
+        self.arrival = arrival
+        self.complexity = complexity
+        self.patience = patience
+        self.stress = stress
+        self.service_minutes = service_minutes          # actual, with an expert TA at speed 1
+        self.estimated_minutes = estimated_minutes      # all a policy gets to see, as in the live queue
+        self.deadline = arrival + patience_minutes      # gives up if not picked by then
+        self.state = WAITING
+        self.started: Optional[float] = None
+        self.ta_id: Optional[int] = None
+
+
+class SimTA:
+    def __init__(self, id: int, name: str, courses: Iterable[str], speed: float = 1.0):
+        self.id = id
+        self.name = name
+        self.courses = set(courses)
+        self.speed = speed
+        self.student: Optional[SimStudent] = None
+        self.busy_minutes = 0.0
+        self.helped = 0
+
+    def service_minutes(self, student: SimStudent) -> float:
+        slowdown = 1.0 if student.course in self.courses else OFF_EXPERTISE_SLOWDOWN
+        return student.service_minutes * slowdown / self.speed
+
+
+# ============================================================================
+# Batch stay / leave decisions
+# ============================================================================
+
+def decide_actions(wait_times: np.ndarray, patience: np.ndarray, stress: np.ndarray,
+                   model: AbandonmentModel, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One vectorized pass over the waiting population: (actions, P(leave)),
+    actions being "stay", "get_frustrated" or "leave"
+    """
+    tolerance = patience * model.patience_scale * (1 - model.stress_weight * (stress - 5) / 5)
+    ratio = wait_times / np.maximum(tolerance, 1e-6)
+    p_leave = 1 / (1 + np.exp(-model.steepness * (ratio - 1)))
+    leave = rng.random(len(ratio)) < p_leave
+    actions = np.where(leave, "leave", np.where(ratio > model.frustration_threshold, "get_frustrated", "stay"))
+    return actions, p_leave
+
+
+# ============================================================================
+# Sessions
+# ============================================================================
+
+def generate_students(config: SimulationRequest, rng: random.Random) -> List[SimStudent]:
+    """Arrivals for one session, ordered by time; every policy sees the same ones"""
+    arrivals = []
+    for wave in config.waves:
+        arrivals.extend(wave.at_minute + rng.uniform(0, wave.spread_minutes) for _ in range(wave.students))
+    if config.arrival_rate_per_minute > 0:
+        t = rng.expovariate(config.arrival_rate_per_minute)
+        while t < config.duration_minutes:
+            arrivals.append(t)
+            t += rng.expovariate(config.arrival_rate_per_minute)
+
+    students = []
+    for i, arrival in enumerate(sorted(arrivals)):
+        complexity = rng.randint(1, 5)
+        patience = rng.randint(1, 10)
+        stress = rng.randint(1, 10)
+        estimate = complexity * config.minutes_per_complexity
+        service = estimate * math.exp(rng.gauss(0, SERVICE_NOISE_SIGMA))
+        # Stressed students (midterm week) give up sooner: x1.4 at stress 1 down to x0.5 at 10
+        patience_minutes = patience * config.patience_minutes_per_point * (1.5 - stress / 10)
+        students.append(SimStudent(i, rng.choice(config.courses), arrival, complexity, patience, stress,
+                                   service, estimate, patience_minutes))
+    return students
+
+
+def run_session(config: SimulationRequest, students: List[SimStudent], policy: SchedulingPolicy,
+                timeline: bool = False) -> Dict:
+    """Simulate one session to completion; returns its metrics (and per-minute counts)"""
+    tas = [SimTA(i, ta.name, ta.courses, ta.speed) for i, ta in enumerate(config.tas)]
+    seq = itertools.count()
+    events = [(s.arrival, ARRIVE, next(seq), s) for s in students]
+    heapq.heapify(events)
+
+    now = 0.0
+    waiting_area = 0.0      # integral of queue length over time
+    max_waiting = 0
+    samples: List[Dict] = []
+    next_sample = 0.0
+    counts = {WAITING: 0, ACTIVE: 0, HELPED: 0, LEFT: 0}
+    arrived = 0
+
+    by_id = {s.id: s for s in students}
+
+    def dispatch():
+        for ta in tas:
+            if ta.student is None and len(policy):
+                student = by_id[policy.pop(ta.courses).id]
+                minutes = ta.service_minutes(student)
+                student.state, student.started, student.ta_id = ACTIVE, now, ta.id
+                ta.student = student
+                ta.busy_minutes += minutes
+                counts[WAITING] -= 1
+                counts[ACTIVE] += 1
+                heapq.heappush(events, (now + minutes, FINISH, next(seq), ta))
+
+    while events:
+        at, kind, _, subject = heapq.heappop(events)
+        if timeline:
+            while next_sample <= at:
+                samples.append({"minute": int(next_sample), "arrived": arrived, **counts})
+                next_sample += 1.0
+        waiting_area += counts[WAITING] * (at - now)
+        now = at
+
+        if kind == ARRIVE:
+            arrived += 1
+            counts[WAITING] += 1
+            max_waiting = max(max_waiting, counts[WAITING])
+            # Stress 5 is neutral for weighted_fair; a stressed student counts up to double
+            policy.push(Job(subject.id, subject.arrival, subject.estimated_minutes, subject.deadline,
+                            subject.course, subject.stress / 5))
+            heapq.heappush(events, (subject.deadline, ABANDON, next(seq), subject))
+        elif kind == ABANDON:
+            if subject.state != WAITING:
+                continue        # picked up before running out of patience
+            policy.remove(subject.id)
+            subject.state = LEFT
+            counts[WAITING] -= 1
+            counts[LEFT] += 1
+        else:
+            student, subject.student = subject.student, None
+            student.state = HELPED
+            subject.helped += 1
+            counts[ACTIVE] -= 1
+            counts[HELPED] += 1
+        dispatch()
+
+    if timeline:
+        samples.append({"minute": math.ceil(now), "arrived": arrived, **counts})
+
+    helped = [s for s in students if s.state == HELPED]
+    waits = np.array([s.started - s.arrival for s in helped]) if helped else np.zeros(0)
+    result = {
+        "students": len(students),
+        "helped": len(helped),
+        "abandoned": counts[LEFT],
+        "abandonment_rate": counts[LEFT] / len(students) if students else 0.0,
+        "avg_wait_minutes": float(waits.mean()) if len(waits) else 0.0,
+        "p95_wait_minutes": float(np.percentile(waits, 95)) if len(waits) else 0.0,
+        "max_wait_minutes": float(waits.max()) if len(waits) else 0.0,
+        "avg_queue_length": waiting_area / now if now else 0.0,
+        "max_queue_length": max_waiting,
+        "expertise_match_rate": (sum(1 for s in helped if s.course in tas[s.ta_id].courses) / len(helped)
+                                 if helped else 0.0),
+        "ta_utilization": (sum(ta.busy_minutes for ta in tas) / (len(tas) * now) if tas and now else 0.0),
+        "session_minutes": now,
+    }
+    if timeline:
+        result["timeline"] = samples
+    return result
+
+
+def summarize(results: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """Mean and 5th/50th/95th percentile of each metric across sessions"""
+    summary = {}
+    for metric in results[0]:
+        if metric == "timeline":
+            continue
+        values = np.array([r[metric] for r in results], dtype=float)
+        p5, p50, p95 = np.percentile(values, [5, 50, 95])
+        summary[metric] = {"mean": round(float(values.mean()), 3), "p5": round(float(p5), 3),
+                           "p50": round(float(p50), 3), "p95": round(float(p95), 3)}
+    return summary
+
+
+def run_simulation(config: SimulationRequest) -> Dict:
+    """
+    config.sessions sessions per policy; session i is identical across
+    policies (same seed), so differences come from the policy alone
+    """
+    unknown = [name for name in config.policies if name not in POLICIES]
+    if unknown:
+        raise ValueError(f"unknown policy {unknown[0]!r}; choose from {', '.join(POLICIES)}")
+    if not 1 <= config.sessions <= MAX_SESSIONS:
+        raise ValueError(f"sessions must be between 1 and {MAX_SESSIONS}")
+    if not config.tas:
+        raise ValueError("at least one TA is required")
+    expected = (sum(wave.students for wave in config.waves)
+                + config.arrival_rate_per_minute * config.duration_minutes)
+    if expected > MAX_STUDENTS:
+        raise ValueError(f"at most {MAX_STUDENTS} students per session")
+
+    started = time.perf_counter()
+    factories = {name: POLICIES[name] for name in config.policies}
+    per_policy: Dict[str, List[Dict]] = {name: [] for name in factories}
+    for i in range(config.sessions):
+        students = generate_students(config, random.Random(f"{config.seed}:{i}"))
+        for name, factory in factories.items():
+            for student in students:
+                student.state, student.started, student.ta_id = WAITING, None, None
+            per_policy[name].append(run_session(config, students, factory(),
+                                                timeline=config.include_timeline and i == 0))
+
+    return {
+        "sessions": config.sessions,
+        "seed": config.seed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "policies": {
+            name: {
+                "summary": summarize(results),
+                **({"timeline": results[0]["timeline"]} if config.include_timeline and results else {}),
+            }
+            for name, results in per_policy.items()
+        },
+    }
@@ -0,0 +1,300 @@
+"""
+SQLite persistence for Office Hours Oracle
+Write-through storage behind the Database interface: reads stay in memory,
+mutations are batched to a WAL-mode SQLite file by a background writer
+"""
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from itertools import groupby
+from typing import List, Optional
+
+from db import Database
+from models import (
+    TA, Question, QueueEntry, KBEntry, QueueStatus, AnalyzerOutput, SynthesizerOutput
+)
+from tracing import get_logger
+
+FLUSH_INTERVAL_SECONDS = 0.05
+MAX_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tas (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    expertise_tags TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    student_name TEXT NOT NULL,
+    course TEXT NOT NULL,
+    text TEXT NOT NULL,
+    code TEXT,
+    preferred_ta_id INTEGER,
+    duplicate_of INTEGER,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agent_outputs (
+    question_id INTEGER PRIMARY KEY REFERENCES questions(id),
+    analyzer_output TEXT,
+    synthesizer_output TEXT
+);
+CREATE TABLE IF NOT EXISTS queue_entries (
+    id INTEGER PRIMARY KEY,
+    question_id INTEGER NOT NULL REFERENCES questions(id),
+    assigned_ta_id INTEGER NOT NULL REFERENCES tas(id),
+    estimated_time_minutes INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    matched INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS queue_entries_status ON queue_entries(status);
+CREATE INDEX IF NOT EXISTS queue_entries_ta ON queue_entries(assigned_ta_id, status);
+CREATE INDEX IF NOT EXISTS queue_entries_question ON queue_entries(question_id);
+CREATE TABLE IF NOT EXISTS kb_entries (
+    id INTEGER PRIMARY KEY,
+    question_id INTEGER NOT NULL REFERENCES questions(id),
+    category TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    solution_outline TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS kb_entries_question ON kb_entries(question_id);
+"""
+
+# Fixed statement strings so sqlite3's statement cache keeps them prepared
+INSERT_TA = "INSERT OR REPLACE INTO tas (id, name, expertise_tags, is_active) VALUES (?, ?, ?, ?)"
+INSERT_QUESTION = (
+    "INSERT OR REPLACE INTO questions"
+    " (id, student_name, course, text, code, preferred_ta_id, duplicate_of, created_at)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+UPSERT_ANALYZER = (
+    "INSERT INTO agent_outputs (question_id, analyzer_output) VALUES (?, ?)"
+    " ON CONFLICT(question_id) DO UPDATE SET analyzer_output = excluded.analyzer_output"
+)
+UPSERT_SYNTHESIZER = (
+    "INSERT INTO agent_outputs (question_id, synthesizer_output) VALUES (?, ?)"
+    " ON CONFLICT(question_id) DO UPDATE SET synthesizer_output = excluded.synthesizer_output"
+)
+INSERT_QUEUE_ENTRY = (
+    "INSERT OR REPLACE INTO queue_entries"
+    " (id, question_id, assigned_ta_id, estimated_time_minutes, status, created_at, matched)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+UPDATE_QUEUE_STATUS = "UPDATE queue_entries SET status = ? WHERE id = ?"
+REASSIGN_QUEUE_ENTRY = (
+    "UPDATE queue_entries SET assigned_ta_id = ?, estimated_time_minutes = ?, matched = 1"
+    " WHERE id = ?"
+)
+INSERT_KB_ENTRY = (
+    "INSERT OR REPLACE INTO kb_entries"
+    " (id, question_id, category, tags, summary, solution_outline, created_at)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+_STOP = object()
+
+log = get_logger("sqlite")
+
+
+class BatchWriter(threading.Thread):
+    """
+    Group-commits queued statements off the request path: one transaction
+    per batch, consecutive identical statements sent through executemany
+    """
+
+    def __init__(self, path: str):
+        super().__init__(name="sqlite-writer", daemon=True)
+        self.path = path
+        self._queue: "queue.Queue" = queue.Queue()
+
+    def submit(self, sql: str, params: tuple):
+        self._queue.put((sql, params))
+
+    def flush(self):
+        """Block until everything submitted so far is committed"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self.join()
+
+    def run(self):
+        conn = _connect(self.path)
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+            while len(batch) < MAX_BATCH:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            if _STOP in batch:
+                stopping = True
+            statements = [item for item in batch if isinstance(item, tuple)]
+            try:
+                if statements:
+                    self._commit(conn, statements)
+            except Exception:
+                log.exception("sqlite batch failed", extra={"statements": len(statements)})
+            finally:
+                # Waiters always wake, even if their writes were lost
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        item.set()
+        conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, statements: List[tuple]):
+        try:
+            with conn:
+                for sql, group in groupby(statements, key=lambda item: item[0]):
+                    conn.executemany(sql, [params for _, params in group])
+        except sqlite3.Error:
+            # The whole transaction rolled back; retry one by one so only the bad writes are lost
+            for sql, params in statements:
+                try:
+                    with conn:
+                        conn.execute(sql, params)
+                except sqlite3.Error as e:
+                    log.error("sqlite write failed", extra={"error": str(e), "sql": sql})
+
+
+class SQLiteDatabase(Database):
+    """Database whose mutations are persisted to SQLite and reloaded on start"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Optional[BatchWriter] = None
+        super().__init__()
+
+    def _seed_data(self):
+        conn = _connect(self.path)
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(queue_entries)")}
+        if "matched" not in columns:
+            conn.execute("ALTER TABLE queue_entries ADD COLUMN matched INTEGER NOT NULL DEFAULT 1")
+        empty = conn.execute("SELECT COUNT(*) FROM tas").fetchone()[0] == 0
+        if not empty:
+            self._load(conn)
+        conn.close()
+
+        self._writer = BatchWriter(self.path)
+        self._writer.start()
+        if empty:
+            super()._seed_data()
+
+    def _load(self, conn: sqlite3.Connection):
+        for id, name, tags, is_active in conn.execute("SELECT * FROM tas ORDER BY id"):
+            self._store_ta(TA(id, name, json.loads(tags), bool(is_active)))
+
+        outputs = {row[0]: row[1:] for row in conn.execute("SELECT * FROM agent_outputs")}
+        for (id, student_name, course, text, code, preferred_ta_id,
+             duplicate_of, created_at) in conn.execute("SELECT * FROM questions ORDER BY id"):
+            question = Question(id, student_name, course, text, code, preferred_ta_id)
+            question.duplicate_of = duplicate_of
+            question.created_at = datetime.fromisoformat(created_at)
+            analyzer, synthesizer = outputs.get(id, (None, None))
+            if analyzer:
+                question.analyzer_output = AnalyzerOutput.model_validate_json(analyzer)
+            if synthesizer:
+                question.synthesizer_output = SynthesizerOutput.model_validate_json(synthesizer)
+            self._store_question(question)
+
+        for (id, question_id, ta_id, minutes, status,
+             created_at, matched) in conn.execute("SELECT * FROM queue_entries ORDER BY id"):
+            entry = QueueEntry(id, question_id, ta_id, minutes, QueueStatus(status), bool(matched))
+            entry.created_at = datetime.fromisoformat(created_at)
+            self._store_queue_entry(entry)
+
+        for (id, question_id, category, tags, summary, outline,
+             created_at) in conn.execute("SELECT * FROM kb_entries ORDER BY id"):
+            entry = KBEntry(id, question_id, category, json.loads(tags), summary, outline)
+            entry.created_at = datetime.fromisoformat(created_at)
+            self._store_kb_entry(entry)
+
+        self._ta_counter = max(self.tas, default=0)
+        self._question_counter = max(self.questions, default=0)
+        self._queue_counter = max(self.queue, default=0)
+        self._kb_counter = max(self.kb_entries, default=0)
+
+    def flush(self):
+        self._writer.flush()
+
+    def close(self):
+        self._writer.close()
+
+    # Write-through mutations
+    def add_ta(self, name: str, expertise_tags: List[str]) -> TA:
+        ta = super().add_ta(name, expertise_tags)
+        self._writer.submit(INSERT_TA, (ta.id, ta.name, json.dumps(ta.expertise_tags), int(ta.is_active)))
+        return ta
+
+    def add_question(self, student_name: str, course: str, text: str,
+                    code: Optional[str] = None, preferred_ta_id: Optional[int] = None,
+                    duplicate_of: Optional[int] = None, created_at: Optional[datetime] = None) -> Question:
+        q = super().add_question(student_name, course, text, code, preferred_ta_id, duplicate_of, created_at)
+        self._writer.submit(INSERT_QUESTION, (q.id, q.student_name, q.course, q.text, q.code,
+                                              q.preferred_ta_id, q.duplicate_of,
+                                              q.created_at.isoformat()))
+        return q
+
+    def set_agent_outputs(self, question_id: int,
+                          analyzer_output: Optional[AnalyzerOutput] = None,
+                          synthesizer_output: Optional[SynthesizerOutput] = None) -> Optional[Question]:
+        question = super().set_agent_outputs(question_id, analyzer_output, synthesizer_output)
+        if question:
+            if analyzer_output is not None:
+                self._writer.submit(UPSERT_ANALYZER, (question_id, analyzer_output.model_dump_json()))
+            if synthesizer_output is not None:
+                self._writer.submit(UPSERT_SYNTHESIZER, (question_id, synthesizer_output.model_dump_json()))
+        return question
+
+    def add_to_queue(self, question_id: int, assigned_ta_id: int,
+                    estimated_time_minutes: int, matched: bool = True,
+                    created_at: Optional[datetime] = None) -> QueueEntry:
+        e = super().add_to_queue(question_id, assigned_ta_id, estimated_time_minutes, matched, created_at)
+        self._writer.submit(INSERT_QUEUE_ENTRY, (e.id, e.question_id, e.assigned_ta_id,
+                                                 e.estimated_time_minutes, e.status.value,
+                                                 e.created_at.isoformat(), int(e.matched)))
+        return e
+
+    def reassign_queue_entry(self, queue_id: int, assigned_ta_id: int,
+                             estimated_time_minutes: int) -> Optional[QueueEntry]:
+        entry = super().reassign_queue_entry(queue_id, assigned_ta_id, estimated_time_minutes)
+        if entry:
+            self._writer.submit(REASSIGN_QUEUE_ENTRY, (assigned_ta_id, estimated_time_minutes, queue_id))
+        return entry
+
+    def update_queue_status(self, queue_id: int, status: QueueStatus) -> Optional[QueueEntry]:
+        entry = super().update_queue_status(queue_id, status)
+        if entry:
+            self._writer.submit(UPDATE_QUEUE_STATUS, (status.value, queue_id))
+        return entry
+
+    def add_kb_entry(self, question_id: int, category: str, tags: List[str],
+                    summary: str, solution_outline: str, created_at: Optional[datetime] = None) -> KBEntry:
+        e = super().add_kb_entry(question_id, category, tags, summary, solution_outline, created_at)
+        self._writer.submit(INSERT_KB_ENTRY, (e.id, e.question_id, e.category, json.dumps(e.tags),
+                                              e.summary, e.solution_outline,
+                                              e.created_at.isoformat()))
+        return e
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,133 @@
+"""
+Incremental parsing of streamed agent JSON
+Follows a top-level JSON object as it arrives chunk by chunk and reports
+text appended to selected string fields before the object is complete
+"""
+from typing import Dict, Iterable, List, Optional
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_WHITESPACE = " \t\r\n"
+
+
+class PartialJSONFields:
+    """
+    Single-pass scanner (no re-parsing of the buffer): feed() returns
+    {field: newly decoded text} for the watched fields touched by the chunk
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = set(fields)
+        self.values: Dict[str, str] = {field: "" for field in self.fields}
+        self._state = "object"
+        self._key: List[str] = []
+        self._target: Optional[str] = None   # watched field of the string being read
+        self._escape: Optional[str] = None   # pending escape sequence after a backslash
+        self._high_surrogate: Optional[int] = None
+        self._depth = 0                      # nesting of a skipped array/object value
+        self._skip_in_string = False
+        self._skip_escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, chunk: str) -> Dict[str, str]:
+        appended: Dict[str, List[str]] = {}
+        for ch in chunk:
+            state = self._state
+            if state == "string":
+                text = self._read_string_char(ch)
+                if text and self._target:
+                    appended.setdefault(self._target, []).append(text)
+            elif state == "skip":
+                self._skip_char(ch)
+            elif state == "object":
+                if ch == "{":          # anything before the object (e.g. a code fence) is ignored
+                    self._state = "key_start"
+            elif state == "key_start":
+                if ch == '"':
+                    self._key = []
+                    self._state = "key"
+                elif ch == "}":
+                    self._state = "done"
+            elif state == "key":
+                if ch == '"' and not (self._key and self._key[-1] == "\\"):
+                    self._state = "colon"
+                else:
+                    self._key.append(ch)
+            elif state == "colon":
+                if ch == ":":
+                    self._state = "value"
+            elif state == "value":
+                if ch in _WHITESPACE:
+                    continue
+                if ch == '"':
+                    key = "".join(self._key)
+                    self._target = key if key in self.fields else None
+                    self._state = "string"
+                elif ch in "[{":
+                    self._depth = 1
+                    self._state = "skip"
+                else:
+                    self._state = "scalar"
+            elif state == "scalar":
+                if ch == ",":
+                    self._state = "key_start"
+                elif ch == "}":
+                    self._state = "done"
+            elif state == "comma":
+                if ch == ",":
+                    self._state = "key_start"
+                elif ch == "}":
+                    self._state = "done"
+
+        result = {field: "".join(parts) for field, parts in appended.items()}
+        for field, text in result.items():
+            self.values[field] += text
+        return result
+
+    def _read_string_char(self, ch: str) -> str:
+        if self._escape is not None:
+            self._escape += ch
+            if self._escape[0] != "u":
+                self._escape, esc = None, self._escape
+                return _ESCAPES.get(esc, esc)
+            if len(self._escape) < 5:
+                return ""
+            code = int(self._escape[1:], 16)
+            self._escape = None
+            return self._code_point(code)
+        if ch == "\\":
+            self._escape = ""
+            return ""
+        if ch == '"':
+            self._target = None
+            self._state = "comma"
+            return ""
+        return ch
+
+    def _code_point(self, code: int) -> str:
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def _skip_char(self, ch: str):
+        if self._skip_in_string:
+            if self._skip_escape:
+                self._skip_escape = False
+            elif ch == "\\":
+                self._skip_escape = True
+            elif ch == '"':
+                self._skip_in_string = False
+        elif ch == '"':
+            self._skip_in_string = True
+        elif ch in "[{":
+            self._depth += 1
+        elif ch in "]}":
+            self._depth -= 1
+            if self._depth == 0:
+                self._state = "comma"
@@ -0,0 +1,7 @@
+"""Backend modules import each other flat (from db import db), as when run from backend/"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("USE_MOCK_CLAUDE", "true")
+os.environ.setdefault("EVENT_LOG_FSYNC", "false")
@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import claude_client
+import main
+from batcher import MicroBatcher
+from claude_client import AnalyzerRequest, analyze_questions, set_analyzer_backend, stub_analyzer_backend
+
+
+@pytest.fixture
+def backend_calls():
+    """Stub analyzer backend that records each batch it is handed"""
+    calls = []
+
+    async def recording_backend(requests):
+        calls.append([request.question_text for request in requests])
+        return await stub_analyzer_backend(requests)
+
+    set_analyzer_backend(recording_backend)
+    yield calls
+    set_analyzer_backend(stub_analyzer_backend)
+
+
+def unique(text: str) -> str:
+    """Question text no earlier test has cached or stored"""
+    return f"{text} [{uuid.uuid4().hex[:8]}]"
+
+
+def test_micro_batcher_groups_by_size_then_window():
+    batches = []
+
+    async def handler(items):
+        batches.append(items)
+        return [item * 10 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(handler, 0.01, 3)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(7)))
+
+    assert asyncio.run(run()) == [i * 10 for i in range(7)]
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_micro_batcher_fails_callers_missing_from_a_short_result():
+    async def handler(items):
+        return items[:1]
+
+    async def run():
+        batcher = MicroBatcher(handler, 0.01, 3)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True), 1)
+
+    first, *rest = asyncio.run(run())
+    assert first == 0
+    assert all(isinstance(result, ValueError) for result in rest)
+
+
+def test_analyze_questions_coalesces_and_chunks(backend_calls, monkeypatch):
+    monkeypatch.setattr(claude_client, "ANALYZER_BATCH_SIZE", 2)
+    texts = [unique(f"Question {i}") for i in range(3)]
+    requests = [AnalyzerRequest("Ana", "CS 400", text) for text in texts + [texts[0]]]
+
+    outputs = asyncio.run(analyze_questions(requests))
+
+    assert sorted(len(call) for call in backend_calls) == [1, 2]      # 3 distinct questions, chunks of 2
+    assert sum(backend_calls, []).count(texts[0]) == 1
+    assert [o.brief_summary for o in outputs] == [f"Student needs help with: {t}" for t in texts + [texts[0]]]
+
+    backend_calls.clear()
+    asyncio.run(analyze_questions(requests[:1]))
+    assert backend_calls == []                                          # answered from the cache
+
+
+def test_batch_endpoint_returns_one_result_per_question(backend_calls):
+    texts = [unique("Why does my AVL rotation lose nodes?"), unique("Segfault freeing a list")]
+    body = [{"student_name": f"S{i}", "course": "CS 400", "question_text": text}
+            for i, text in enumerate(texts)]
+    with TestClient(main.app) as client:
+        response = client.post("/api/questions/batch", json=body)
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["brief_summary"] for r in results] == [f"Student needs help with: {t}" for t in texts]
+    assert len({r["queue_id"] for r in results}) == len(texts)
+    assert backend_calls == [texts]                                     # one analyzer request for the batch
+
+
+def test_batch_endpoint_rejects_oversized_batches(backend_calls, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_QUESTIONS", 2)
+    body = [{"student_name": "S", "course": "CS 400", "question_text": unique("Q")} for _ in range(3)]
+    with TestClient(main.app) as client:
+        response = client.post("/api/questions/batch", json=body)
+    assert response.status_code == 413
+    assert backend_calls == []
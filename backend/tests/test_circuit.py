@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from circuit import CLOSED, CircuitBreaker, DeadlineExceeded, QueueWaitExceeded
+from llm_scheduler import LLMScheduler
+
+
+def run_calls(breaker: CircuitBreaker, scheduler: LLMScheduler, count: int, provider_seconds: float):
+    async def provider():
+        await asyncio.sleep(provider_seconds)
+        return "ok"
+
+    async def one():
+        started = time.monotonic()
+        try:
+            result = await breaker.call(lambda: scheduler.run(provider))
+        except Exception as e:
+            result = e
+        return result, time.monotonic() - started
+
+    async def main():
+        return await asyncio.gather(*(one() for _ in range(count)))
+
+    return asyncio.run(main())
+
+
+def test_queue_wait_is_bounded_without_tripping_breaker():
+    scheduler = LLMScheduler(1)
+    breaker = CircuitBreaker("analyzer", 0.2, 0.2, failure_threshold=2, max_queue_seconds=0.25)
+    results = run_calls(breaker, scheduler, 8, 0.09)
+
+    served = [r for r, _ in results if r == "ok"]
+    timed_out = [r for r, _ in results if isinstance(r, QueueWaitExceeded)]
+    assert len(served) == 3 and len(timed_out) == 5
+    assert max(elapsed for _, elapsed in results) < 0.25 + 0.2
+    assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+    assert breaker.queue_timeouts == 5
+    assert scheduler.in_flight == 0 and scheduler.stats()["queue_depth"] == 0
+
+
+def test_deadline_starts_at_slot_grant():
+    scheduler = LLMScheduler(1)
+    breaker = CircuitBreaker("matcher", 0.15, 0.15, max_queue_seconds=1.0)
+    results = run_calls(breaker, scheduler, 3, 0.1)
+    assert [r for r, _ in results] == ["ok", "ok", "ok"]      # 0.3 s queued, each call within 0.15 s
+
+    results = run_calls(breaker, scheduler, 1, 0.3)
+    assert isinstance(results[0][0], DeadlineExceeded)
+    assert breaker.consecutive_failures == 1
+
+
+def test_shared_call_cancelled_when_every_waiter_gives_up():
+    scheduler = LLMScheduler(1)
+    breaker = CircuitBreaker("synthesizer", 1.0, 1.0, max_queue_seconds=0.05)
+    calls = []
+
+    async def provider():
+        calls.append(time.monotonic())
+        await asyncio.sleep(0.2)
+        return "ok"
+
+    async def main():
+        blocker = asyncio.ensure_future(scheduler.run(provider))
+        await asyncio.sleep(0)
+        shared = [breaker.call(lambda: scheduler.run(provider, key="same")) for _ in range(3)]
+        results = await asyncio.gather(*shared, return_exceptions=True)
+        await blocker
+        await asyncio.sleep(0.01)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, QueueWaitExceeded) for r in results)
+    assert len(calls) == 1          # the coalesced call never reached the provider
+    assert scheduler._shared == {}
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from db import DUPLICATE_MAX_AGE, DUPLICATE_THRESHOLD, Database
+from dedup import MinHashLSH, shingles
+from models import AnalyzerOutput, DifficultyLevel
+
+QUESTION = "Why does my recursive fibonacci function hit the maximum recursion depth for n = 5000?"
+CODE = "def fib(n):\n    return n if n < 2 else fib(n - 1) + fib(n - 2)"
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def test_signature_estimates_jaccard():
+    lsh = MinHashLSH(num_perm=256, bands=32)
+    base = shingles(QUESTION, CODE)
+    edited = shingles(QUESTION.replace("5000", "10000").replace("Why", "How come"), CODE)
+    sig_a, sig_b = lsh.signature(base), lsh.signature(edited)
+    assert abs(float(np.mean(sig_a == sig_b)) - jaccard(base, edited)) < 0.1
+
+
+def test_shingles_ignore_case_and_whitespace():
+    assert shingles("Why  does\nmy CODE fail") == shingles("why does my code fail")
+    assert shingles("x", "a  +  b") == shingles("x", "a+b")
+
+
+@pytest.mark.parametrize("text, code, is_candidate", [
+    (QUESTION, CODE, True),
+    (QUESTION.replace("my", "the"), CODE, True),
+    (QUESTION.lower() + "  ", CODE, True),
+    ("How do I read a CSV file into a pandas DataFrame?", None, False),
+    ("Segfault when freeing a linked list node twice in C", "free(node); free(node);", False),
+])
+def test_query_thresholds(text, code, is_candidate):
+    lsh = MinHashLSH()
+    lsh.add(1, shingles(QUESTION, CODE))
+    hits = dict(lsh.query(shingles(text, code)))
+    assert (hits.get(1, 0.0) >= DUPLICATE_THRESHOLD) == is_candidate
+
+
+def test_find_duplicate_question_requires_course_age_and_outputs():
+    db = Database()
+    analyzer = AnalyzerOutput(category="Recursion", estimated_difficulty=DifficultyLevel.LOW,
+                              estimated_time_minutes=5, tags=["recursion"], brief_summary="Recursion depth")
+    original = db.add_question("A", "CS 300", QUESTION, CODE)
+    assert db.find_duplicate_question("CS 300", QUESTION, CODE) is None     # no agent outputs yet
+
+    db.set_agent_outputs(original.id, analyzer)
+    assert db.find_duplicate_question("cs 300", QUESTION.replace("my", "the"), CODE) is original
+    assert db.find_duplicate_question("CS 400", QUESTION, CODE) is None
+    assert db.find_duplicate_question("CS 300", "How do I reverse a string in Java?") is None
+
+    original.created_at = datetime.now() - DUPLICATE_MAX_AGE - timedelta(minutes=1)
+    assert db.find_duplicate_question("CS 300", QUESTION, CODE) is None
@@ -0,0 +1,138 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import db as db_module
+import models
+import retrieval
+from event_log import LOG_FILE, SNAPSHOT_FILE, EventLogDatabase, LogWriter
+from models import QueueStatus
+
+T0 = datetime(2026, 10, 1, 14, 0)
+
+
+class Clock(datetime):
+    now_value = T0
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.now_value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(models, "datetime", Clock)
+    Clock.now_value = T0
+    return Clock
+
+
+def crash(database: EventLogDatabase):
+    """Stop without the closing snapshot, leaving everything in the log tail"""
+    database._writer.close()
+
+
+@pytest.mark.parametrize("shutdown", ["snapshot", "log"])
+def test_recovered_entries_keep_their_arrival_order(tmp_path, clock, monkeypatch, shutdown):
+    monkeypatch.setattr(db_module, "QUEUE_POLICY", "weighted_fair")
+    first = EventLogDatabase(str(tmp_path))
+    question = first.add_question("Ana", "CS 400", "Why does my AVL rotation lose nodes?")
+    old = first.add_to_queue(question.id, 1, 30)
+    resolved = first.add_to_queue(first.add_question("Ben", "CS 400", "Heap sort").id, 1, 1)
+    first.update_queue_status(resolved.id, QueueStatus.DONE)
+    first.close() if shutdown == "snapshot" else crash(first)
+
+    # Two hours later a quick question arrives; the long-waiting one must still go first
+    clock.now_value = T0 + timedelta(hours=2)
+    second = EventLogDatabase(str(tmp_path))
+    try:
+        assert second.get_queue_entry(old.id).created_at == T0
+        new = second.add_to_queue(second.add_question("Cy", "CS 400", "Quick BFS check").id, 1, 5)
+        assert [e.id for e in second.get_active_queue()] == [old.id, new.id]
+        assert second.get_next_for_ta(1).id == old.id
+        second.update_queue_status(old.id, QueueStatus.DONE)
+        assert second.get_next_for_ta(1).id == new.id
+    finally:
+        second.close()
+
+
+def test_snapshot_then_tail_round_trip(tmp_path, clock):
+    first = EventLogDatabase(str(tmp_path))
+    before = first.add_to_queue(first.add_question("Ana", "CS 400", "Snapshot me").id, 2, 10)
+    first.snapshot()
+    clock.now_value = T0 + timedelta(minutes=20)
+    after = first.add_to_queue(first.add_question("Ben", "CS 354", "Replay me").id, 2, 15)
+    first.reassign_queue_entry(after.id, 3, 12)
+    crash(first)
+
+    second = EventLogDatabase(str(tmp_path))
+    try:
+        restored = {e.id: e for e in second.get_active_queue()}
+        assert restored[before.id].created_at == T0
+        assert restored[after.id].created_at == T0 + timedelta(minutes=20)
+        assert (restored[after.id].assigned_ta_id, restored[after.id].estimated_time_minutes) == (3, 12)
+        assert second.get_ta_queue_minutes(2) == 10
+        assert second.get_next_for_ta(3).id == after.id
+    finally:
+        second.close()
+
+
+def test_snapshot_restores_kb_vectors_without_embedding(tmp_path, monkeypatch):
+    first = EventLogDatabase(str(tmp_path))
+    for i, topic in enumerate(["AVL rotations", "segfault in linked list", "Dijkstra with a heap"]):
+        question = first.add_question("Ana", "CS 400", f"Help with {topic} {i}")
+        first.add_kb_entry(question.id, topic, topic.split(), f"Explained {topic}", "Outline")
+    expected = first.search_kb([], query_text="heap based shortest path")
+    first.close()
+
+    def no_embedding(self, text):
+        raise AssertionError("KB entry re-embedded on boot")
+
+    monkeypatch.setattr(retrieval.VectorIndex, "embed", no_embedding)
+    second = EventLogDatabase(str(tmp_path))
+    try:
+        assert len(second._kb_vectors) == len(second.kb_entries)
+        monkeypatch.undo()
+        assert [e.id for e in second.search_kb([], query_text="heap based shortest path")] == \
+            [e.id for e in expected]
+    finally:
+        second.close()
+
+
+def test_log_writer_keeps_the_log_when_a_snapshot_fails(tmp_path):
+    writer = LogWriter(str(tmp_path))
+    writer.start()
+    try:
+        writer.append('{"seq":1}')
+        writer.snapshot(lambda: {"seq": 1, "bad": object()})  # not JSON-serializable
+        writer.append('{"seq":2}')
+        writer.flush()
+        assert writer.is_alive()
+        with open(tmp_path / LOG_FILE) as f:
+            assert [json.loads(line)["seq"] for line in f] == [1, 2]
+        writer.snapshot(lambda: {"seq": 2})
+        writer.append('{"seq":3}')
+        writer.flush()
+    finally:
+        writer.close()
+    with open(tmp_path / SNAPSHOT_FILE) as f:
+        assert json.load(f) == {"seq": 2}
+    with open(tmp_path / LOG_FILE) as f:
+        assert [json.loads(line)["seq"] for line in f] == [3]
+
+
+def test_journaled_mutations_accept_created_at(tmp_path):
+    arrived = datetime(2026, 9, 30, 11, 15)
+    first = EventLogDatabase(str(tmp_path))
+    question = first.add_question("Ana", "CS 400", "Imported question", created_at=arrived)
+    entry = first.add_to_queue(question.id, 1, 10, created_at=arrived)
+    kb = first.add_kb_entry(question.id, "Trees", ["avl"], "Summary", "Outline", created_at=arrived)
+    crash(first)
+
+    second = EventLogDatabase(str(tmp_path))
+    try:
+        assert second.get_question(question.id).created_at == arrived
+        assert second.get_queue_entry(entry.id).created_at == arrived
+        assert second.kb_entries[kb.id].created_at == arrived
+    finally:
+        second.close()
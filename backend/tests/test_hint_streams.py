@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+import main
+from main import HintStreams
+from models import SynthesizerOutput
+
+
+def output(hint: str, outline: str = "Outline") -> SynthesizerOutput:
+    return SynthesizerOutput(similar_question_ids=[], similarity_explanation="",
+                             suggested_answer_outline=outline, student_friendly_hint=hint)
+
+
+@pytest.fixture
+def broadcasts(monkeypatch):
+    sent = []
+    monkeypatch.setattr(main.manager, "broadcast", sent.append)
+    return sent
+
+
+def test_completed_stream_needs_no_replacement(broadcasts):
+    streams = HintStreams()
+    streams.publish(7, {"student_friendly_hint": "Check the "})
+    streams.publish(7, {"student_friendly_hint": "base case", "suggested_answer_outline": "Outline"})
+    streams.finish(7, output("Check the base case"))
+    assert [b.get("replaced") for b in broadcasts] == [None, None]
+
+
+def test_cut_off_stream_is_marked_replaced(broadcasts):
+    async def run():
+        streams = HintStreams()
+        streams.publish(7, {"student_friendly_hint": "Check the ba"})
+        subscriber = streams.subscribe(7)
+        streams.finish(7, output("Fallback hint", "Fallback outline"))
+        return [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+
+    assert asyncio.run(run()) == ["Check the ba", None]
+    assert broadcasts[-1] == {"type": "hint_delta", "queue_id": 7, "replaced": True,
+                              "fields": {"student_friendly_hint": "Fallback hint"}}
+
+
+def test_failed_enrichment_clears_streamed_text(broadcasts):
+    streams = HintStreams()
+    streams.publish(3, {"suggested_answer_outline": "1. Trace"})
+    streams.finish(3, None)
+    assert broadcasts[-1]["replaced"] is True
+    assert broadcasts[-1]["fields"] == {"suggested_answer_outline": None}
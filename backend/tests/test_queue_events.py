@@ -0,0 +1,20 @@
+from main import QueueEventLog
+
+
+def test_since_replays_the_window_and_resyncs_outside_it():
+    events = QueueEventLog(history=3)
+    for i in range(5):
+        events.record("added", queue_id=i)
+
+    assert events.since(5) == []
+    assert [e["seq"] for e in events.since(3)] == [4, 5]
+    assert [e["seq"] for e in events.since(2)] == [3, 4, 5]
+    assert events.since(1) is None          # seq 2 fell out of the window
+    assert events.since(6) is None          # ahead of the server, e.g. a cursor from before a restart
+
+
+def test_fresh_log_resyncs_any_cursor_but_its_own():
+    events = QueueEventLog()
+    assert events.since(0) == []
+    assert events.since(-1) is None
+    assert events.since(40) is None
@@ -0,0 +1,67 @@
+import random
+import string
+
+import numpy as np
+import pytest
+
+import retrieval
+from retrieval import IVF_MIN_ROWS, VectorIndex
+
+
+@pytest.fixture(scope="module")
+def clustered_index():
+    """A trained IVF index over topical text (word groups standing in for course subjects)"""
+    rng = random.Random(0)
+    groups = [["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+               for _ in range(30)] for _ in range(40)]
+    filler = "how do i fix my code error why does it fail help with the when not working".split()
+
+    def text():
+        group = rng.choice(groups)
+        return " ".join(rng.choice(group) if rng.random() < 0.7 else rng.choice(filler)
+                        for _ in range(rng.randint(8, 20)))
+
+    docs = [text() for _ in range(IVF_MIN_ROWS + 2000)]
+    index = VectorIndex()
+    index.add_vectors(np.arange(len(docs)), np.stack([index.embed(doc) for doc in docs]))
+    index._training.result()
+    index._refresh_clusters()
+    assert index._centroids is not None
+
+    queries = []
+    for _ in range(200):
+        words = rng.choice(docs).split()
+        queries.append(" ".join([w for w in words if rng.random() > 0.2] + [rng.choice(filler)]))
+    return index, queries
+
+
+def recall_at_10(index: VectorIndex, queries) -> float:
+    total = 0.0
+    for query in queries:
+        exact = {item for item, _ in index.search(query, 10, exhaustive=True)}
+        approx = {item for item, _ in index.search(query, 10)}
+        total += len(exact & approx) / max(len(exact), 1)
+    return total / len(queries)
+
+
+def test_ivf_recall_against_exact_scan(clustered_index):
+    index, queries = clustered_index
+    assert recall_at_10(index, queries) >= 0.9
+
+
+def test_probing_every_cluster_matches_exact_scan(clustered_index, monkeypatch):
+    index, queries = clustered_index
+    monkeypatch.setattr(retrieval, "IVF_PROBES", len(index._clusters))
+    for query in queries[:20]:
+        exact = index.search(query, 10, exhaustive=True)
+        assert [item for item, _ in index.search(query, 10)] == [item for item, _ in exact]
+
+
+def test_exact_scan_scores_are_cosines():
+    index = VectorIndex()
+    docs = ["red black tree rotation", "segfault freeing a linked list", "dijkstra with a binary heap"]
+    for i, doc in enumerate(docs):
+        index.add(i, doc)
+    (best, score), *_ = index.search("binary heap for dijkstra", 3)
+    assert best == 2
+    assert score == pytest.approx(float(index.embed(docs[2]) @ index.embed("binary heap for dijkstra")))
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from scheduling import IndexedHeap, Job, SchedulingPolicy, make_policy
+
+
+def assert_heap(heap: IndexedHeap):
+    entries = heap._heap
+    for i, (key, item) in enumerate(entries):
+        assert heap._pos[item] == i
+        if i:
+            assert entries[(i - 1) >> 1][0] <= key
+    assert len(heap._pos) == len(entries)
+
+
+def test_indexed_heap_keeps_invariant_under_update_and_remove():
+    rng = random.Random(7)
+    heap = IndexedHeap()
+    keys = {}
+    for step in range(3000):
+        op = rng.random()
+        if op < 0.4 or not keys:
+            item = rng.randrange(500)
+            keys[item] = (rng.random(), step)
+            heap.push(item, keys[item])                    # re-push of a present item updates it
+        elif op < 0.6:
+            item = rng.choice(list(keys))
+            keys[item] = (rng.random(), step)
+            heap.update(item, keys[item])
+        elif op < 0.8:
+            item = rng.choice(list(keys))
+            assert heap.remove(item)
+            assert not heap.remove(item)
+            del keys[item]
+        else:
+            expected = min(keys, key=keys.get)
+            assert heap.peek_key() == keys[expected]
+            assert heap.pop() == expected
+            del keys[expected]
+        assert_heap(heap)
+        assert len(heap) == len(keys)
+
+    ranked = sorted(keys, key=keys.get)
+    assert heap.smallest(25) == ranked[:25]
+    assert_heap(heap)
+    assert [heap.pop() for _ in range(len(keys))] == ranked
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("fifo", [1, 2, 3, 4]),
+    ("shortest_job", [3, 4, 2, 1]),
+    ("earliest_deadline", [2, 4, 1, 3]),
+    ("weighted_fair", [2, 3, 4, 1]),
+])
+def test_key_policies_order(name, expected):
+    policy = make_policy(name)
+    for job in [Job(1, 0, 20, deadline=30), Job(2, 1, 10, deadline=15, weight=4),
+                Job(3, 2, 5, deadline=60), Job(4, 3, 8, deadline=20)]:
+        policy.push(job)
+    assert [job.id for job in policy.shortlist(4)] == expected
+    assert [policy.pop().id for _ in range(4)] == expected
+    assert policy.pop() is None
+
+
+def test_remove_and_repush():
+    policy = make_policy("fifo")
+    for i in range(5):
+        policy.push(Job(i, i, 10))
+    assert policy.remove(2).id == 2
+    assert policy.remove(2) is None
+    policy.push(Job(0, 10, 10))                            # re-queued at the back
+    assert [policy.pop().id for _ in range(len(policy))] == [1, 3, 4, 0]
+
+
+def test_course_policies():
+    expertise = make_policy("expertise")
+    balance = make_policy("course_balance")
+    jobs = [Job(1, 0, 10, course="CS 300"), Job(2, 1, 10, course="CS 300"),
+            Job(3, 2, 10, course="CS 400"), Job(4, 3, 10, course="CS 400")]
+    for job in jobs:
+        expertise.push(job)
+        balance.push(job)
+
+    assert expertise.pop(prefer=["CS 400"]).id == 3
+    assert expertise.pop(prefer=["CS 500"]).id == 1        # no match: longest waiting overall
+
+    assert [balance.pop().id for _ in range(4)] == [1, 3, 2, 4]
+    assert balance.served == {"CS 300": 2, "CS 400": 2}
+
+
+def test_policy_hooks_are_abstract():
+    class Incomplete(SchedulingPolicy):
+        def shortlist(self, n):
+            return []
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(ValueError):
+        make_policy("nope")
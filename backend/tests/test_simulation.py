@@ -0,0 +1,21 @@
+import pytest
+from pydantic import ValidationError
+
+from models import SimTAConfig, SimulationRequest
+from sim_engine import run_simulation
+
+
+@pytest.mark.parametrize("speed", [0, -0.5])
+def test_ta_speed_must_be_positive(speed):
+    with pytest.raises(ValidationError):
+        SimTAConfig(name="TA", courses=["CS400"], speed=speed)
+
+
+def test_faster_tas_help_more_students():
+    def helped(speed):
+        config = SimulationRequest(
+            sessions=2, include_timeline=False,
+            tas=[SimTAConfig(name="TA", courses=["CS400", "CS577"], speed=speed)])
+        return run_simulation(config)["policies"]["fifo"]["summary"]["helped"]["mean"]
+
+    assert helped(2.0) > helped(0.5)
@@ -0,0 +1,43 @@
+import sqlite3
+from datetime import datetime
+
+from sqlite_db import INSERT_TA, SCHEMA, BatchWriter, SQLiteDatabase
+
+
+def test_sqlite_writer_survives_bad_statements(tmp_path):
+    path = str(tmp_path / "oho.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA)
+    writer = BatchWriter(path)
+    writer.start()
+    try:
+        writer.submit(INSERT_TA, (1, "Alice", "[]", 1))
+        writer.submit(INSERT_TA, (2, None, "[]", 1))         # NOT NULL violation
+        writer.submit("INSERT INTO missing VALUES (?)", (1,))
+        writer.submit(INSERT_TA, (3, "Cara", "[]", 1))
+        writer.flush()                                        # returns despite the failures
+        writer.submit(INSERT_TA, (4, "Dev", "[]", 1))
+        writer.flush()
+        assert writer.is_alive()
+    finally:
+        writer.close()
+    with sqlite3.connect(path) as conn:
+        assert [row[0] for row in conn.execute("SELECT id FROM tas ORDER BY id")] == [1, 3, 4]
+
+
+def test_sqlite_database_persists_given_created_at(tmp_path):
+    path = str(tmp_path / "oho.db")
+    arrived = datetime(2026, 10, 1, 9, 30)
+    first = SQLiteDatabase(path)
+    question = first.add_question("Ana", "CS 400", "Restored question", created_at=arrived)
+    entry = first.add_to_queue(question.id, 1, 10, created_at=arrived)
+    kb = first.add_kb_entry(question.id, "Trees", ["avl"], "Summary", "Outline", created_at=arrived)
+    first.close()
+
+    second = SQLiteDatabase(path)
+    try:
+        assert second.get_question(question.id).created_at == arrived
+        assert second.get_queue_entry(entry.id).created_at == arrived
+        assert second.kb_entries[kb.id].created_at == arrived
+    finally:
+        second.close()
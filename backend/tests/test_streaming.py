@@ -0,0 +1,45 @@
+import json
+import random
+
+from streaming import PartialJSONFields
+
+DOCUMENT = json.dumps({
+    "summary": "Use a \"dict\" \\ not a list\nthen\tindex",
+    "steps": ["skip", {"nested": "} ] \" tricky"}],
+    "score": 0.5,
+    "hint": "café \U0001F600 / done",
+    "other": "ignored",
+})
+
+
+def feed_in_chunks(parser: PartialJSONFields, text: str, sizes):
+    pieces = []
+    i = 0
+    for size in sizes:
+        pieces.append(parser.feed(text[i:i + size]))
+        i += size
+    pieces.append(parser.feed(text[i:]))
+    return pieces
+
+
+def test_partial_fields_match_full_parse_for_any_chunking():
+    expected = json.loads(DOCUMENT)
+    rng = random.Random(3)
+    for _ in range(200):
+        parser = PartialJSONFields(["summary", "hint"])
+        pieces = feed_in_chunks(parser, DOCUMENT, [rng.randint(1, 7) for _ in range(len(DOCUMENT))])
+        assert parser.done
+        assert parser.values == {"summary": expected["summary"], "hint": expected["hint"]}
+        assert "".join(p.get("summary", "") for p in pieces) == expected["summary"]
+
+
+def test_reports_text_as_it_arrives():
+    parser = PartialJSONFields(["summary"])
+    assert parser.feed('```json\n{"summary": "Check the ') == {"summary": "Check the "}
+    assert parser.feed('base ca') == {"summary": "base ca"}
+    assert parser.feed('se\\u00') == {"summary": "se"}       # incomplete escape is held back
+    assert parser.feed('e9", "other": "x"') == {"summary": "é"}
+    assert not parser.done
+    assert parser.feed("}\n```") == {}
+    assert parser.done
+    assert parser.values["summary"] == "Check the base caseé"
@@ -0,0 +1,204 @@
+"""
+Structured logging and per-request tracing
+JSON log lines tagged with the current trace id, a span API timing each
+pipeline stage, a ring buffer of recent slow traces, and an opt-in
+sampling profiler
+"""
+import collections
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+SLOW_TRACE_MS = float(os.getenv("SLOW_TRACE_MS", "500"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "100"))
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+
+
+# ============================================================================
+# Logging
+# ============================================================================
+
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields and the trace id become keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace = _current_trace.get()
+        if trace:
+            entry["trace_id"] = trace.trace_id
+        entry.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """LOG_LEVEL (default INFO) and LOG_FORMAT=json (default) | text"""
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger("oho")
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"oho.{name}")
+
+
+# ============================================================================
+# Traces and spans
+# ============================================================================
+
+class Trace:
+    def __init__(self, name: str, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.attrs: Dict[str, Any] = {}
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "spans": self.spans,
+        }
+
+
+class TraceBuffer:
+    """Most recent slow traces, newest last"""
+
+    def __init__(self, size: int):
+        self._traces: Deque[Dict[str, Any]] = collections.deque(maxlen=size)
+
+    def add(self, trace: Trace):
+        self._traces.append(trace.to_dict())
+
+    def recent(self, min_ms: float = 0.0) -> List[Dict[str, Any]]:
+        return [t for t in reversed(self._traces) if t["duration_ms"] >= min_ms]
+
+
+slow_traces = TraceBuffer(TRACE_BUFFER_SIZE)
+_log = get_logger("trace")
+
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, **attrs):
+    """Make a new trace current for this context; kept if it ends up slow"""
+    trace = Trace(name, trace_id)
+    trace.attrs.update(attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_trace.reset(token)
+        if trace.duration_ms >= SLOW_TRACE_MS:
+            slow_traces.add(trace)
+            _log.warning("slow trace", extra={"trace": trace.name, "trace_id": trace.trace_id,
+                                              "duration_ms": trace.duration_ms})
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a stage of the current trace (no-op outside one). Works across
+    awaits; concurrent stages under asyncio.gather record side by side.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs          # callers may add attributes while the span is open
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record = {
+            "name": name,
+            "start_ms": round((start - trace._start) * 1000, 2),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        if attrs:
+            record["attrs"] = attrs
+        if error:
+            record["error"] = error
+        trace.spans.append(record)
+
+
+# ============================================================================
+# Sampling profiler (opt-in with PROFILER_ENABLED=true)
+# ============================================================================
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every other thread at a fixed interval and counts
+    collapsed stacks (flamegraph "folded" format). Sampling, not tracing:
+    overhead is one stack walk per interval regardless of request volume.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = False
+
+    def profile(self, seconds: float, interval: float = 0.005) -> Dict[str, int]:
+        """Blocking; run it in a worker thread"""
+        with self._lock:
+            if self._running:
+                raise RuntimeError("profiler already running")
+            self._running = True
+        counts: Dict[str, int] = collections.Counter()
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        try:
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == me:
+                        continue
+                    stack = traceback.extract_stack(frame)
+                    counts[";".join(f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})"
+                                    for f in stack)] += 1
+                time.sleep(interval)
+        finally:
+            self._running = False
+        return counts
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,55 @@
+"""
+Background worker pool for Office Hours Oracle
+Fixed number of asyncio workers draining a job queue, so slow agent
+calls never run on the request path
+"""
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, List, Optional
+
+from tracing import get_logger
+
+Job = Callable[[], Awaitable[None]]
+log = get_logger("workers")
+
+
+class WorkerPool:
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(self, job: Job):
+        """Schedule job; workers start lazily on the running event loop"""
+        if not self._workers:
+            self._queue = asyncio.Queue()
+            # Fresh context: workers must not inherit the trace of the request that started them
+            self._workers = [asyncio.create_task(self._work(), context=contextvars.Context())
+                             for _ in range(self.size)]
+        self._queue.put_nowait(job)
+
+    async def join(self):
+        """Wait until every submitted job has finished"""
+        if self._queue:
+            await self._queue.join()
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await job()
+            except Exception:
+                log.exception("job failed", extra={"pool": self.name})
+            finally:
+                self._queue.task_done()
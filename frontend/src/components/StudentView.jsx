@@ -1,5 +1,30 @@
 import { useState, useEffect } from 'react'
 
+// Hint text as the Synthesizer streams it; the final "done" event wins
+function useStreamedHint(apiBase, response) {
+  const [hint, setHint] = useState(null)
+
+  useEffect(() => {
+    setHint(response?.student_friendly_hint ?? null)
+    if (!response || response.enrichment_status !== 'pending') return
+
+    const source = new EventSource(`${apiBase}/api/queue/${response.queue_id}/hint/stream`)
+    source.onmessage = (event) => {
+      const { text } = JSON.parse(event.data)
+      setHint(prev => (prev ?? '') + text)
+    }
+    source.addEventListener('done', (event) => {
+      const { hint: finalHint, replaced } = JSON.parse(event.data)
+      if (finalHint || replaced) setHint(finalHint)
+      source.close()
+    })
+    source.onerror = () => source.close()
+    return () => source.close()
+  }, [apiBase, response])
+
+  return hint
+}
+
 export default function StudentView({ apiBase }) {
   const [formData, setFormData] = useState({
     student_name: '',
@@ -13,6 +38,7 @@ export default function StudentView({ apiBase }) {
   const [response, setResponse] = useState(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
+  const hint = useStreamedHint(apiBase, response)
 
   // Fetch TAs on mount
   useEffect(() => {
@@ -170,6 +196,13 @@ export default function StudentView({ apiBase }) {
             <p><strong>Estimated Wait:</strong> ~{response.estimated_wait_minutes} minutes</p>
           </div>
 
+          {hint && (
+            <div className="response-section">
+              <h4>💡 Hint While You Wait</h4>
+              <p className="hint">{hint}</p>
+            </div>
+          )}
+
           {response.similar_questions.length > 0 && (
             <div className="response-section">
               <h4>💡 Similar Past Questions</h4>
@@ -1,27 +1,66 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import useWebSocket from '../hooks/useWebSocket'
 
+// Streamed Synthesizer text for an entry still being enriched
+function applyHintDelta(queue, delta) {
+  return queue.map(item => {
+    if (item.queue_id !== delta.queue_id) return item
+    const next = { ...item }
+    for (const [field, text] of Object.entries(delta.fields)) {
+      // "replaced": the streamed text was cut off and superseded; overwrite it
+      next[field] = delta.replaced ? text : (next[field] ?? '') + text
+    }
+    return next
+  })
+}
+
+function applyQueueDelta(queue, delta) {
+  if (delta.op === 'removed') {
+    return queue.filter(item => item.queue_id !== delta.queue_id)
+  }
+  const index = queue.findIndex(item => item.queue_id === delta.entry.queue_id)
+  if (index === -1) return [...queue, delta.entry]
+  const next = [...queue]
+  next[index] = delta.entry
+  return next
+}
+
 export default function TADashboard({ apiBase }) {
   const [queue, setQueue] = useState([])
   const [selectedQuestion, setSelectedQuestion] = useState(null)
   const [resolving, setResolving] = useState(null)
+  const lastSeq = useRef(null)
 
-  // WebSocket connection for real-time updates
-  const wsUrl = apiBase.replace('http', 'ws') + '/ws/queue'
-  const { message } = useWebSocket(wsUrl)
+  // Detail panel follows live updates (e.g. a streaming answer outline)
+  const selected = queue.find(item => item.queue_id === selectedQuestion?.queue_id) ?? selectedQuestion
 
-  // Update queue when WebSocket message received
-  useEffect(() => {
-    if (message && message.type === 'queue_update') {
-      setQueue(message.queue)
+  // Snapshot on connect, then sequence-numbered deltas; resync on a gap
+  const handleMessage = (data, websocket) => {
+    if (data.type === 'queue_snapshot') {
+      lastSeq.current = data.seq
+      setQueue(data.queue)
+    } else if (data.type === 'queue_delta') {
+      if (lastSeq.current !== null && data.seq <= lastSeq.current) return
+      if (lastSeq.current === null || data.seq !== lastSeq.current + 1) {
+        websocket.send(JSON.stringify({ type: 'resync', since: lastSeq.current ?? -1 }))
+        return
+      }
+      lastSeq.current = data.seq
+      setQueue(prev => applyQueueDelta(prev, data))
+    } else if (data.type === 'hint_delta') {
+      setQueue(prev => applyHintDelta(prev, data))
     }
-  }, [message])
+  }
+
+  // WebSocket connection for real-time updates
+  const wsUrl = apiBase.replace('http', 'ws') + '/ws/queue'
+  const { message } = useWebSocket(wsUrl, handleMessage)
 
-  // Fetch initial queue
+  // Fetch initial queue (the WebSocket snapshot wins if it arrives first)
   useEffect(() => {
     fetch(`${apiBase}/api/queue`)
       .then(res => res.json())
-      .then(data => setQueue(data))
+      .then(data => { if (lastSeq.current === null) setQueue(data) })
       .catch(err => console.error('Failed to fetch queue:', err))
   }, [apiBase])
 
@@ -106,7 +145,16 @@ export default function TADashboard({ apiBase }) {
                     {getStatusBadge(item.status)}
                   </div>
 
-                  <div className="queue-item-category">{item.category}</div>
+                  <div className="queue-item-category">
+                    {item.category}
+                    {item.enrichment_status === 'pending' && ' · ⏳ analyzing…'}
+                  </div>
+
+                  {item.duplicate_of_queue_id && (
+                    <div className="queue-item-duplicate">
+                      🔁 Similar to #{item.duplicate_of_queue_id} — answer together
+                    </div>
+                  )}
 
                   <div className="queue-item-footer">
                     <span>📍 {item.assigned_ta_name}</span>
@@ -131,7 +179,7 @@ export default function TADashboard({ apiBase }) {
 
         {/* Question Detail Panel */}
         <div className="question-detail">
-          {selectedQuestion ? (
+          {selected ? (
             <>
               <div className="detail-header">
                 <h3>Question Details</h3>
@@ -146,59 +194,59 @@ export default function TADashboard({ apiBase }) {
               <div className="detail-content">
                 <div className="detail-section">
                   <h4>Student Info</h4>
-                  <p><strong>Name:</strong> {selectedQuestion.student_name}</p>
-                  <p><strong>Course:</strong> {selectedQuestion.course}</p>
-                  <p><strong>Assigned to:</strong> {selectedQuestion.assigned_ta_name}</p>
+                  <p><strong>Name:</strong> {selected.student_name}</p>
+                  <p><strong>Course:</strong> {selected.course}</p>
+                  <p><strong>Assigned to:</strong> {selected.assigned_ta_name}</p>
                 </div>
 
                 <div className="detail-section">
                   <h4>Question</h4>
-                  <p>{selectedQuestion.question_text}</p>
+                  <p>{selected.question_text}</p>
                 </div>
 
-                {selectedQuestion.code_snippet && (
+                {selected.code_snippet && (
                   <div className="detail-section">
                     <h4>Code Snippet</h4>
-                    <pre className="code-block">{selectedQuestion.code_snippet}</pre>
+                    <pre className="code-block">{selected.code_snippet}</pre>
                   </div>
                 )}
 
                 <div className="detail-section">
                   <h4>AI Analysis</h4>
-                  <p><strong>Category:</strong> {selectedQuestion.category}</p>
-                  <p><strong>Summary:</strong> {selectedQuestion.brief_summary}</p>
-                  <p><strong>Tags:</strong> {selectedQuestion.tags.join(', ')}</p>
+                  <p><strong>Category:</strong> {selected.category}</p>
+                  <p><strong>Summary:</strong> {selected.brief_summary}</p>
+                  <p><strong>Tags:</strong> {selected.tags.join(', ')}</p>
                   <p>
                     <strong>Estimated Time:</strong>{' '}
-                    <span style={{ color: getDifficultyColor(selectedQuestion.estimated_time_minutes) }}>
-                      {selectedQuestion.estimated_time_minutes} minutes
+                    <span style={{ color: getDifficultyColor(selected.estimated_time_minutes) }}>
+                      {selected.estimated_time_minutes} minutes
                     </span>
                   </p>
                 </div>
 
-                {selectedQuestion.student_friendly_hint && (
+                {selected.student_friendly_hint && (
                   <div className="detail-section ai-section">
                     <h4>💡 Student Hint (from AI Synthesizer)</h4>
-                    <p className="hint">{selectedQuestion.student_friendly_hint}</p>
+                    <p className="hint">{selected.student_friendly_hint}</p>
                   </div>
                 )}
 
-                {selectedQuestion.suggested_answer_outline && (
+                {selected.suggested_answer_outline && (
                   <div className="detail-section ai-section">
                     <h4>📝 Suggested Teaching Approach (from AI Synthesizer)</h4>
-                    <pre className="outline">{selectedQuestion.suggested_answer_outline}</pre>
+                    <pre className="outline">{selected.suggested_answer_outline}</pre>
                   </div>
                 )}
 
                 <div className="detail-actions">
                   <button
-                    onClick={() => handleResolve(selectedQuestion.queue_id)}
-                    disabled={resolving === selectedQuestion.queue_id || selectedQuestion.status === 'DONE'}
+                    onClick={() => handleResolve(selected.queue_id)}
+                    disabled={resolving === selected.queue_id || selected.status === 'DONE'}
                     className="resolve-btn"
                   >
-                    {resolving === selectedQuestion.queue_id
+                    {resolving === selected.queue_id
                       ? 'Resolving...'
-                      : selectedQuestion.status === 'DONE'
+                      : selected.status === 'DONE'
                       ? '✓ Resolved'
                       : 'Mark as Resolved'}
                   </button>
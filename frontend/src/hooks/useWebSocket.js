@@ -1,11 +1,15 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 
 /**
- * Simple WebSocket hook for real-time queue updates
+ * Simple WebSocket hook for real-time queue updates.
+ * onMessage (optional) is called for every message, so bursts of
+ * deltas are never collapsed by React state batching.
  */
-export default function useWebSocket(url) {
+export default function useWebSocket(url, onMessage) {
   const [message, setMessage] = useState(null)
   const [ws, setWs] = useState(null)
+  const onMessageRef = useRef(onMessage)
+  onMessageRef.current = onMessage
 
   useEffect(() => {
     // Create WebSocket connection
@@ -18,6 +22,7 @@ export default function useWebSocket(url) {
     websocket.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data)
+        onMessageRef.current?.(data, websocket)
         setMessage(data)
       } catch (err) {
         console.error('Failed to parse WebSocket message:', err)
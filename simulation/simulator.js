@@ -1,6 +1,10 @@
 // Office Hours Chaos Simulator - UW Madison
 // Claude AI Integration for behavioral simulation
 
+// Scheduling policies compared headlessly by /api/simulate/run
+const SIMULATION_POLICIES = ['fifo', 'shortest_job', 'earliest_deadline', 'weighted_fair', 'course_balance', 'expertise'];
+const COMPARISON_SESSIONS = 1000;
+
 class OfficeHoursSimulator {
     constructor() {
         this.students = [];
@@ -27,6 +31,67 @@ class OfficeHoursSimulator {
         document.getElementById('startChaos').addEventListener('click', () => this.startChaos());
         document.getElementById('activateAI').addEventListener('click', () => this.activateAI());
         document.getElementById('reset').addEventListener('click', () => this.reset());
+        document.getElementById('comparePolicies').addEventListener('click', () => this.comparePolicies());
+    }
+
+    async comparePolicies() {
+        // Whole sessions run server-side (discrete-event engine), no per-tick round trips
+        this.logEvent(`📊 Simulating ${COMPARISON_SESSIONS} sessions per policy...`, 'warning');
+        document.getElementById('comparePolicies').disabled = true;
+
+        const API_BASE = 'http://localhost:8000';
+
+        try {
+            const response = await fetch(`${API_BASE}/api/simulate/run`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    policies: SIMULATION_POLICIES,
+                    sessions: COMPARISON_SESSIONS,
+                    include_timeline: false
+                })
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+
+            const data = await response.json();
+            this.showPolicyResults(data);
+            this.logEvent(`✅ ${data.sessions} sessions per policy in ${Math.round(data.elapsed_ms)} ms`, 'success');
+        } catch (error) {
+            console.error('Policy comparison error:', error);
+            this.logEvent('⚠️ Policy comparison failed - is the backend running?', 'critical');
+        }
+
+        document.getElementById('comparePolicies').disabled = false;
+    }
+
+    showPolicyResults(data) {
+        const rows = Object.entries(data.policies)
+            .map(([name, result]) => ({ name, summary: result.summary }))
+            .sort((a, b) => a.summary.abandonment_rate.mean - b.summary.abandonment_rate.mean);
+
+        const table = document.getElementById('policyTable');
+        table.innerHTML = '';
+        rows.forEach((row, index) => {
+            const tr = document.createElement('tr');
+            if (index === 0) tr.className = 'best';
+            [
+                row.name,
+                `${row.summary.avg_wait_minutes.mean.toFixed(1)} min`,
+                `${row.summary.p95_wait_minutes.mean.toFixed(1)} min`,
+                `${Math.round(row.summary.abandonment_rate.mean * 100)}%`,
+                `${Math.round(row.summary.ta_utilization.mean * 100)}%`
+            ].forEach(text => {
+                const td = document.createElement('td');
+                td.textContent = text;
+                tr.appendChild(td);
+            });
+            table.appendChild(tr);
+        });
+
+        document.getElementById('policySessions').textContent = data.sessions;
+        document.getElementById('policyResults').style.display = 'block';
     }
 
     async runAutoDemo() {
@@ -224,18 +289,19 @@ class OfficeHoursSimulator {
 
         const API_BASE = 'http://localhost:8000';
 
-        // Use Claude to intelligently select next student
-        const studentsInfo = waitingStudents.slice(0, 10).map(s => ({
+        // The backend ranks the whole queue locally; Claude advises on the top of it
+        const studentsInfo = waitingStudents.map(s => ({
             id: s.id,
             course: s.course,
             waitTime: Math.round(s.waitTime),
             complexity: s.complexity,
             patience: s.patience,
+            stress: s.stressLevel,
             question: s.question
         }));
 
         try {
-            const response = await fetch(`${API_BASE}/api/simulate/select-next`, {
+            const response = await fetch(`${API_BASE}/api/simulate/select-next?advisor=true`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(studentsInfo)